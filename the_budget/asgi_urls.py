@@ -0,0 +1,11 @@
+"""
+URL configuration of the_budget under ASGI: the same URLs as `urls`
+with the async read views of the app.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('', include('the_budget_app.async_urls')),
+    path('admin/', admin.site.urls),
+]
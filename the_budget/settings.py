@@ -41,6 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the other middleware.
+    'the_budget_app.middleware.server_timing_middleware',
+    'the_budget_app.middleware.slow_query_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,10 +51,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'the_budget_app.middleware.async_urlconf_middleware',
 ]
 
 ROOT_URLCONF = 'the_budget.urls'
 
+# Per-request timings of the SQL queries, the templates and the whole
+# request, sent in a Server-Timing header and logged to the
+# `the_budget_app.timing` logger. When off, the middleware is dropped at
+# startup and adds nothing to the requests. The header tells anyone how
+# long the server spends on a page, turn it on to investigate.
+SERVER_TIMING = False
+
+# Log the SQL queries slower than this many milliseconds, with their view
+# and the app code that ran them, to SLOW_QUERY_LOG_FILE. None turns it
+# off. `python manage.py slow_query_report` sums up the log.
+SLOW_QUERY_MS = None
+SLOW_QUERY_LOG_FILE = BASE_DIR / 'slow_queries.jsonl'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -78,9 +95,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds to wait for another request's write to finish
+            # before failing with "database is locked".
+            'timeout': 20,
+        },
+        'TEST': {
+            # Use a file so that concurrent tests can open the database
+            # from several threads.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# The versions that invalidate the cached choices, categories and record
+# days (see `the_budget_app.choices`) must be seen by every worker
+# process, so the cache is shared through files rather than kept in each
+# process's memory. Across several hosts, use a memcached or Redis cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            # The records page caches a fragment per day.
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# The tests get a cache of their own, empty (see the runner).
+TEST_RUNNER = 'the_budget.test_runner.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -118,6 +163,57 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Logging
+# https://docs.djangoproject.com/en/4.1/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+            # Only create the file once there's a slow query.
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'the_budget_app.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'the_budget_app.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        # The figures of the tests that measure, e.g. the posting rate.
+        'the_budget_app.tests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # What the data migrations couldn't do by themselves.
+        'the_budget_app.migrations': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
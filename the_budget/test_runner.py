@@ -0,0 +1,31 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests with a file cache in a new temporary directory. The
+    configured one is shared with the other processes, e.g. a development
+    server, whose cached lists and versions the tests must not read, nor
+    clear.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='the_budget_cache_')
+        self.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            }
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,5 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
+from . import balances
 from .models import Account, Category, Budget
 
 
@@ -12,6 +13,29 @@ class CategoryAdmin(admin.ModelAdmin):
     inlines = [BudgetInline]
 
 
+class AccountAdmin(admin.ModelAdmin):
+    list_display = ['account_name', 'splitting_percent', 'amount']
+    actions = ['check_balances', 'repair_balances']
+
+    def report(self, request, drifts, verb):
+        if not drifts:
+            self.message_user(
+                request, 'Balances match the ledger.', messages.SUCCESS
+            )
+        for drift in drifts:
+            self.message_user(request, f'{verb} {drift}', messages.WARNING)
+
+    @admin.action(description='Check balances against the ledger')
+    def check_balances(self, request, queryset):
+        self.report(request, balances.reconcile(queryset), 'Drift:')
+
+    @admin.action(description='Repair balances from the ledger')
+    def repair_balances(self, request, queryset):
+        self.report(
+            request, balances.reconcile(queryset, repair=True), 'Repaired:'
+        )
+
+
 # Register your models here.
-admin.site.register(Account)
-admin.site.register(Category, CategoryAdmin)
\ No newline at end of file
+admin.site.register(Account, AccountAdmin)
+admin.site.register(Category, CategoryAdmin)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TheBudgetAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'the_budget_app'
+
+    def ready(self):
+        # Connect the signals that invalidate the cached choice lists
+        # and categories.
+        from . import choices, registry
@@ -0,0 +1,27 @@
+"""
+The app's URLs with the async read views, for ASGI.
+"""
+from django.urls import path
+
+from . import urls
+from .views import async_view
+
+
+app_name = urls.app_name
+
+ASYNC_VIEWS = {
+    'index': async_view.index,
+    'account': async_view.accounts,
+    'record': async_view.records,
+    'budget': async_view.budget,
+    'budget_month': async_view.budget,
+}
+
+urlpatterns = [
+    path(
+        str(pattern.pattern),
+        ASYNC_VIEWS.get(pattern.name, pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,114 @@
+"""
+Account balances computed from the ledger.
+
+`Account.amount` is a running total kept up to date by `posting`. It can
+still drift from the ledger, e.g. after an interrupted request or a
+change made outside of the app. The true balance of an account is its
+`opening_amount`, plus its incomes and the transfers it received, minus
+its expenses and the transfers it sent.
+"""
+from django.db import transaction
+from django.db.models import (
+    Case, F, FloatField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from . import posting
+from .models import Account, Ledger
+
+
+# Differences smaller than half a cent are float rounding, not drift.
+TOLERANCE = 0.005
+
+
+def signed_amount():
+    """
+    The amount of a record as seen by its `account`: positive for an
+    income, negative for an expense or a transfer sent.
+    """
+    return Case(
+        When(category__category_type='income', then=F('amount')),
+        default=-F('amount'),
+        output_field=FloatField(),
+    )
+
+
+def ledger_sum(records, field, amount):
+    """
+    Subquery of the sum of `amount` over the `records` whose `field` is
+    the outer account.
+    """
+    return Coalesce(
+        Subquery(
+            records.filter(**{field: OuterRef('pk')}).values(field).annotate(
+                total=Sum(amount)
+            ).values('total')
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def with_true_balance(accounts=None, records=None):
+    """
+    Annotate `accounts` (all by default) with their `true_balance`
+    computed from `records` (the whole ledger by default). The whole
+    thing is a single query.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    if records is None:
+        records = Ledger.objects.all()
+    return accounts.annotate(
+        true_balance=F('opening_amount')
+        + ledger_sum(records, 'account', signed_amount())
+        + ledger_sum(records, 'to_account', F('amount'))
+    )
+
+
+class Drift:
+    __slots__ = ('account', 'stored', 'computed')
+
+    def __init__(self, account, stored, computed):
+        self.account = account
+        self.stored = stored
+        self.computed = computed
+
+    @property
+    def drift(self):
+        return self.stored - self.computed
+
+    def __str__(self):
+        return (
+            f'{self.account.account_name}: stored {self.stored:.2f}, '
+            f'ledger {self.computed:.2f}, drift {self.drift:+.2f}'
+        )
+
+
+def find_drift(accounts=None):
+    """
+    Returns a `Drift` for every account whose `amount` doesn't match the
+    ledger.
+    """
+    return [
+        Drift(account, account.amount, account.true_balance)
+        for account in with_true_balance(accounts).order_by('pk')
+        if abs(account.amount - account.true_balance) >= TOLERANCE
+    ]
+
+
+@transaction.atomic
+def reconcile(accounts=None, repair=False):
+    """
+    Returns the drifts of the `accounts` (all by default). With `repair`
+    their amounts are set back to the ledger's.
+
+    The repair subtracts the drift instead of writing the computed
+    balance, so a record posted in the meantime isn't lost.
+    """
+    drifts = find_drift(accounts)
+    if repair:
+        posting.apply_balance_deltas(
+            {drift.account.pk: -drift.drift for drift in drifts}
+        )
+    return drifts
@@ -0,0 +1,236 @@
+"""
+Synthetic ledgers of any size for the benchmarks.
+
+The records are written with `bulk_create` in large batches, without
+going through `posting`: the balances, the monthly totals and the
+balance snapshots are computed once at the end from the whole ledger
+instead of being updated batch by batch. The full-text index is kept by
+its triggers. The data is random but reproducible, drawn from the
+`seed`, and shaped like a household's: a few incomes a month, many
+small expenses spread over popular and rare categories, some transfers.
+"""
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .. import balances, choices, registry, rollup, snapshots, timeline
+from ..models import (
+    Account, AccountBalanceSnapshot, Budget, Category, Ledger,
+    MonthlyCategoryTotal,
+)
+
+
+BATCH_SIZE = 10000
+# Share of the records of each type.
+INCOME_SHARE = 0.08
+TRANSFER_SHARE = 0.05
+
+ACCOUNT_NAMES = ('Needs', 'Wants', 'Savings', 'Checking', 'Wallet', 'Card')
+INCOME_NAMES = ('Salary', 'Rental', 'Sale', 'Refunds', 'Grants', 'Awards')
+EXPENSE_NAMES = (
+    'Food', 'Bills', 'Transportation', 'Shopping', 'Home', 'Health',
+    'Entertainment', 'Telephone', 'Clothing', 'Car', 'Insurance', 'Social',
+    'Education', 'Sport', 'Beauty', 'Electronics', 'Baby', 'Tax',
+)
+NOTE_WORDS = (
+    'market', 'grocery', 'bakery', 'coffee', 'lunch', 'dinner', 'fuel',
+    'station', 'pharmacy', 'hardware', 'store', 'taxi', 'train', 'ticket',
+    'rent', 'internet', 'phone', 'repair', 'gift', 'book', 'gym', 'online',
+    'order', 'monthly', 'weekly', 'cash', 'refund', 'paint', 'shoes',
+)
+
+
+def names(base, count, suffix):
+    """
+    Returns `count` names, the `base` ones first, then numbered ones.
+    """
+    return [
+        base[index] if index < len(base) else f'{suffix} {index + 1}'
+        for index in range(count)
+    ]
+
+
+def popularity(count):
+    """
+    Zipf-like weights: the first of `count` choices is the most picked.
+    """
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+@transaction.atomic
+def clear():
+    """
+    Delete every account, category, budget and record, and what is
+    derived from them.
+    """
+    Ledger.objects.all().delete()
+    AccountBalanceSnapshot.objects.all().delete()
+    MonthlyCategoryTotal.objects.all().delete()
+    Budget.objects.all().delete()
+    Account.objects.all().delete()
+    Category.objects.all().delete()
+
+
+def create_accounts(count):
+    percents = [100 // count] * count
+    percents[0] += 100 - sum(percents)
+    return [
+        Account.objects.create(
+            account_name=name,
+            splitting_percent=percent,
+            opening_amount=1000,
+            amount=1000,
+        )
+        for name, percent in zip(
+            names(ACCOUNT_NAMES, count, 'Account'), percents
+        )
+    ]
+
+
+def create_categories(incomes, expenses):
+    """
+    Returns the transfer category, the income ones and the expense ones.
+    The categories the app needs itself (see `AppData.reset`) are
+    created too. They aren't editable, which `Category.save` refuses, so
+    all of them are inserted with `bulk_create`.
+    """
+    transfer = Category(
+        category_type='transfer', category_name='Transfer', editable=False
+    )
+    income_list = [
+        Category(category_type='income', category_name=name)
+        for name in names(INCOME_NAMES, incomes, 'Income')
+    ]
+    expense_list = [
+        Category(category_type='expense', category_name=name)
+        for name in names(EXPENSE_NAMES, expenses, 'Expense')
+    ]
+    Category.objects.bulk_create([
+        transfer,
+        Category(
+            category_type='income',
+            category_name='From deleted account',
+            editable=False,
+        ),
+        *income_list,
+        *expense_list,
+    ])
+    return transfer, income_list, expense_list
+
+
+def create_budgets(expenses, months, random_source):
+    """
+    Set a budget for every expense category for each of the last
+    `months` months, the current one included.
+    """
+    today = timezone.localdate()
+    budgets = []
+    for offset in range(months):
+        month_index = today.year * 12 + today.month - 1 - offset
+        year, month = divmod(month_index, 12)
+        for category in expenses:
+            budgets.append(Budget(
+                category=category,
+                budget_limit=round(random_source.uniform(50, 1000), -1),
+                month=month + 1,
+                year=year,
+            ))
+    Budget.objects.bulk_create(budgets, batch_size=BATCH_SIZE)
+    return budgets
+
+
+def generate_records(count, accounts, transfer, incomes, expenses, start,
+                     end, random_source):
+    """
+    Yields `count` unsaved records posted from `start` to `end`.
+    """
+    tz = timezone.get_current_timezone()
+    days = (end - start).days + 1
+    account_weights = popularity(len(accounts))
+    income_weights = popularity(len(incomes))
+    expense_weights = popularity(len(expenses))
+    choose = random_source.choices
+    for _ in range(count):
+        day = start + timedelta(days=random_source.randrange(days))
+        date_created = datetime.combine(
+            day,
+            time(random_source.randrange(7, 23), random_source.randrange(60)),
+            tzinfo=tz,
+        )
+        account = choose(accounts, account_weights)[0]
+        kind = random_source.random()
+        to_account = None
+        if kind < INCOME_SHARE:
+            category = choose(incomes, income_weights)[0]
+            amount = random_source.lognormvariate(7, 0.5)
+        elif kind < INCOME_SHARE + TRANSFER_SHARE and len(accounts) > 1:
+            category = transfer
+            to_account = random_source.choice(
+                [other for other in accounts if other is not account]
+            )
+            amount = random_source.lognormvariate(5, 1)
+        else:
+            category = choose(expenses, expense_weights)[0]
+            amount = random_source.lognormvariate(3, 1)
+        if random_source.random() < 0.3:
+            note = ''
+        else:
+            note = ' '.join(random_source.sample(NOTE_WORDS, 2))
+        yield Ledger(
+            account=account,
+            to_account=to_account,
+            category=category,
+            amount=round(amount, 2),
+            note=note,
+            date_created=date_created,
+            posted_on=day,
+        )
+
+
+def seed(records=100000, accounts=5, incomes=6, expenses=18, years=3,
+         budget_months=12, random_seed=0, clear_first=True):
+    """
+    Fill the database with a synthetic ledger of `records` records over
+    the last `years` years. Returns the counts of what was created.
+    """
+    random_source = random.Random(random_seed)
+    if clear_first:
+        clear()
+    with transaction.atomic():
+        account_list = create_accounts(accounts)
+        transfer, income_list, expense_list = create_categories(
+            incomes, expenses
+        )
+        budgets = create_budgets(expense_list, budget_months, random_source)
+
+        end = timezone.localdate()
+        start = end - timedelta(days=math.ceil(365.25 * years) - 1)
+        generated = generate_records(
+            records, account_list, transfer, income_list, expense_list,
+            start, end, random_source,
+        )
+        for _ in range(0, records, BATCH_SIZE):
+            Ledger.objects.bulk_create(
+                [record for record, _ in zip(generated, range(BATCH_SIZE))],
+                batch_size=BATCH_SIZE,
+            )
+
+        # What `posting` keeps up to date, computed from the whole ledger.
+        balances.reconcile(repair=True)
+        rollup.rebuild()
+        snapshots.rebuild()
+    # The cached choices, categories, facets and pages of the previous
+    # data are all stale. The records and categories were bulk created,
+    # without the signals moving the versions on.
+    choices.accounts_changed()
+    choices.changed(registry.VERSION_KEY)
+    choices.changed(timeline.LEDGER_VERSION_KEY)
+    return {
+        'records': records,
+        'accounts': accounts,
+        'categories': incomes + expenses + 2,
+        'budgets': len(budgets),
+    }
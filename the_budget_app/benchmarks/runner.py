@@ -0,0 +1,244 @@
+"""
+Timings of every page and API of the app, and of the posting paths, on
+the data seeded by `data.seed`.
+
+Each case is requested `repeat` times after a warm-up request with the
+test client, in process, so the timings are those of the app and the
+database without the network. A case is named after its method and its
+URL name (e.g. `GET record`), which don't change between commits, so
+the results of two commits can be compared with `compare`.
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from ..models import Account, Budget, Category, Ledger
+
+
+APP_NAMESPACE = 'the_budget'
+# Records posted per request of the batch posting case.
+BATCH_SIZE = 100
+# Query strings of the cases that need one to do their work.
+QUERIES = {
+    'search_records': 'q=market',
+    'api_search': 'q=market',
+}
+
+
+def url_names():
+    """
+    Returns the names of the URL patterns of the app, in their order.
+    """
+    resolver = get_resolver()
+    app_resolver = next(
+        pattern for pattern in resolver.url_patterns
+        if getattr(pattern, 'namespace', None) == APP_NAMESPACE
+    )
+    return [
+        pattern.name for pattern in app_resolver.url_patterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    ]
+
+
+class Samples:
+    """
+    Existing objects to fill the URLs and the posted forms with.
+    """
+    def __init__(self):
+        self.accounts = list(Account.objects.order_by('pk')[:2])
+        self.income = Category.objects.filter(
+            category_type='income', editable=True
+        ).order_by('pk').first()
+        self.expense = Category.objects.filter(
+            category_type='expense'
+        ).order_by('pk').first()
+        self.budget = Budget.objects.order_by('-year', '-month', 'pk').first()
+        self.record = Ledger.objects.order_by('-pk').first()
+        self.today = timezone.localdate()
+
+    def url_kwargs(self, name):
+        """
+        Returns the arguments of the URL `name`, or None when there is
+        nothing to request it with.
+        """
+        objects = {
+            'update_account': self.accounts[0] if self.accounts else None,
+            'delete_account': self.accounts[0] if self.accounts else None,
+            'detail_record': self.record,
+            'delete_record': self.record,
+            'create_budget': self.expense,
+            'edit_budget': self.budget,
+            'edit_category': self.expense,
+            'delete_category': self.expense,
+        }
+        if name == 'budget_month':
+            return {'year': self.today.year, 'month': self.today.month}
+        if name not in objects:
+            return {}
+        if objects[name] is None:
+            return None
+        return {'pk': objects[name].pk}
+
+    def record_form(self, **fields):
+        return {
+            'account': self.accounts[0].pk,
+            'amount': '12.50',
+            'note': 'benchmark',
+            'date': self.today.isoformat(),
+            'time': '12:00:00',
+            **fields,
+        }
+
+    def batch(self, size=BATCH_SIZE):
+        date_created = timezone.now() - timedelta(days=1)
+        return {'postings': [
+            {
+                'type': 'expense',
+                'account': self.accounts[0].pk,
+                'category': self.expense.pk,
+                'amount': '3.20',
+                'note': f'batch {index}',
+                'date_created': date_created.isoformat(),
+            }
+            for index in range(size)
+        ]}
+
+
+def get_cases(samples):
+    """
+    Returns the cases to time as (name, method, path, data) tuples: a
+    GET of every URL of the app, then the postings. The `data` of a POST
+    is a function returning the request body, called before each
+    request.
+    """
+    cases = []
+    for name in url_names():
+        kwargs = samples.url_kwargs(name)
+        if kwargs is not None:
+            path = reverse(f'{APP_NAMESPACE}:{name}', kwargs=kwargs)
+            if name in QUERIES:
+                path += '?' + QUERIES[name]
+            cases.append((f'GET {name}', 'get', path, None))
+
+    if len(samples.accounts) < 2 or samples.expense is None:
+        return cases
+    cases += [
+        ('POST new_income', 'post', reverse('the_budget:new_income'),
+         lambda: samples.record_form(category=samples.income.pk)),
+        ('POST new_expense', 'post', reverse('the_budget:new_expense'),
+         lambda: samples.record_form(category=samples.expense.pk)),
+        ('POST new_transfer', 'post', reverse('the_budget:new_transfer'),
+         lambda: samples.record_form(to_account=samples.accounts[1].pk)),
+        ('POST api_postings', 'json', reverse('the_budget:api_postings'),
+         samples.batch),
+    ]
+    return cases
+
+
+def time_case(client, method, path, data, repeat):
+    """
+    Request `path` once to warm up, then `repeat` times. Returns the
+    timings in milliseconds, the queries of the last request and its
+    status code. `path` may be a function returning the path of each
+    request.
+    """
+    def request():
+        target = path() if callable(path) else path
+        if method == 'get':
+            return client.get(target)
+        if method == 'json':
+            return client.post(
+                target, json.dumps(data()), content_type='application/json'
+            )
+        return client.post(target, data())
+
+    request()
+    durations = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'min_ms': round(durations[0], 2),
+        'median_ms': round(statistics.median(durations), 2),
+        'p95_ms': round(
+            durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            2,
+        ),
+    }
+
+
+def time_deletes(client, repeat):
+    """
+    Delete the `repeat` + 1 latest records one by one, the first as a
+    warm-up, each request with another record.
+    """
+    records = list(
+        Ledger.objects.order_by('-pk').values_list('pk', flat=True)
+        [:repeat + 1]
+    )
+    paths = iter(
+        reverse('the_budget:delete_record', kwargs={'pk': pk})
+        for pk in records
+    )
+    if len(records) < repeat + 1:
+        return None
+    return time_case(
+        client, 'post', lambda: next(paths), lambda: {}, repeat
+    )
+
+
+def run(repeat=5):
+    """
+    Time every case on the current database. Returns the results by case
+    name.
+    """
+    # A case failing is recorded with its status, it doesn't stop the
+    # others.
+    client = Client(raise_request_exception=False)
+    results = {}
+    for name, method, path, data in get_cases(Samples()):
+        results[name] = time_case(client, method, path, data, repeat)
+    deletes = time_deletes(client, repeat)
+    if deletes is not None:
+        results['POST delete_record'] = deletes
+    return results
+
+
+def compare(baseline, results, tolerance=0.2):
+    """
+    Returns a line per case of `results` also in `baseline`, by scale:
+    the median times and their ratio, marked when slower by more than
+    `tolerance`, and the query counts when they changed.
+    """
+    lines = []
+    for scale, current in results['scales'].items():
+        before = baseline.get('scales', {}).get(scale)
+        if before is None:
+            continue
+        for name, timing in current['cases'].items():
+            old = before['cases'].get(name)
+            if old is None:
+                continue
+            ratio = timing['median_ms'] / max(old['median_ms'], 0.01)
+            line = (
+                f'{scale:>9} {name:<28} {old["median_ms"]:9.2f} ms '
+                f'{timing["median_ms"]:9.2f} ms {ratio:6.2f}x'
+            )
+            if ratio > 1 + tolerance:
+                line += '  slower'
+            if timing['queries'] != old['queries']:
+                line += f'  queries {old["queries"]} -> {timing["queries"]}'
+            lines.append(line)
+    return lines
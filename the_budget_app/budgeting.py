@@ -0,0 +1,55 @@
+"""
+Budget versus actual spending.
+"""
+from django.db.models import F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Budget, Category, MonthlyCategoryTotal
+
+
+def budget_vs_actual(year, month):
+    """
+    Returns the budgets of the month with their `budget_limit`, `spent`,
+    `remaining` and `progress` (percent of the limit spent).
+
+    Everything is computed by a single query: the amount spent comes from
+    the monthly totals of the budget's category, so the cost depends on
+    the number of budgets, not on the size of the ledger.
+    """
+    spent = MonthlyCategoryTotal.objects.filter(
+        category=OuterRef('category'),
+        year=OuterRef('year'),
+        month=OuterRef('month'),
+    ).values('expense_total')[:1]
+
+    return Budget.objects.filter(year=year, month=month).annotate(
+        category_name=F('category__category_name'),
+        spent=Coalesce(
+            Subquery(spent), Value(0.0), output_field=FloatField()
+        ),
+        remaining=F('budget_limit') - F('spent'),
+        progress=Coalesce(
+            F('spent') * 100 / NullIf(F('budget_limit'), Value(0.0)),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    ).values(
+        'id',
+        'category_id',
+        'category_name',
+        'budget_limit',
+        'spent',
+        'remaining',
+        'progress',
+    ).order_by('id')
+
+
+def categories_without_budget(year, month):
+    """
+    Returns the expense categories with no budget set for the month.
+    """
+    return Category.expenses().exclude(
+        pk__in=Budget.objects.filter(
+            year=year, month=month
+        ).values('category')
+    )
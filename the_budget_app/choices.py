@@ -0,0 +1,91 @@
+"""
+Cached choice lists for the record forms.
+
+The accounts offered by the forms are read once and kept in the cache
+under the current data version. Saving or deleting an account, or
+changing a balance, bumps the version so the next form reads them again.
+Old lists are never served, they just expire.
+
+The versions are kept in the configured cache, which every worker
+process shares (see `CACHES` in the settings), so a change made by one
+of them is seen by all.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Account
+
+
+VERSION_KEY = 'the_budget_app:choices:version'
+ACCOUNTS_VERSION_KEY = 'the_budget_app:accounts:version'
+
+
+def version(key=VERSION_KEY):
+    value = cache.get(key)
+    if value is None:
+        # Start from the clock so that lists cached before the version
+        # was evicted can't be read again.
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump(key=VERSION_KEY):
+    """
+    Give the version `key` a new value. A shared cache may not increment
+    atomically: two processes incrementing at once could both write the
+    same next version. Each bump writes the clock instead, which no other
+    bump writes too.
+    """
+    cache.set(key, time.time_ns(), timeout=None)
+
+
+def changed(key=VERSION_KEY):
+    """
+    Mark the data of the version `key` as changed. The version is bumped
+    right away and again once the transaction is committed, so data read
+    by another request before the commit isn't kept.
+    """
+    bump(key)
+    transaction.on_commit(lambda: bump(key))
+
+
+def accounts_changed():
+    """
+    Mark the accounts themselves as changed, e.g. renamed. This also
+    bumps `ACCOUNTS_VERSION_KEY`, which unlike the choices version doesn't
+    move with the balances.
+    """
+    changed()
+    changed(ACCOUNTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def account_changed(sender, **kwargs):
+    accounts_changed()
+
+
+def cached(name, load):
+    """
+    Returns the list `name` of the current version, calling `load` to
+    read it if it isn't cached.
+    """
+    key = f'the_budget_app:choices:{name}:{version()}'
+    objects = cache.get(key)
+    if objects is None:
+        objects = list(load())
+        cache.set(key, objects)
+    return objects
+
+
+def accounts():
+    return cached('accounts', Account.list_of_accounts)
+
+
+def accounts_with_amount():
+    return [account for account in accounts() if account.amount > 0]
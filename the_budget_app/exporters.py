@@ -0,0 +1,101 @@
+"""
+Export the ledger as CSV or JSON Lines.
+
+The records are read with a server side iterator a chunk at a time and
+written out as they come, so memory stays flat and the first bytes are
+sent right away however big the ledger is.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Ledger
+
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+# Size of the pieces of output written at once.
+BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(rows=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns an iterator over `rows`, a queryset of `Ledger.rows()` (the
+    whole ledger by default), oldest first.
+    """
+    if rows is None:
+        rows = Ledger.rows()
+    return rows.order_by('date_created', 'id').iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """
+    A file-like object for `csv.writer` that returns what is written.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(Ledger.ROW_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row._asdict()) + '\n'
+
+
+LINES = {
+    'csv': csv_lines,
+    'jsonl': jsonl_lines,
+}
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """
+    Join `lines` into bytes of about `size` to write fewer, bigger
+    pieces.
+    """
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer).encode()
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def gzipped(chunks):
+    """
+    Gzip a stream of bytes without holding all of it.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(file_format, rows=None, gzip=False):
+    """
+    Returns an iterator over the bytes of the export of `rows`.
+    """
+    chunks = buffered(LINES[file_format](export_rows(rows)))
+    if gzip:
+        chunks = gzipped(chunks)
+    return chunks
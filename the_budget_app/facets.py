@@ -0,0 +1,109 @@
+"""
+Facet counts and totals of a selection of records.
+
+The counts per account, per category and per type all come from one
+GROUP BY over the foreign keys of the ledger, which are indexed. The
+groups are few (about accounts times categories) and are rolled up into
+the facets in Python, with the names from the cached accounts and the
+category registry.
+
+The GROUP BY still reads every record selected. The records page only
+runs it for the filters narrowing the ledger down; the groups of the
+whole ledger, or of a range of days, are cached under the version of
+the ledger (see `timeline.LEDGER_VERSION_KEY`) and of the names.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from . import choices, registry, timeline
+from .models import Ledger
+
+
+def group_totals(records):
+    """
+    Returns the `count` and `total` amount of the `records` queryset per
+    account, to account and category.
+    """
+    return list(records.order_by().values(
+        'account', 'to_account', 'category'
+    ).annotate(count=Count('id'), total=Sum('amount')))
+
+
+def cached_group_totals(start=None, end=None):
+    """
+    Returns the `group_totals` of the records posted from `start` to
+    `end`, both optional, from the cache when the ledger hasn't changed
+    since they were cached.
+    """
+    key = 'the_budget_app:facets:{}:{}:{}.{}.{}'.format(
+        start, end,
+        choices.version(timeline.LEDGER_VERSION_KEY),
+        choices.version(choices.ACCOUNTS_VERSION_KEY),
+        choices.version(registry.VERSION_KEY),
+    )
+    groups = cache.get(key)
+    if groups is None:
+        records = Ledger.objects.all()
+        if start:
+            records = records.filter(posted_on__gte=start)
+        if end:
+            records = records.filter(posted_on__lte=end)
+        groups = group_totals(records)
+        cache.set(key, groups)
+    return groups
+
+
+def facet_counts(records=None, groups=None):
+    """
+    Returns the `count` and `total` amount of the `records` queryset, or
+    of its `group_totals`, per account, per category and per type, and
+    the count of all of them. A transfer counts for both of its
+    accounts. The account totals are net: incomes and transfers in minus
+    expenses and transfers out. There is no overall total, which would
+    add up incomes, expenses and transfers.
+    """
+    if groups is None:
+        groups = group_totals(records)
+
+    accounts, categories, types = {}, {}, {}
+    record_count = 0
+
+    def add(facet, key, count, total):
+        counts = facet.setdefault(key, {'count': 0, 'total': 0})
+        counts['count'] += count
+        counts['total'] += total
+
+    for group in groups:
+        count, total = group['count'], group['total']
+        category_type = registry.get(group['category']).category_type
+        add(categories, group['category'], count, total)
+        add(types, category_type, count, total)
+        record_count += count
+        if category_type == 'income':
+            add(accounts, group['account'], count, total)
+        else:
+            add(accounts, group['account'], count, -total)
+        if category_type == 'transfer' and group['to_account']:
+            add(accounts, group['to_account'], count, total)
+
+    account_names = {
+        account.pk: account.account_name for account in choices.accounts()
+    }
+
+    def facet(counts, name_of):
+        return sorted(
+            (
+                {'value': key, 'name': name_of(key), **value}
+                for key, value in counts.items()
+            ),
+            key=lambda item: (-item['count'], item['name']),
+        )
+
+    return {
+        'accounts': facet(accounts, lambda pk: account_names.get(pk, '')),
+        'categories': facet(
+            categories, lambda pk: registry.get(pk).category_name
+        ),
+        'types': facet(types, lambda value: value.capitalize()),
+        'count': record_count,
+    }
@@ -2,7 +2,9 @@ import datetime
 
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Account, Category
+from django.db.models import Q
+from . import choices, registry, reporting, search
+from .models import Account, Category, Ledger
 
 
 class AccountForm(forms.Form):
@@ -121,66 +123,175 @@ class NewRecordForm(forms.Form):
     time.widget.attrs.update({'class': 'form-control'})
 
 
+class ObjectChoiceField(forms.ChoiceField):
+    """
+    A choice among model `objects` already fetched. The cleaned value is
+    the object itself, found without a query.
+    """
+    def __init__(self, objects, label_from_object=str, **kwargs):
+        self.objects = {str(obj.pk): obj for obj in objects}
+        super().__init__(
+            choices=[(obj.pk, label_from_object(obj)) for obj in objects],
+            **kwargs
+        )
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+    def validate(self, value):
+        # `to_python` already checked that the value is a choice.
+        forms.Field.validate(self, value)
+
+
+def account_label(account):
+    return f"{account.account_name} ({account.amount:.2f})"
+
+
+def category_label(category):
+    return category.category_name
+
+
 def init_fields(self, category: str):
     """
-    Initialized the fields for Income, Expense, Transfer.
+    Initialized the fields for Income, Expense, Transfer. The accounts
+    come from the cached lists of `choices` and the categories from the
+    `registry`.
     """
     if category == 'income':
-        self.fields['account'] = forms.ChoiceField(
-            choices=[
-                (account.pk, f"{account.account_name} ({account.amount:.2f})")
-                for account in Account.list_of_accounts()
-            ],
+        self.fields['account'] = ObjectChoiceField(
+            choices.accounts(),
+            account_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
     elif category == 'expense':
-        self.fields['account'] = forms.ChoiceField(
-            choices=[
-                (account.pk, f"{account.account_name} ({account.amount:.2f})")
-                for account in Account.amount_gt_zero()
-            ],
+        self.fields['account'] = ObjectChoiceField(
+            choices.accounts_with_amount(),
+            account_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
 
     if category == 'income':
-        self.fields['category'] = forms.ChoiceField(
-            choices = [
-                (category.pk, category.category_name)
-                for category in Category.incomes()
-            ],
+        self.fields['category'] = ObjectChoiceField(
+            registry.incomes(),
+            category_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
     elif category == 'expense':
-        self.fields['category'] = forms.ChoiceField(
-            choices = [
-                (category.pk, category.category_name)
-                for category in Category.expenses()
-            ],
+        self.fields['category'] = ObjectChoiceField(
+            registry.expenses(),
+            category_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
     else:
-        self.fields['account'] = forms.ChoiceField(
-            choices=[
-                (account.pk, f"{account.account_name} ({account.amount:.2f})")
-                for account in Account.amount_gt_zero()
-            ],
+        self.fields['account'] = ObjectChoiceField(
+            choices.accounts_with_amount(),
+            account_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
-        self.fields['to_account'] = forms.ChoiceField(
-            choices = [
-                (account.pk, f"{account.account_name} ({account.amount:.2f})")
-                for account in Account.list_of_accounts()
-            ],
+        self.fields['to_account'] = ObjectChoiceField(
+            choices.accounts(),
+            account_label,
             label_suffix='',
             widget=forms.Select(attrs={'class':'form-select'})
         )
 
 
+class PostingForm(forms.Form):
+    """
+    One posting of a batch (see `api_view.postings`). `accounts` and
+    `categories` map the ids to the cached objects, so validating a batch
+    doesn't query them. Like `ExpenseForm` and `TransferForm`, it only
+    takes expenses and transfers from an account with a balance.
+    """
+    TYPES = (
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+        ('transfer', 'Transfer'),
+    )
+    type = forms.ChoiceField(choices=TYPES)
+    account = forms.IntegerField()
+    category = forms.IntegerField(required=False)
+    to_account = forms.IntegerField(required=False)
+    amount = forms.DecimalField(
+        min_value=0.01,
+        max_digits=11,
+        decimal_places=2,
+    )
+    note = forms.CharField(max_length=200, required=False)
+    date_created = forms.DateTimeField()
+
+    def __init__(self, data, accounts, categories):
+        super().__init__(data)
+        self.accounts = accounts
+        self.categories = categories
+
+    def clean_account(self):
+        account = self.accounts.get(self.cleaned_data['account'])
+        if account is None:
+            raise ValidationError('No such account.')
+        return account
+
+    def clean_to_account(self):
+        to_account = self.cleaned_data['to_account']
+        if to_account is None:
+            return None
+        if to_account not in self.accounts:
+            raise ValidationError('No such account.')
+        return self.accounts[to_account]
+
+    def clean(self):
+        super().clean()
+        posting_type = self.cleaned_data.get('type')
+        account = self.cleaned_data.get('account')
+        # The accounts of `choices.accounts_with_amount()`.
+        if (posting_type in ('expense', 'transfer') and account is not None
+                and account.amount <= 0):
+            self.add_error('account', 'The account has no balance.')
+        if posting_type == 'transfer':
+            to_account = self.cleaned_data.get('to_account')
+            if to_account is None:
+                self.add_error('to_account', 'A transfer needs an account.')
+            elif to_account == self.cleaned_data.get('account'):
+                self.add_error('to_account', 'Accounts are the same.')
+            try:
+                self.cleaned_data['category'] = registry.transfer()
+            except Category.DoesNotExist:
+                self.add_error('type', 'There is no transfer category.')
+        elif posting_type is not None:
+            category = self.categories.get(self.cleaned_data.get('category'))
+            if category is None or category.category_type != posting_type:
+                self.add_error('category', f'No such {posting_type} category.')
+            else:
+                self.cleaned_data['category'] = category
+            self.cleaned_data['to_account'] = None
+        return self.cleaned_data
+
+    def to_record(self):
+        data = self.cleaned_data
+        return Ledger(
+            account=data['account'],
+            category=data['category'],
+            to_account=data['to_account'],
+            amount=float(data['amount']),
+            note=data['note'],
+            date_created=data['date_created'],
+        )
+
+
 class IncomeForm(NewRecordForm):
     auto_split = forms.BooleanField(
         label='Auto Split',
@@ -254,4 +365,303 @@ class CategoryForm(forms.Form):
         max_length=30,
     )
 
-    category_name.widget.attrs.update({'class': 'form-control'})
\ No newline at end of file
+    category_name.widget.attrs.update({'class': 'form-control'})
+
+class ImportForm(forms.Form):
+    """
+    Upload a bank file to import into the ledger.
+    """
+    FORMATS = (
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+        ('qif', 'QIF'),
+    )
+    file = forms.FileField(
+        label='File',
+        label_suffix='',
+    )
+    file_format = forms.ChoiceField(
+        label='Format',
+        label_suffix='',
+        choices=FORMATS,
+    )
+    resume = forms.IntegerField(
+        label='Resume import',
+        label_suffix='',
+        min_value=1,
+        required=False,
+        help_text='The import to carry on, after fixing its file.',
+    )
+
+    file.widget.attrs.update({'class': 'form-control'})
+    file_format.widget.attrs.update({'class': 'form-select'})
+    resume.widget.attrs.update({'class': 'form-control'})
+
+    def __init__(self, *args, **kwargs):
+        """
+        The rows of the file without an account are added to the
+        selected account.
+        """
+        super().__init__(*args, **kwargs)
+        self.fields['account'] = forms.ChoiceField(
+            label='Account',
+            choices=[
+                (account.pk, account.account_name)
+                for account in Account.list_of_accounts()
+            ],
+            label_suffix='',
+            widget=forms.Select(attrs={'class':'form-select'})
+        )
+
+
+class LedgerFilterForm(forms.Form):
+    """
+    Filters of the ledger, read from the query string.
+    """
+    start = forms.DateField(
+        label='From',
+        required=False,
+        widget=DateInput,
+        label_suffix='',
+    )
+    end = forms.DateField(
+        label='To',
+        required=False,
+        widget=DateInput,
+        label_suffix='',
+    )
+    account = forms.IntegerField(required=False)
+    category = forms.IntegerField(required=False)
+    category_type = forms.ChoiceField(
+        label='Type',
+        choices=(('', 'Any type'),) + Category.CATEGORY_TYPE,
+        required=False,
+        label_suffix='',
+    )
+    min_amount = forms.DecimalField(
+        label='Amount from',
+        min_value=0,
+        required=False,
+        label_suffix='',
+    )
+    max_amount = forms.DecimalField(
+        label='Amount to',
+        min_value=0,
+        required=False,
+        label_suffix='',
+    )
+    note = forms.CharField(max_length=200, required=False, label_suffix='')
+
+    def clean(self):
+        super().clean()
+        min_amount = self.cleaned_data.get('min_amount')
+        max_amount = self.cleaned_data.get('max_amount')
+        if (
+            min_amount is not None and max_amount is not None
+            and min_amount > max_amount
+        ):
+            self.add_error('max_amount', 'The maximum is below the minimum.')
+        return self.cleaned_data
+
+    def narrows(self):
+        """
+        Returns whether a filter other than the range of days is set.
+        """
+        return any(
+            self.cleaned_data.get(name) not in (None, '')
+            for name in (
+                'account', 'category', 'category_type', 'min_amount',
+                'max_amount', 'note',
+            )
+        )
+
+    def filter(self, records):
+        """
+        Returns the `records` queryset filtered by the fields of the
+        form. `account` matches both sides of a transfer. `note` is
+        looked up in the full-text index (see `search`).
+        """
+        data = self.cleaned_data
+        if data.get('start'):
+            records = records.filter(posted_on__gte=data['start'])
+        if data.get('end'):
+            records = records.filter(posted_on__lte=data['end'])
+        if data.get('account'):
+            records = records.filter(
+                Q(account=data['account']) | Q(to_account=data['account'])
+            )
+        if data.get('category'):
+            records = records.filter(category=data['category'])
+        if data.get('category_type'):
+            # The categories of the type, from the registry rather than
+            # a join.
+            records = records.filter(category__in=[
+                category.pk
+                for category in registry.of_type(data['category_type'])
+            ])
+        if data.get('min_amount') is not None:
+            records = records.filter(amount__gte=data['min_amount'])
+        if data.get('max_amount') is not None:
+            records = records.filter(amount__lte=data['max_amount'])
+        if data.get('note'):
+            records = search.matching(records, data['note'], column='note')
+        return records
+
+
+class RecordFilterForm(LedgerFilterForm):
+    """
+    The ledger filters of the records page, picking the account and the
+    category among the cached ones.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['account'] = forms.TypedChoiceField(
+            choices=[('', 'Any account')] + [
+                (account.pk, account.account_name)
+                for account in choices.accounts()
+            ],
+            coerce=int,
+            empty_value=None,
+            required=False,
+            label_suffix='',
+        )
+        self.fields['category'] = forms.TypedChoiceField(
+            choices=[('', 'Any category')] + [
+                (category.pk, category.category_name)
+                for category in registry.load().by_pk.values()
+            ],
+            coerce=int,
+            empty_value=None,
+            required=False,
+            label_suffix='',
+        )
+        # Styling the form fields.
+        for field in self.fields.values():
+            if isinstance(field.widget, forms.Select):
+                css_class = 'form-select form-select-sm'
+            else:
+                css_class = 'form-control form-control-sm'
+            field.widget.attrs.update({'class': css_class})
+
+
+class ExportForm(LedgerFilterForm):
+    FORMATS = (
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    )
+    format = forms.ChoiceField(choices=FORMATS, required=False)
+    gzip = forms.BooleanField(required=False)
+
+
+class CategoryFilterForm(forms.Form):
+    """
+    Filters of the categories, read from the query string.
+    """
+    type = forms.ChoiceField(choices=Category.CATEGORY_TYPE, required=False)
+
+    def filter(self, categories):
+        if self.cleaned_data.get('type'):
+            categories = categories.filter(
+                category_type=self.cleaned_data['type']
+            )
+        return categories
+
+
+class BudgetFilterForm(forms.Form):
+    """
+    Filters of the budgets, read from the query string.
+    """
+    year = forms.IntegerField(required=False)
+    month = forms.IntegerField(min_value=1, max_value=12, required=False)
+    category = forms.IntegerField(required=False)
+
+    def filter(self, budgets):
+        data = self.cleaned_data
+        if data.get('year'):
+            budgets = budgets.filter(year=data['year'])
+        if data.get('month'):
+            budgets = budgets.filter(month=data['month'])
+        if data.get('category'):
+            budgets = budgets.filter(category=data['category'])
+        return budgets
+
+
+class ReportForm(forms.Form):
+    """
+    Options of a report (see `reporting.Report`), read from the query
+    string.
+    """
+    PERIODS = (
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+        ('year', 'Year'),
+    )
+    GROUPS = (
+        ('category', 'Category'),
+        ('account', 'Account'),
+    )
+    start = forms.DateField(widget=DateInput, label_suffix='')
+    end = forms.DateField(widget=DateInput, label_suffix='')
+    period = forms.ChoiceField(choices=PERIODS, label_suffix='')
+    group_by = forms.ChoiceField(
+        choices=GROUPS, label='Group by', label_suffix=''
+    )
+    window = forms.IntegerField(
+        label='Moving average of',
+        min_value=1,
+        max_value=60,
+        initial=3,
+        required=False,
+        label_suffix='',
+    )
+
+    # Styling the form fields.
+    for field in (start, end, window):
+        field.widget.attrs.update({'class': 'form-control'})
+    for field in (period, group_by):
+        field.widget.attrs.update({'class': 'form-select'})
+    del field
+
+    def clean(self):
+        super().clean()
+        for name in ('start', 'end'):
+            day = self.cleaned_data.get(name)
+            if day and not reporting.FIRST_DAY <= day <= reporting.LAST_DAY:
+                self.add_error(name, (
+                    f'Reports cover {reporting.FIRST_DAY.year} to '
+                    f'{reporting.LAST_DAY.year}.'
+                ))
+        start = self.cleaned_data.get('start')
+        end = self.cleaned_data.get('end')
+        period = self.cleaned_data.get('period')
+        if start and end and start > end:
+            self.add_error('end', 'The end is before the start.')
+        elif start and end and period and reporting.bucket_count(
+            start, end, period
+        ) > reporting.MAX_BUCKETS:
+            self.add_error('end', (
+                f'A report has at most {reporting.MAX_BUCKETS} '
+                f'{period}s, choose a shorter range or a longer period.'
+            ))
+        if not self.cleaned_data.get('window'):
+            self.cleaned_data['window'] = 3
+        return self.cleaned_data
+
+
+class SearchForm(forms.Form):
+    """
+    A search of the records (see `search`), read from the query string.
+    """
+    q = forms.CharField(
+        label='Search',
+        max_length=200,
+        required=False,
+        label_suffix='',
+    )
+    offset = forms.IntegerField(min_value=0, required=False)
+
+    q.widget.attrs.update({
+        'class': 'form-control',
+        'placeholder': 'Note, category or account',
+    })
@@ -0,0 +1,392 @@
+"""
+Import records from bank files.
+
+The parsers are generators that read a file line by line and yield one
+`ImportRow` per transaction, so a file of any size is imported in
+constant memory. `LedgerImporter` maps the rows to accounts and
+categories and posts them in batches, each with one bulk INSERT and one
+UPDATE of the balances it changed.
+
+Each batch is committed on its own, so a large file doesn't hold the
+database's write lock, and the postings made meanwhile, for the whole
+import. The batch is committed with the number of rows of the file
+imported so far, in its `LedgerImport`. Importing the same file again
+skips those rows: an import stopped by a crash carries on where it
+stopped, and a file imported twice adds nothing. A file fixed after a
+bad line has another digest, it is resumed by the id of its import.
+"""
+import csv
+import hashlib
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import posting, registry
+from .models import Account, Category, Ledger, LedgerImport
+
+
+FORMATS = ('csv', 'ofx', 'qif')
+
+# `amount` is signed: positive for an income and negative for an
+# expense. `account` and `category` are names, or None to use the
+# importer's defaults.
+ImportRow = namedtuple(
+    'ImportRow', ['date_created', 'amount', 'note', 'account', 'category']
+)
+
+
+class ImportFileError(ValueError):
+    """
+    Raised when a line of the file can't be read.
+    """
+
+
+def parse_amount(value):
+    try:
+        return float(value.strip().replace(',', ''))
+    except ValueError:
+        raise ImportFileError(f'Invalid amount: {value!r}')
+
+
+def csv_rows(lines):
+    """
+    Yields the rows of a CSV file as dicts, as `csv.DictReader` does,
+    raising `ImportFileError` for a malformed line.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        yield from reader
+    except csv.Error as error:
+        raise ImportFileError(
+            f'Invalid CSV after line {reader.line_num}: {error}'
+        )
+
+
+def parse_csv(lines):
+    """
+    Parse a CSV file with a header. The `date` and `amount` columns are
+    required; `note`, `account`, `category` and `type` are optional. With
+    a `type` column (income or expense) the amounts may be positive for
+    both.
+
+    Dates are ISO formatted, with or without the time.
+    """
+    for row in csv_rows(lines):
+        row = {
+            key.strip().lower(): (value or '').strip()
+            for key, value in row.items() if key
+        }
+        try:
+            date_created = datetime.fromisoformat(row['date'])
+        except (KeyError, ValueError):
+            raise ImportFileError(f'Invalid date: {row.get("date")!r}')
+        amount = parse_amount(row.get('amount', ''))
+        category_type = row.get('type', '').lower()
+        if category_type == 'income':
+            amount = abs(amount)
+        elif category_type == 'expense':
+            amount = -abs(amount)
+        yield ImportRow(
+            date_created,
+            amount,
+            row.get('note', ''),
+            row.get('account') or None,
+            row.get('category') or None,
+        )
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def parse_ofx_date(value):
+    # YYYYMMDD[HHMMSS[.XXX]][[-5:EST]]
+    value = value.strip()
+    try:
+        if len(value) >= 14 and value[8:14].isdigit():
+            return datetime.strptime(value[:14], '%Y%m%d%H%M%S')
+        return datetime.strptime(value[:8], '%Y%m%d')
+    except ValueError:
+        raise ImportFileError(f'Invalid date: {value!r}')
+
+
+def parse_ofx(lines):
+    """
+    Parse the statement transactions (`<STMTTRN>`) of an OFX file, both
+    the SGML (1.x) and the XML (2.x) flavours.
+    """
+    transaction = None
+    for line in lines:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    transaction = {}
+                elif transaction is not None:
+                    yield ofx_row(transaction)
+                    transaction = None
+            elif transaction is not None and not closing:
+                transaction[tag] = value.strip()
+
+
+def ofx_row(transaction):
+    if 'DTPOSTED' not in transaction or 'TRNAMT' not in transaction:
+        raise ImportFileError(f'Incomplete transaction: {transaction!r}')
+    note = ' '.join(
+        value for value in (transaction.get('NAME'), transaction.get('MEMO'))
+        if value
+    )
+    return ImportRow(
+        parse_ofx_date(transaction['DTPOSTED']),
+        parse_amount(transaction['TRNAMT']),
+        note[:200],
+        None,
+        None,
+    )
+
+
+QIF_DATE = re.compile(r"(\d{1,4})[/.-](\d{1,2})[/.'-]\s*(\d{2,4})")
+
+
+def parse_qif_date(value):
+    """
+    QIF dates are M/D/YYYY, M/D'YY (for years after 2000) or YYYY-MM-DD.
+    """
+    match = QIF_DATE.match(value.strip())
+    if match is None:
+        raise ImportFileError(f'Invalid date: {value!r}')
+    first, second, third = (int(part) for part in match.groups())
+    if len(match.group(1)) == 4:
+        year, month, day = first, second, third
+    else:
+        month, day, year = first, second, third
+        if year < 100:
+            year += 2000 if "'" in value else 1900
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        raise ImportFileError(f'Invalid date: {value!r}')
+
+
+def parse_qif(lines):
+    """
+    Parse the transactions of a QIF file. A transaction is a list of
+    lines starting with a field code and ends with `^`.
+    """
+    transaction = {}
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        if line.startswith('^'):
+            if transaction:
+                yield qif_row(transaction)
+            transaction = {}
+            continue
+        # The first value of a field wins, later ones are the splits.
+        transaction.setdefault(line[0], line[1:])
+    if transaction:
+        yield qif_row(transaction)
+
+
+def qif_row(transaction):
+    amount = transaction.get('T', transaction.get('U'))
+    if 'D' not in transaction or amount is None:
+        raise ImportFileError(f'Incomplete transaction: {transaction!r}')
+    note = ' '.join(
+        value for value in (transaction.get('P'), transaction.get('M'))
+        if value
+    )
+    # Categories may be `Category:Subcategory` or `[Account]` for a
+    # transfer, use the top level name.
+    category = transaction.get('L', '').strip('[]').split(':')[0].strip()
+    return ImportRow(
+        parse_qif_date(transaction['D']),
+        parse_amount(amount),
+        note[:200],
+        None,
+        category or None,
+    )
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+    'qif': parse_qif,
+}
+
+
+def file_digest(chunks):
+    """
+    Returns the SHA-256 of a file read as the bytes `chunks`.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def start_import(digest, file_name='', resume=None):
+    """
+    Returns the `LedgerImport` of a file: the import `resume` if given,
+    else the latest import of the same content, else a new one. A resumed
+    import takes the `digest` of the fixed file, which is then known as
+    imported too.
+    """
+    if resume is not None:
+        try:
+            ledger_import = LedgerImport.objects.get(pk=resume)
+        except LedgerImport.DoesNotExist:
+            raise ImportFileError(f'There is no import {resume}.')
+        if ledger_import.digest != digest:
+            ledger_import.digest = digest
+            ledger_import.save(update_fields=['digest'])
+        return ledger_import
+    ledger_import = LedgerImport.objects.filter(
+        digest=digest
+    ).order_by('-pk').first()
+    if ledger_import is None:
+        ledger_import = LedgerImport.objects.create(
+            digest=digest, file_name=file_name[:200]
+        )
+    return ledger_import
+
+
+class ImportResult:
+    __slots__ = ('rows', 'skipped', 'seconds')
+
+    def __init__(self, rows, seconds, skipped=0):
+        self.rows = rows
+        self.skipped = skipped
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0
+
+    def __str__(self):
+        result = (
+            f'{self.rows} rows in {self.seconds:.2f}s '
+            f'({self.rows_per_second:.0f} rows/s)'
+        )
+        if self.skipped:
+            result += f', {self.skipped} imported before'
+        return result
+
+
+class LedgerImporter:
+    """
+    Post the rows of a parser to the ledger.
+
+    Rows without an account go to `account`. Rows without a category go
+    to the `income_category` or `expense_category` name. Accounts and
+    categories that don't exist yet are created.
+    """
+    def __init__(self, account=None, income_category='Uncategorized',
+                 expense_category='Uncategorized', batch_size=1000):
+        self.account = account
+        self.default_categories = {
+            'income': income_category,
+            'expense': expense_category,
+        }
+        self.batch_size = batch_size
+        self.accounts = {
+            account.account_name.lower(): account
+            for account in Account.objects.all()
+        }
+        self.categories = {
+            (category.category_type, category.category_name.lower()): category
+            for category_type in ('income', 'expense')
+            for category in registry.of_type(category_type)
+        }
+
+    def get_account(self, name):
+        if name is None:
+            if self.account is None:
+                raise ImportFileError('The row has no account.')
+            return self.account
+        account = self.accounts.get(name.lower())
+        if account is None:
+            account = Account.objects.create(account_name=name)
+            self.accounts[name.lower()] = account
+        return account
+
+    def get_category(self, category_type, name):
+        name = name or self.default_categories[category_type]
+        category = self.categories.get((category_type, name.lower()))
+        if category is None:
+            category = Category.objects.create(
+                category_type=category_type, category_name=name
+            )
+            self.categories[(category_type, name.lower())] = category
+        return category
+
+    def to_record(self, row):
+        date_created = row.date_created
+        if timezone.is_naive(date_created):
+            date_created = timezone.make_aware(date_created)
+        category_type = 'income' if row.amount >= 0 else 'expense'
+        return Ledger(
+            account=self.get_account(row.account),
+            category=self.get_category(category_type, row.category),
+            amount=round(abs(row.amount), 2),
+            note=row.note,
+            date_created=date_created,
+        )
+
+    def run(self, rows, ledger_import):
+        """
+        Import the `rows` a batch at a time, each batch in its own
+        transaction with the progress of `ledger_import`, after the rows
+        it imported already. Returns an `ImportResult`.
+        """
+        start = time.perf_counter()
+        skipped = ledger_import.rows
+        if ledger_import.finished:
+            return ImportResult(0, 0, skipped=skipped)
+        records = (
+            self.to_record(row) for row in islice(rows, skipped, None)
+        )
+        while True:
+            try:
+                batch = list(islice(records, self.batch_size))
+            except ImportFileError as error:
+                raise ImportFileError(
+                    f'{error} The {ledger_import.rows} rows before it are '
+                    f'imported: fix the file and resume import '
+                    f'{ledger_import.pk} to carry on after them.'
+                )
+            if not batch:
+                break
+            with transaction.atomic():
+                posting.post(batch)
+                # Another run of the same import has moved the count: the
+                # batch is rolled back.
+                if not LedgerImport.objects.filter(
+                    pk=ledger_import.pk, rows=ledger_import.rows
+                ).update(rows=F('rows') + len(batch)):
+                    raise ImportFileError(
+                        f'Import {ledger_import.pk} is running already.'
+                    )
+            ledger_import.rows += len(batch)
+        ledger_import.finished = True
+        ledger_import.save(update_fields=['finished'])
+        return ImportResult(
+            ledger_import.rows - skipped, time.perf_counter() - start,
+            skipped=skipped,
+        )
+
+
+def import_file(lines, file_format, ledger_import, **options):
+    """
+    Import the lines of a file in `file_format` as `ledger_import` (see
+    `start_import`). `options` are passed to `LedgerImporter`.
+    """
+    return LedgerImporter(**options).run(
+        PARSERS[file_format](lines), ledger_import
+    )
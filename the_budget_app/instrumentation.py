@@ -0,0 +1,124 @@
+"""
+Timings of a request: its SQL queries, its template rendering and its
+total time, collected for `middleware.server_timing_middleware`.
+
+The timings of the current request are held in a context variable, so
+that the SQL wrapper and the template timer find them whatever the
+thread: the async ORM runs its queries in a worker thread, which gets
+a copy of the context. Nothing here runs unless `SERVER_TIMING` is set.
+"""
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+
+class Timings:
+    """
+    The counters of one request. Durations are in seconds.
+    """
+    __slots__ = (
+        'start', 'total', 'queries', 'sql', 'template', 'template_depth',
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.template_depth = 0
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+
+    def header(self):
+        """
+        Returns the value of the Server-Timing header, in milliseconds.
+        """
+        return ', '.join([
+            f'sql;desc="{self.queries} queries";dur={self.sql * 1000:.1f}',
+            f'template;dur={self.template * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql * 1000, 1),
+            'template_ms': round(self.template * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+current = ContextVar('the_budget_app_timings', default=None)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper (see `connection.execute_wrapper`) counting
+    the queries of the current request and their time.
+    """
+    timings = current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql += time.perf_counter() - start
+
+
+def install_execute_wrapper(wrapper):
+    """
+    Add the execute `wrapper` (see `connection.execute_wrapper`) to the
+    open connections of this thread and to every connection opened
+    later, in any thread. The `connection.execute_wrapper` context
+    manager would only wrap the connection of the thread of the
+    middleware, while the async ORM queries from a worker thread.
+    """
+    def add_wrapper(connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    for connection in connections.all():
+        add_wrapper(connection)
+    connection_created.connect(
+        add_wrapper,
+        weak=False,
+        dispatch_uid=f'{wrapper.__module__}.{wrapper.__qualname__}',
+    )
+
+
+def install_sql_wrapper():
+    install_execute_wrapper(sql_wrapper)
+
+
+def install_template_timer():
+    """
+    Time the rendering of the templates. Django only sends its
+    `template_rendered` signal under the test runner, which does it by
+    replacing `Template._render`. The timer wraps it the same way. The
+    templates included or extended by another are counted with it.
+    """
+    render = Template._render
+    if getattr(render, 'timed', False):
+        return
+
+    def timed_render(self, context):
+        timings = current.get()
+        if timings is None or timings.template_depth:
+            return render(self, context)
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timings.template_depth -= 1
+            timings.template += time.perf_counter() - start
+
+    timed_render.timed = True
+    Template._render = timed_render
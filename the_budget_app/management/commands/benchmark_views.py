@@ -0,0 +1,72 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync views (WSGI, a thread per request) with the '
+        'async views (ASGI, one event loop) under concurrent requests. '
+        'The requests are made in process with the test clients, on the '
+        'current database.'
+    )
+
+    PATHS = ['/', '/accounts', '/records', '/budget']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests per path and mode.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Requests in flight at once.',
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, repeat for several. Defaults to the '
+                 'dashboard, accounts, records and budget pages.',
+        )
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        concurrency = options['concurrency']
+        # The test clients send their requests to `testserver`.
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for path in options['paths'] or self.PATHS:
+                sync_rate = self.run_sync(path, requests, concurrency)
+                async_rate = asyncio.run(
+                    self.run_async(path, requests, concurrency)
+                )
+                self.stdout.write(
+                    f'{path:<12} sync {sync_rate:8.1f} req/s   '
+                    f'async {async_rate:8.1f} req/s'
+                )
+
+    def check_response(self, path, response):
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}.')
+
+    def run_sync(self, path, requests, concurrency):
+        def get(_):
+            self.check_response(path, Client().get(path))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(get, range(requests)))
+        return requests / (time.perf_counter() - start)
+
+    async def run_async(self, path, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get():
+            async with semaphore:
+                self.check_response(path, await client.get(path))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(get() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import exporters
+from ...forms import ExportForm
+from ...models import Ledger
+
+
+class Command(BaseCommand):
+    help = 'Export the ledger as CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=exporters.FORMATS, default='csv'
+        )
+        parser.add_argument(
+            '--output', help='File to write. Defaults to the standard output.'
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--start', help='First date, YYYY-MM-DD.')
+        parser.add_argument('--end', help='Last date, YYYY-MM-DD.')
+        parser.add_argument('--account', type=int, help='Account id.')
+        parser.add_argument('--category', type=int, help='Category id.')
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            field: options[field]
+            for field in ('start', 'end', 'account', 'category')
+            if options[field] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        chunks = exporters.export(
+            options['format'], form.filter(Ledger.rows()), options['gzip']
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            output = sys.stdout.buffer
+            output.writelines(chunks)
+            output.flush()
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importers import (
+    FORMATS, ImportFileError, file_digest, import_file, start_import,
+)
+from ...models import Account
+
+
+class Command(BaseCommand):
+    help = 'Import records to the ledger from a CSV, OFX or QIF file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Format of the file. Defaults to the file extension.',
+        )
+        parser.add_argument(
+            '--account',
+            help='Account of the rows without one. Created if missing.',
+        )
+        parser.add_argument(
+            '--income-category',
+            default='Uncategorized',
+            help='Category of the incomes without one.',
+        )
+        parser.add_argument(
+            '--expense-category',
+            default='Uncategorized',
+            help='Category of the expenses without one.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows per INSERT and per transaction.',
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            help='Import to carry on after fixing its file. The same file '
+                 'is carried on without it.',
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Encoding of the file. The default reads UTF-8 with or '
+                 'without a byte order mark.',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Unknown format {file_format!r}, use --format.'
+            )
+        account = None
+        if options['account']:
+            account = Account.objects.filter(
+                account_name=options['account']
+            ).first() or Account.objects.create(
+                account_name=options['account']
+            )
+
+        try:
+            with open(path, 'rb') as file:
+                digest = file_digest(iter(lambda: file.read(1 << 20), b''))
+            ledger_import = start_import(
+                digest, path.name, options['resume']
+            )
+            with open(path, encoding=options['encoding'], newline='') as lines:
+                result = import_file(
+                    lines,
+                    file_format,
+                    ledger_import,
+                    account=account,
+                    income_category=options['income_category'],
+                    expense_category=options['expense_category'],
+                    batch_size=options['batch_size'],
+                )
+        except (OSError, UnicodeDecodeError, ImportFileError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'Imported {result}.'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the monthly category totals from the ledger, then verify '
+        'them against it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only compare the saved totals with the ledger.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = rollup.rebuild()
+            self.stdout.write(f'Rebuilt {count} monthly totals.')
+
+        mismatches = rollup.verify()
+        for (category_id, year, month), saved, expected in mismatches:
+            self.stderr.write(
+                f'Category {category_id}, {year}-{month:02}: '
+                f'saved {saved}, expected {expected}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} monthly totals do not match the ledger.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Monthly totals match the ledger.'
+        ))
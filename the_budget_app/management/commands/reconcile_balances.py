@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import balances
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the balance of every account with the ledger and report '
+        'the drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Set the drifting balances back to the ledger.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        drifts = balances.reconcile(repair=options['repair'])
+        elapsed = time.perf_counter() - start
+
+        for drift in drifts:
+            self.stdout.write(str(drift))
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS(
+                f'Balances match the ledger ({elapsed:.2f}s).'
+            ))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired {len(drifts)} balances ({elapsed:.2f}s).'
+            ))
+        else:
+            raise CommandError(
+                f'{len(drifts)} balances do not match the ledger, '
+                'run with --repair to fix them.'
+            )
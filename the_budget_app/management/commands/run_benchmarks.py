@@ -0,0 +1,135 @@
+import json
+import logging
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django.utils import timezone
+
+from ...benchmarks import data, runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every URL of the app and the posting paths at several data '
+        'scales, on a throwaway test database, and write the results as '
+        'JSON to compare them between commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=int, action='append', dest='scales',
+            help='Records to seed, repeat for several. Defaults to 10000 '
+                 'and 100000.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Timed requests per case.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='File to write the results to.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results of an earlier run to compare with.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Slowdown from which a case is marked, 0.2 for 20%%.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        baseline = None
+        if options['compare']:
+            path = Path(options['compare'])
+            try:
+                baseline = json.loads(path.read_text())
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Cannot read {path}: {error}')
+
+        results = {
+            'commit': self.commit(),
+            'created': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'repeat': options['repeat'],
+            'scales': {},
+        }
+        # The error responses are in the results, not worth logging.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        # The test databases are created apart from the configured ones
+        # and dropped at the end, so the real data is never touched. So is
+        # the cache: the configured one is shared with the app running on
+        # the real data, which must not read what the benchmark caches.
+        cache_dir = tempfile.mkdtemp(prefix='the_budget_cache_')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # The test client sends its requests to `testserver`.
+            with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {
+                    'BACKEND':
+                        'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': cache_dir,
+                    'OPTIONS': {'MAX_ENTRIES': 10000},
+                }},
+            ):
+                for scale in options['scales'] or [10000, 100000]:
+                    results['scales'][str(scale)] = self.run_scale(
+                        scale, options['repeat'], options['seed']
+                    )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        Path(options['output']).write_text(json.dumps(results, indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f'Results written to {options["output"]}.'
+        ))
+        if baseline is not None:
+            for line in runner.compare(
+                baseline, results, options['tolerance']
+            ):
+                self.stdout.write(line)
+
+    def run_scale(self, scale, repeat, seed):
+        start = time.perf_counter()
+        data.seed(records=scale, random_seed=seed)
+        seed_seconds = time.perf_counter() - start
+        self.stdout.write(f'Seeded {scale} records in {seed_seconds:.1f}s.')
+
+        cases = runner.run(repeat)
+        for name, timing in cases.items():
+            self.stdout.write(
+                f'{scale:>9} {name:<28} {timing["median_ms"]:9.2f} ms '
+                f'{timing["queries"]:4} queries  {timing["status"]}'
+            )
+        return {'seed_seconds': round(seed_seconds, 1), 'cases': cases}
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmarks import data
+from ...models import Ledger
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a synthetic ledger for benchmarking: '
+        'accounts, categories, budgets and records, with their balances, '
+        'monthly totals and snapshots.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000)
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument(
+            '--incomes', type=int, default=6,
+            help='Income categories.',
+        )
+        parser.add_argument(
+            '--expenses', type=int, default=18,
+            help='Expense categories.',
+        )
+        parser.add_argument(
+            '--years', type=int, default=3,
+            help='Years the records are spread over, up to today.',
+        )
+        parser.add_argument(
+            '--budget-months', type=int, default=12,
+            help='Months with a budget for every expense category.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the existing accounts, categories and records.',
+        )
+
+    def handle(self, *args, **options):
+        if options['accounts'] < 1:
+            raise CommandError('At least one account is needed.')
+        if Ledger.objects.exists() and not options['clear']:
+            raise CommandError(
+                'The database has records already, run with --clear to '
+                'replace them.'
+            )
+        counts = data.seed(
+            records=options['records'],
+            accounts=options['accounts'],
+            incomes=options['incomes'],
+            expenses=options['expenses'],
+            years=options['years'],
+            budget_months=options['budget_months'],
+            random_seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Created {records} records, {accounts} accounts, {categories} '
+            'categories and {budgets} budgets.'.format(**counts)
+        ))
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Sum up the slow query log by query shape, the most costly '
+        'first, with the views and the code that ran them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=settings.SLOW_QUERY_LOG_FILE,
+            help='The slow query log, SLOW_QUERY_LOG_FILE by default.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Number of query shapes to show.',
+        )
+        parser.add_argument(
+            '--order',
+            choices=['total', 'max', 'count'],
+            default='total',
+            help='Rank the shapes by total time, longest query or count.',
+        )
+
+    def handle(self, *args, **options):
+        if not slow_queries.log_files(options['file']):
+            raise CommandError(f'No slow query log at {options["file"]}.')
+        summaries = slow_queries.summarize(slow_queries.read(options['file']))
+        if not summaries:
+            self.stdout.write('No slow queries logged.')
+            return
+        key = {
+            'total': 'total_ms',
+            'max': 'max_ms',
+            'count': 'count',
+        }[options['order']]
+        summaries.sort(key=lambda summary: summary[key], reverse=True)
+
+        for summary in summaries[:options['limit']]:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['total_ms']:.0f}ms in {summary['count']} "
+                f"queries, up to {summary['max_ms']:.0f}ms"
+            ))
+            self.stdout.write(f"  {summary['shape']}")
+            for view, count in summary['views'].most_common(3):
+                self.stdout.write(f'  view: {view} ({count})')
+            for frame, count in summary['frames'].most_common(3):
+                self.stdout.write(f'  code: {frame} ({count})')
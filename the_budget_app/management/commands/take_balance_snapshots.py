@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from ... import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Take the month end balance snapshots of the accounts since the '
+        'latest one. Run it once a month, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Last day to take snapshots for (YYYY-MM-DD). Defaults '
+                 'to the end of last month.',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Delete every snapshot and take them again from the '
+                 'ledger.',
+        )
+
+    def handle(self, *args, **options):
+        take = snapshots.rebuild if options['rebuild'] else snapshots.take
+        count = take(options['until'])
+        self.stdout.write(self.style.SUCCESS(f'Took {count} snapshots.'))
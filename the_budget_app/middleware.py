@@ -0,0 +1,110 @@
+import json
+import logging
+from asyncio import iscoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from . import instrumentation, slow_queries
+
+
+# URL configuration with the async views, used for ASGI requests.
+ASGI_URLCONF = 'the_budget.asgi_urls'
+
+timing_logger = logging.getLogger('the_budget_app.timing')
+
+
+@sync_and_async_middleware
+def async_urlconf_middleware(get_response):
+    """
+    Route the requests served by ASGI to the async views. Under WSGI the
+    sync views are kept, as an async view there would need its own event
+    loop per request.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            request.urlconf = ASGI_URLCONF
+            return await get_response(request)
+    else:
+        def middleware(request):
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """
+    Time the SQL queries, the template rendering and the whole of every
+    request (see `instrumentation`). The timings are sent back in the
+    `Server-Timing` header, which the browser shows with the request,
+    and logged as JSON to the `the_budget_app.timing` logger.
+
+    Enabled by the `SERVER_TIMING` setting. Without it the middleware
+    is left out when the server starts and costs nothing.
+    """
+    if not getattr(settings, 'SERVER_TIMING', False):
+        raise MiddlewareNotUsed
+    instrumentation.install_sql_wrapper()
+    instrumentation.install_template_timer()
+
+    def finish(request, response, timings):
+        timings.stop()
+        response['Server-Timing'] = timings.header()
+        timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.as_dict(),
+        }))
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings = instrumentation.Timings()
+            token = instrumentation.current.set(timings)
+            try:
+                response = await get_response(request)
+            finally:
+                instrumentation.current.reset(token)
+            return finish(request, response, timings)
+    else:
+        def middleware(request):
+            timings = instrumentation.Timings()
+            token = instrumentation.current.set(timings)
+            try:
+                response = get_response(request)
+            finally:
+                instrumentation.current.reset(token)
+            return finish(request, response, timings)
+    return middleware
+
+
+@sync_and_async_middleware
+def slow_query_middleware(get_response):
+    """
+    Log the SQL queries slower than `SLOW_QUERY_MS` milliseconds with
+    the view that ran them (see `slow_queries`). Without the setting
+    the middleware is left out when the server starts.
+    """
+    milliseconds = getattr(settings, 'SLOW_QUERY_MS', None)
+    if milliseconds is None:
+        raise MiddlewareNotUsed
+    slow_queries.configure(milliseconds)
+    instrumentation.install_execute_wrapper(slow_queries.slow_query_wrapper)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = slow_queries.current_request.set(request)
+            try:
+                return await get_response(request)
+            finally:
+                slow_queries.current_request.reset(token)
+    else:
+        def middleware(request):
+            token = slow_queries.current_request.set(request)
+            try:
+                return get_response(request)
+            finally:
+                slow_queries.current_request.reset(token)
+    return middleware
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0008_remove_budget_end_date_remove_budget_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['date_created', 'id'], name='ledger_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['category', 'date_created'], name='ledger_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['account', 'date_created'], name='ledger_account_date_idx'),
+        ),
+    ]
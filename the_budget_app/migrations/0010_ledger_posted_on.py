@@ -0,0 +1,50 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_posted_on(apps, schema_editor):
+    """
+    Set `posted_on` to the local date of `date_created` for the existing
+    records, a batch at a time.
+    """
+    Ledger = apps.get_model('the_budget_app', 'Ledger')
+    batch = []
+    records = Ledger.objects.only('date_created').iterator(chunk_size=2000)
+    for record in records:
+        record.posted_on = timezone.localdate(record.date_created)
+        batch.append(record)
+        if len(batch) == 2000:
+            Ledger.objects.bulk_update(batch, ['posted_on'])
+            batch = []
+    Ledger.objects.bulk_update(batch, ['posted_on'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0009_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledger',
+            name='posted_on',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_posted_on, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ledger',
+            name='posted_on',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='ledger',
+            name='ledger_category_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['category', 'posted_on'], name='ledger_category_posted_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+import django.db.models.deletion
+
+
+def build_monthly_totals(apps, schema_editor):
+    """
+    Fill the totals from the records already in the ledger.
+    """
+    Ledger = apps.get_model('the_budget_app', 'Ledger')
+    MonthlyCategoryTotal = apps.get_model(
+        'the_budget_app', 'MonthlyCategoryTotal'
+    )
+    groups = Ledger.objects.filter(
+        category__category_type__in=['income', 'expense'],
+    ).values(
+        'category',
+        'category__category_type',
+        year=ExtractYear('posted_on'),
+        month=ExtractMonth('posted_on'),
+    ).annotate(
+        total=models.Sum('amount'),
+        count=models.Count('id'),
+    ).order_by()
+    totals = []
+    for group in groups.iterator():
+        category_type = group['category__category_type']
+        totals.append(MonthlyCategoryTotal(
+            category_id=group['category'],
+            year=group['year'],
+            month=group['month'],
+            **{
+                f'{category_type}_total': group['total'],
+                f'{category_type}_count': group['count'],
+            }
+        ))
+    MonthlyCategoryTotal.objects.bulk_create(totals, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0010_ledger_posted_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('income_total', models.FloatField(default=0)),
+                ('income_count', models.IntegerField(default=0)),
+                ('expense_total', models.FloatField(default=0)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='the_budget_app.category')),
+            ],
+            options={
+                'db_table': 'monthly_category_total',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='monthlycategorytotal',
+            index=models.Index(fields=['year', 'month'], name='monthly_total_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycategorytotal',
+            constraint=models.UniqueConstraint(fields=('category', 'year', 'month'), name='monthly_category_total_unique'),
+        ),
+        migrations.RunPython(build_monthly_totals, migrations.RunPython.noop),
+    ]
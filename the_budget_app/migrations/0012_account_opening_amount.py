@@ -0,0 +1,63 @@
+# Generated by Django 4.1.3 on 2026-10-18 11:05
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+logger = logging.getLogger('the_budget_app.migrations')
+
+
+def set_opening_amount(apps, schema_editor):
+    """
+    Take the current balances as right: the opening amount is what is
+    left of them after taking back the records of the ledger.
+
+    Until now nothing told the initial amount and the hand edits of an
+    account from a drift of its balance, so the opening amount takes in
+    all of them and `balances.find_drift` won't see that drift. Each one
+    is logged to be checked against the account's real balance.
+    """
+    Account = apps.get_model('the_budget_app', 'Account')
+    Ledger = apps.get_model('the_budget_app', 'Ledger')
+    own = Ledger.objects.filter(account=OuterRef('pk')).values(
+        'account'
+    ).annotate(
+        total=Sum(Case(
+            When(category__category_type='income', then=F('amount')),
+            default=-F('amount'),
+        ))
+    ).values('total')
+    incoming = Ledger.objects.filter(to_account=OuterRef('pk')).values(
+        'to_account'
+    ).annotate(total=Sum('amount')).values('total')
+    Account.objects.update(
+        opening_amount=F('amount')
+        - Coalesce(Subquery(own), Value(0.0))
+        - Coalesce(Subquery(incoming), Value(0.0))
+    )
+    for account in Account.objects.exclude(opening_amount=0).order_by('pk'):
+        logger.warning(
+            'Account %s (%s): %.2f of its balance of %.2f has no record, '
+            'taken as its opening amount.',
+            account.pk, account.account_name, account.opening_amount,
+            account.amount,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0011_monthlycategorytotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='opening_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(set_opening_amount, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 20:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0012_account_opening_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('ledger_total', models.FloatField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='the_budget_app.account')),
+            ],
+            options={
+                'db_table': 'account_balance_snapshot',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='accountbalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'as_of'), name='account_balance_snapshot_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['account', 'posted_on'], name='ledger_account_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['to_account', 'posted_on'], name='ledger_to_account_posted_idx'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 4.1.3 on 2026-10-18 20:05
+
+from django.db import migrations
+
+
+# The full-text index of the records, see `search`. The triggers keep it
+# in sync with the ledger and with the names of the accounts and
+# categories, whatever the path that writes them.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE ledger_search USING fts5(
+        note, category_name, account_name, to_account_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER ledger_search_insert AFTER INSERT ON ledger BEGIN
+        INSERT INTO ledger_search (
+            rowid, note, category_name, account_name, to_account_name
+        ) VALUES (
+            NEW.id,
+            NEW.note,
+            (SELECT category_name FROM category WHERE id = NEW.category_id),
+            (SELECT account_name FROM account WHERE id = NEW.account_id),
+            (SELECT account_name FROM account WHERE id = NEW.to_account_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER ledger_search_update
+    AFTER UPDATE OF note, category_id, account_id, to_account_id ON ledger
+    BEGIN
+        UPDATE ledger_search SET
+            note = NEW.note,
+            category_name = (
+                SELECT category_name FROM category WHERE id = NEW.category_id
+            ),
+            account_name = (
+                SELECT account_name FROM account WHERE id = NEW.account_id
+            ),
+            to_account_name = (
+                SELECT account_name FROM account WHERE id = NEW.to_account_id
+            )
+        WHERE rowid = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER ledger_search_delete AFTER DELETE ON ledger BEGIN
+        DELETE FROM ledger_search WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER ledger_search_category AFTER UPDATE OF category_name
+    ON category WHEN OLD.category_name IS NOT NEW.category_name BEGIN
+        UPDATE ledger_search SET category_name = NEW.category_name
+        WHERE rowid IN (SELECT id FROM ledger WHERE category_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER ledger_search_account AFTER UPDATE OF account_name
+    ON account WHEN OLD.account_name IS NOT NEW.account_name BEGIN
+        UPDATE ledger_search SET account_name = NEW.account_name
+        WHERE rowid IN (SELECT id FROM ledger WHERE account_id = NEW.id);
+        UPDATE ledger_search SET to_account_name = NEW.account_name
+        WHERE rowid IN (SELECT id FROM ledger WHERE to_account_id = NEW.id);
+    END
+    """,
+    """
+    INSERT INTO ledger_search (
+        rowid, note, category_name, account_name, to_account_name
+    )
+    SELECT ledger.id, ledger.note, category.category_name,
+           account.account_name, to_account.account_name
+    FROM ledger
+    INNER JOIN category ON category.id = ledger.category_id
+    INNER JOIN account ON account.id = ledger.account_id
+    LEFT OUTER JOIN account AS to_account
+        ON to_account.id = ledger.to_account_id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS ledger_search_account',
+    'DROP TRIGGER IF EXISTS ledger_search_category',
+    'DROP TRIGGER IF EXISTS ledger_search_delete',
+    'DROP TRIGGER IF EXISTS ledger_search_update',
+    'DROP TRIGGER IF EXISTS ledger_search_insert',
+    'DROP TABLE IF EXISTS ledger_search',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # FTS5 is SQLite only.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0013_accountbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.3 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0014_ledger_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['account', 'to_account', 'category', 'posted_on', 'amount'], name='ledger_facet_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.3 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('the_budget_app', '0015_ledger_facet_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('file_name', models.CharField(blank=True, max_length=200)),
+                ('rows', models.IntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ledger_import',
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -9,6 +10,9 @@ class Account(models.Model):
     account_name = models.CharField(max_length=200)
     splitting_percent = models.IntegerField(default=0)
     amount = models.FloatField(default=0)
+    # Balance before the first record of the ledger. `amount` should
+    # always be this plus the records of the account (see `balances`).
+    opening_amount = models.FloatField(default=0)
 
     class Meta:
         db_table = 'account'
@@ -132,9 +136,48 @@ class Ledger(models.Model):
     amount = models.FloatField(default=0)
     note = models.CharField(max_length=200, blank=True)
     date_created = models.DateTimeField()
+    # Local date of `date_created`. Filter on this column instead of
+    # `date_created__month` and the like, which run a timezone conversion
+    # on every row and can't use an index.
+    posted_on = models.DateField(db_index=True)
 
     class Meta:
         db_table = 'ledger'
+        indexes = [
+            # Records list, newest first.
+            models.Index(
+                fields=['date_created', 'id'], name='ledger_date_idx'
+            ),
+            # Spent per category over a period, e.g. for budgets.
+            models.Index(
+                fields=['category', 'posted_on'],
+                name='ledger_category_posted_idx',
+            ),
+            # History of an account.
+            models.Index(
+                fields=['account', 'date_created'],
+                name='ledger_account_date_idx',
+            ),
+            # Records of an account since a balance snapshot.
+            models.Index(
+                fields=['account', 'posted_on'],
+                name='ledger_account_posted_idx',
+            ),
+            models.Index(
+                fields=['to_account', 'posted_on'],
+                name='ledger_to_account_posted_idx',
+            ),
+            # Facet counts of the records page (see `facets`). The index
+            # covers the GROUP BY, the grouped columns and the summed
+            # amount, so the query reads the index and not the table.
+            models.Index(
+                fields=[
+                    'account', 'to_account', 'category', 'posted_on',
+                    'amount',
+                ],
+                name='ledger_facet_idx',
+            ),
+        ]
 
     def __str__(self):
         return str(
@@ -146,7 +189,140 @@ class Ledger(models.Model):
                 self.note[:6],
             )
         )
-        
+
+    def save(self, *args, **kwargs):
+        self.posted_on = Ledger.local_date(self.date_created)
+        super().save(*args, **kwargs)
+
+    def local_date(date_created):
+        """
+        Returns the date of `date_created` in the current time zone.
+        """
+        if timezone.is_aware(date_created):
+            return timezone.localdate(date_created)
+        return date_created.date()
+
+    def in_month(year, month):
+        """
+        Returns the records posted in the month of the year.
+        """
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        return Ledger.objects.filter(posted_on__gte=start, posted_on__lt=end)
+
+    # Fields of the named tuples returned by `rows()`.
+    ROW_FIELDS = (
+        'id',
+        'date_created',
+        'amount',
+        'note',
+        'category_name',
+        'category_type',
+        'account_name',
+        'to_account_name',
+    )
+
+    def rows():
+        """
+        Returns the records as light weight named tuples, joined with the
+        names of their account and category in the same query. Use this
+        for lists instead of model instances, which load their account
+        and category one query per record.
+        """
+        return Ledger.objects.annotate(
+            category_name=models.F('category__category_name'),
+            category_type=models.F('category__category_type'),
+            account_name=models.F('account__account_name'),
+            to_account_name=models.F('to_account__account_name'),
+        ).values_list(*Ledger.ROW_FIELDS, named=True)
+
+
+class MonthlyCategoryTotal(models.Model):
+    """
+    Income and expense totals of a category for a month. Kept up to date
+    with every record added or deleted (see `rollup`), so pages showing
+    monthly totals read one row per category instead of the ledger.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    income_total = models.FloatField(default=0)
+    income_count = models.IntegerField(default=0)
+    expense_total = models.FloatField(default=0)
+    expense_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'monthly_category_total'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'year', 'month'],
+                name='monthly_category_total_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['year', 'month'], name='monthly_total_month_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return str(
+            (
+                self.category_id,
+                self.year,
+                self.month,
+                self.income_total,
+                self.expense_total,
+            )
+        )
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Total of the ledger of an account at the end of `as_of`, usually a
+    month end (see `snapshots`). The balance of an account at any date
+    starts from the latest snapshot before it, so only the records posted
+    since are summed.
+
+    The opening amount isn't part of the snapshot: it has no date and may
+    change with the account.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    as_of = models.DateField()
+    ledger_total = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'account_balance_snapshot'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'as_of'],
+                name='account_balance_snapshot_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return str((self.account_id, self.as_of, self.ledger_total))
+
+
+class LedgerImport(models.Model):
+    """
+    A file imported into the ledger (see `importers`), known by the
+    SHA-256 `digest` of its content. Its rows are committed a batch at a
+    time with the count of the `rows` imported so far, so that importing
+    the file again carries on after them instead of posting them twice.
+    """
+    digest = models.CharField(max_length=64, db_index=True)
+    file_name = models.CharField(max_length=200, blank=True)
+    rows = models.IntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_import'
+
+    def __str__(self):
+        return str((self.pk, self.file_name, self.rows, self.finished))
+
 
 class AppData:
     """
@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination.
+
+An OFFSET page has to walk past every row before it, so the deeper the
+user scrolls the slower the page gets. A keyset page instead filters on
+the sort key of the last row already shown, which lets the database seek
+straight to the next row through an index. The cost of a page stays the
+same no matter how deep it is or how big the table grows.
+"""
+import base64
+import json
+from datetime import datetime
+from operator import attrgetter
+
+from django.db.models import Q
+
+
+PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor sent by the client can't be decoded.
+    """
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key of a row into an opaque, url safe string.
+    """
+    values = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def aware_datetime(value):
+    """
+    Parse a datetime of a cursor. The keys are aware datetimes, a naive
+    one can't be compared with them nor be put in a time zone.
+    """
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        raise ValueError(f'Naive datetime: {value}')
+    return value
+
+
+def decode_cursor(cursor, parsers):
+    """
+    Decode a cursor made by `encode_cursor`. `parsers` converts each
+    value of the key back to its python type.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        if len(values) != len(parsers):
+            raise InvalidCursor(cursor)
+        return tuple(
+            parse(value) for parse, value in zip(parsers, values)
+        )
+    except (TypeError, ValueError) as error:
+        raise InvalidCursor(cursor) from error
+
+
+def keyset_filter(fields, values, descending=True):
+    """
+    Returns the `Q` object that selects the rows after `values` in the
+    ordering of `fields`.
+
+    (a, b) < (x, y) is expanded to `a <= x AND (a < x OR (a = x AND
+    b < y))`. The redundant `a <= x` lets the database seek into a
+    composite index on the fields instead of scanning it from the start.
+    """
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for index, (field, value) in enumerate(zip(fields, values)):
+        equals = {f: v for f, v in zip(fields[:index], values[:index])}
+        condition |= Q(**equals, **{f'{field}__{lookup}': value})
+    return Q(**{f'{fields[0]}__{lookup}e': values[0]}) & condition
+
+
+class Page:
+    """
+    A page of rows and the cursor for the page after it.
+    """
+    __slots__ = ('rows', 'next_cursor')
+
+    def __init__(self, rows, next_cursor):
+        self.rows = rows
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def page_queryset(queryset, fields, parsers, cursor, size, descending):
+    """
+    Returns `queryset` filtered on the `cursor`, ordered and sliced to
+    the rows of the page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, parsers)
+        queryset = queryset.filter(
+            keyset_filter(fields, values, descending)
+        )
+    ordering = [f'-{field}' if descending else field for field in fields]
+    # Fetch one extra row to know if there is a next page without
+    # running a COUNT over the whole table.
+    return queryset.order_by(*ordering)[:size + 1]
+
+
+def make_page(rows, fields, size, key):
+    if key is None:
+        key = attrgetter(*fields) if len(fields) > 1 else (
+            lambda row: (getattr(row, fields[0]),)
+        )
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return Page(rows, next_cursor)
+
+
+def paginate(queryset, fields, parsers, cursor=None, size=PAGE_SIZE,
+             descending=True, key=None):
+    """
+    Returns a `Page` of `queryset` ordered by `fields`.
+
+    The last field must be unique (usually the primary key) so that
+    every row has its own position. `key` returns the values of `fields`
+    from a fetched row; by default they are read as attributes.
+    """
+    rows = page_queryset(
+        queryset, fields, parsers, cursor, size, descending
+    )
+    return make_page(list(rows), fields, size, key)
+
+
+async def apaginate(queryset, fields, parsers, cursor=None, size=PAGE_SIZE,
+                    descending=True, key=None):
+    """
+    Async version of `paginate`.
+    """
+    rows = page_queryset(
+        queryset, fields, parsers, cursor, size, descending
+    )
+    return make_page([row async for row in rows], fields, size, key)
@@ -0,0 +1,215 @@
+"""
+Posting records to the ledger.
+
+Every change of the ledger goes through this module so that the account
+balances, the monthly totals and the balance snapshots always move
+together with it, in one transaction per posting.
+
+Balances are changed by the database with `UPDATE account SET amount =
+amount + x` instead of reading `Account.amount` into Python and saving
+it back, which loses updates when two requests post at the same time.
+The balance UPDATE is also the first statement of the transaction, so
+on SQLite a posting takes the write lock right away and waits for the
+other postings instead of failing to upgrade a read lock.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Subquery, Value, When
+
+from . import choices, registry, rollup, snapshots, timeline
+from .models import Account, Ledger
+
+
+def balance_deltas(records, sign=1):
+    """
+    Returns the change of balance per account id made by adding
+    (`sign=1`) or removing (`sign=-1`) the `records`.
+    """
+    deltas = defaultdict(float)
+    for record in records:
+        category_type = record.category.category_type
+        if category_type == 'income':
+            deltas[record.account_id] += sign * record.amount
+        elif category_type == 'expense':
+            deltas[record.account_id] -= sign * record.amount
+        elif category_type == 'transfer':
+            deltas[record.account_id] -= sign * record.amount
+            deltas[record.to_account_id] += sign * record.amount
+    return deltas
+
+
+def apply_balance_deltas(deltas, field='amount'):
+    """
+    Add the `deltas` to the balances of the accounts with one UPDATE.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # The record forms show the balances.
+    choices.changed()
+    if len(deltas) == 1:
+        (pk, delta), = deltas.items()
+        Account.objects.filter(pk=pk).update(**{field: F(field) + delta})
+        return
+    Account.objects.filter(pk__in=deltas).update(**{
+        field: F(field) + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    })
+
+
+@transaction.atomic
+def post(records):
+    """
+    Save the new `records` and apply them to the balances and the
+    monthly totals. The records need their `category` set.
+    """
+    apply_balance_deltas(balance_deltas(records))
+    for record in records:
+        record.posted_on = Ledger.local_date(record.date_created)
+    Ledger.objects.bulk_create(records)
+    rollup.add_records(records)
+    snapshots.add_records(records)
+    timeline.changed(record.posted_on for record in records)
+    return records
+
+
+@transaction.atomic
+def unpost(record):
+    """
+    Delete the `record` and take it back from the balances and the
+    monthly totals. Returns False if the record was already deleted.
+    """
+    # Delete first so that two requests deleting the same record can't
+    # both take it back from the balances.
+    deleted, _ = Ledger.objects.filter(pk=record.pk).delete()
+    if not deleted:
+        return False
+    apply_balance_deltas(balance_deltas([record], sign=-1))
+    rollup.remove_records([record])
+    snapshots.remove_records([record])
+    timeline.changed([record.posted_on])
+    return True
+
+
+def post_record(account, category, amount, note, date_created):
+    """
+    Post an income or expense, depending on the type of `category`.
+    """
+    record, = post([Ledger(
+        account=account,
+        category=category,
+        amount=amount,
+        note=note,
+        date_created=date_created,
+    )])
+    return record
+
+
+def split_amount(amount, percents):
+    """
+    Split `amount` by `percents` in whole cents with the largest
+    remainder method. Every share is rounded down to the cent, then the
+    cents left are given one each to the shares that lost the most in
+    the rounding. The shares always add up to `amount` exactly.
+    """
+    cents = round(amount * 100)
+    total_percent = sum(percents)
+    shares = [cents * percent // total_percent for percent in percents]
+    remainders = [cents * percent % total_percent for percent in percents]
+    left = cents - sum(shares)
+    # `sorted` is stable, so ties go to the first accounts.
+    largest = sorted(
+        range(len(shares)), key=lambda index: remainders[index], reverse=True
+    )
+    for index in largest[:left]:
+        shares[index] += 1
+    return [share / 100 for share in shares]
+
+
+def post_split_income(category, amount, note, date_created):
+    """
+    Distribute an income to the accounts based on their
+    `splitting_percent`, with a fixed number of queries whatever the
+    number of accounts.
+    """
+    accounts = list(
+        Account.objects.exclude(splitting_percent=0).order_by('pk')
+    )
+    shares = split_amount(
+        amount, [account.splitting_percent for account in accounts]
+    )
+    return post([
+        Ledger(
+            account=account,
+            category=category,
+            amount=share,
+            note=note,
+            date_created=date_created,
+        )
+        for account, share in zip(accounts, shares)
+        if share
+    ])
+
+
+def post_transfer(from_account, to_account, amount, note, date_created):
+    record, = post([Ledger(
+        account=from_account,
+        category=registry.transfer(),
+        to_account=to_account,
+        amount=amount,
+        note=note,
+        date_created=date_created,
+    )])
+    return record
+
+
+def move_balance(account, to_account):
+    """
+    Add the whole balance of `account` to `to_account`, reading it in the
+    same UPDATE. There is no record for it, so it is added to the
+    opening amount too.
+    """
+    balance = Subquery(
+        Account.objects.filter(pk=account.pk).values('amount')[:1]
+    )
+    Account.objects.filter(pk=to_account.pk).update(
+        amount=F('amount') + balance,
+        opening_amount=F('opening_amount') + balance,
+    )
+    choices.changed()
+
+
+def keep_transfers(account):
+    """
+    The transfers between `account` and the other accounts are deleted
+    along with it, but the other accounts keep their balance. Add the
+    transfers to their opening amount so that it still matches the
+    ledger.
+    """
+    transfers = Ledger.objects.filter(
+        Q(account=account) | Q(to_account=account),
+        category__category_type='transfer',
+    ).exclude(account=F('to_account'))
+    transfers = list(transfers.select_related('category'))
+    deltas = balance_deltas(transfers)
+    deltas.pop(account.pk, None)
+    apply_balance_deltas(deltas, field='opening_amount')
+    snapshots.remove_records(transfers)
+
+
+def keep_category(category):
+    """
+    The records of `category` are deleted along with it, but the
+    accounts keep their balance. Add the records to their opening amount
+    so that it still matches the ledger, and take them out of the
+    snapshots. Their monthly totals are deleted with the category.
+    """
+    records = list(
+        Ledger.objects.filter(category=category).select_related('category')
+    )
+    apply_balance_deltas(balance_deltas(records), field='opening_amount')
+    snapshots.remove_records(records)
@@ -0,0 +1,127 @@
+"""
+In-process registry of the categories.
+
+The categories are few and rarely change, but posting a transfer and
+every record form need them. The registry reads all of them at once and
+keeps them in memory until a category is saved or deleted, which bumps
+their version in the shared cache (see `choices`) so every process
+reloads them on its next lookup. A category missing from the registry,
+e.g. created without the signal by a bulk insert, is looked up again in
+the database before it is reported missing.
+
+A loaded registry is never changed, it is replaced as a whole, so the
+threads of a worker can read it without locking. Only the reload takes a
+lock, so that one thread reads the categories while the others wait.
+The categories it returns are shared: don't modify them.
+"""
+import threading
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import choices
+from .models import Category
+
+
+VERSION_KEY = 'the_budget_app:categories:version'
+
+
+class Categories:
+    """
+    The categories of one version.
+    """
+    __slots__ = ('version', 'by_pk', 'by_type')
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.by_pk = {category.pk: category for category in categories}
+        by_type = {}
+        for category in categories:
+            by_type.setdefault(category.category_type, []).append(category)
+        self.by_type = {
+            category_type: tuple(of_type)
+            for category_type, of_type in by_type.items()
+        }
+
+
+_lock = threading.Lock()
+_categories = None
+
+
+def load(refresh=False):
+    """
+    Returns the categories of the current version, reading them if they
+    changed since they were last read, or if `refresh`.
+    """
+    global _categories
+    version = choices.version(VERSION_KEY)
+    categories = _categories
+    if (not refresh and categories is not None
+            and categories.version == version):
+        return categories
+    with _lock:
+        categories = _categories
+        if refresh or categories is None or categories.version != version:
+            # If a category changes while they are read, the version
+            # changes too and the next lookup reads them again.
+            categories = Categories(
+                version, list(Category.objects.order_by('pk'))
+            )
+            _categories = categories
+    return categories
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    choices.changed(VERSION_KEY)
+
+
+def get(pk):
+    categories = load()
+    if pk not in categories.by_pk:
+        # Created since they were read, without bumping the version.
+        categories = load(refresh=True)
+    try:
+        return categories.by_pk[pk]
+    except KeyError:
+        raise Category.DoesNotExist(f'No category with pk {pk}.')
+
+
+def of_type(category_type):
+    return load().by_type.get(category_type, ())
+
+
+def incomes():
+    """
+    The income categories the user can pick, like `Category.incomes()`.
+    """
+    return [category for category in of_type('income') if category.editable]
+
+
+def expenses():
+    return list(of_type('expense'))
+
+
+def system():
+    """
+    The categories the app uses itself, e.g. "From deleted account".
+    """
+    return [
+        category for category in load().by_pk.values()
+        if not category.editable
+    ]
+
+
+def transfer():
+    """
+    The transfer category, like `Category.get_transfer()`.
+    """
+    transfers = of_type('transfer')
+    if not transfers:
+        raise Category.DoesNotExist('There is no transfer category.')
+    if len(transfers) > 1:
+        raise Category.MultipleObjectsReturned(
+            'There is more than one transfer category.'
+        )
+    return transfers[0]
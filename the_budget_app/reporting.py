@@ -0,0 +1,319 @@
+"""
+Income, expense and net totals over time, by category or by account.
+
+A report is one GROUP BY over the ledger, per day, group and type. The
+days are then put in their buckets (the day, week, month or year) with
+NumPy rather than by the database, whose date truncation is a Python
+function called on every row on SQLite. Monthly and yearly reports by
+category read the `MonthlyCategoryTotal` rollup instead, one row per
+category and month. The sums are laid out in arrays
+of groups by buckets, every bucket of the range included, so the derived
+series (running totals, moving averages, year over year changes) are
+computed on whole arrays at once.
+
+Transfers move money between accounts without earning or spending it,
+so they are left out.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import F, Sum
+
+from . import registry
+from .models import Account, Ledger, MonthlyCategoryTotal
+
+
+# The NumPy units of the periods. Weeks are counted in days, NumPy
+# weeks start on Thursday.
+PERIODS = {
+    'day': 'D',
+    'week': 'D',
+    'month': 'M',
+    'year': 'Y',
+}
+GROUPS = ('category', 'account')
+# The days a report can cover. Its arrays reach back a year before the
+# start and on to the end of the last bucket, which has to stay within
+# the years `date` handles.
+FIRST_DAY = date(1900, 1, 1)
+LAST_DAY = date(2999, 12, 31)
+# The most buckets of a report, about ten years of days.
+MAX_BUCKETS = 3660
+
+
+def bucket_of(day, period):
+    """
+    Returns the first day of the bucket of `day`. Weeks start on
+    Monday.
+    """
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(bucket, period):
+    if period == 'week':
+        return bucket + timedelta(days=7)
+    if period == 'month':
+        if bucket.month == 12:
+            return bucket.replace(year=bucket.year + 1, month=1)
+        return bucket.replace(month=bucket.month + 1)
+    if period == 'year':
+        return bucket.replace(year=bucket.year + 1)
+    return bucket + timedelta(days=1)
+
+
+def buckets_between(start, end, period):
+    """
+    Returns the first days of the buckets from `start` to `end`.
+    """
+    buckets = []
+    bucket = bucket_of(start, period)
+    while bucket <= end:
+        buckets.append(bucket)
+        bucket = next_bucket(bucket, period)
+    return buckets
+
+
+def bucket_count(start, end, period):
+    """
+    Returns the number of buckets from `start` to `end`, without listing
+    them.
+    """
+    first = bucket_of(start, period)
+    return int(bucket_indexes([end], first, period)[0]) + 1
+
+
+def year_before(day):
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        # February 29th.
+        return day.replace(year=day.year - 1, day=28)
+
+
+def bucket_indexes(days, first, period):
+    """
+    Returns the index of the bucket of each of the `days`, counted from
+    the bucket starting on `first`.
+    """
+    unit = f'datetime64[{PERIODS[period]}]'
+    days = np.array(days, dtype='datetime64[D]')
+    indexes = (
+        days.astype(unit) - np.datetime64(first, 'D').astype(unit)
+    ).astype(int)
+    if period == 'week':
+        indexes //= 7
+    return indexes
+
+
+def ledger_totals(start, end, group_by):
+    """
+    Returns the rows of the GROUP BY: the `posted_on` day, the `group`
+    id, the `category_type` and the `total` of the records posted from
+    `start` to `end`.
+    """
+    return Ledger.objects.filter(
+        posted_on__gte=start,
+        posted_on__lte=end,
+        category__category_type__in=['income', 'expense'],
+    ).values(
+        'posted_on',
+        group=F(group_by),
+        category_type=F('category__category_type'),
+    ).annotate(
+        total=Sum('amount'),
+    ).order_by()
+
+
+def monthly_totals(start, end):
+    """
+    Returns the rows of `ledger_totals` by category from the monthly
+    rollup, dated on the first of the month. `start` and `end` must be
+    the first and the last day of a month.
+    """
+    rows = []
+    months = MonthlyCategoryTotal.objects.filter(
+        year__gte=start.year, year__lte=end.year
+    ).values_list('category', 'year', 'month', 'income_total', 'expense_total')
+    for category, year, month, income, expense in months:
+        posted_on = date(year, month, 1)
+        if not start <= posted_on <= end:
+            continue
+        for category_type, total in (('income', income), ('expense', expense)):
+            if total:
+                rows.append({
+                    'posted_on': posted_on,
+                    'group': category,
+                    'category_type': category_type,
+                    'total': total,
+                })
+    return rows
+
+
+def totals(start, end, period, group_by):
+    if group_by == 'category' and period in ('month', 'year'):
+        return monthly_totals(start, end)
+    return list(ledger_totals(start, end, group_by))
+
+
+def group_names(group_by, ids):
+    if group_by == 'category':
+        return {pk: registry.get(pk).category_name for pk in ids}
+    return dict(
+        Account.objects.filter(pk__in=ids).values_list('pk', 'account_name')
+    )
+
+
+class Report:
+    """
+    Totals of `groups` (a list of (id, name)) over `buckets` (the first
+    day of each). `income`, `expense` and `net` are arrays of one row per
+    group and one column per bucket. `start` and `end` are widened to
+    the whole buckets they fall in.
+
+    The arrays also cover the year before `start`, hidden from the
+    attributes, so that the year over year changes and the moving
+    averages of the first buckets have data to start from.
+    """
+    def __init__(self, start, end, period='month', group_by='category'):
+        if period not in PERIODS:
+            raise ValueError(f'Unknown period: {period!r}')
+        if group_by not in GROUPS:
+            raise ValueError(f'Unknown group: {group_by!r}')
+        self.period = period
+        self.group_by = group_by
+        # Whole buckets only, so the first and the last aren't partial.
+        self.start = start = bucket_of(start, period)
+        self.end = end = (
+            next_bucket(bucket_of(end, period), period) - timedelta(days=1)
+        )
+
+        all_buckets = buckets_between(year_before(start), end, period)
+        self.first = all_buckets.index(start)
+        self.buckets = all_buckets[self.first:]
+
+        rows = totals(all_buckets[0], end, period, group_by)
+        ids = sorted({row['group'] for row in rows})
+        names = group_names(group_by, ids)
+        self.groups = [(pk, names.get(pk, '')) for pk in ids]
+
+        column = {bucket: index for index, bucket in enumerate(all_buckets)}
+        row_of = {pk: index for index, pk in enumerate(ids)}
+        amounts = {
+            'income': np.zeros((len(ids), len(all_buckets))),
+            'expense': np.zeros((len(ids), len(all_buckets))),
+        }
+        if rows:
+            types = np.array([row['category_type'] for row in rows])
+            group_index = np.array([row_of[row['group']] for row in rows])
+            bucket_index = bucket_indexes(
+                [row['posted_on'] for row in rows], all_buckets[0], period
+            )
+            total = np.array([row['total'] for row in rows])
+            for category_type, array in amounts.items():
+                selected = types == category_type
+                np.add.at(
+                    array,
+                    (group_index[selected], bucket_index[selected]),
+                    total[selected],
+                )
+        self._income = amounts['income']
+        self._expense = amounts['expense']
+        self._net = self._income - self._expense
+        # The column of the same bucket a year before, or -1.
+        self._year_before = np.array([
+            column.get(bucket_of(year_before(bucket), period), -1)
+            for bucket in all_buckets
+        ], dtype=int)
+
+    def visible(self, array):
+        return array[..., self.first:]
+
+    @property
+    def income(self):
+        return self.visible(self._income)
+
+    @property
+    def expense(self):
+        return self.visible(self._expense)
+
+    @property
+    def net(self):
+        return self.visible(self._net)
+
+    def series(self, name, total=False):
+        """
+        Returns the array `name` (income, expense or net) with all
+        the years, summed over the groups if `total`.
+        """
+        array = {
+            'income': self._income,
+            'expense': self._expense,
+            'net': self._net,
+        }[name]
+        return array.sum(axis=0) if total else array
+
+    def running_total(self, name='net', total=False):
+        """
+        Cumulative sum from the first bucket of the report.
+        """
+        return np.cumsum(self.visible(self.series(name, total)), axis=-1)
+
+    def moving_average(self, window, name='net', total=False):
+        """
+        Mean of the last `window` buckets, this one included.
+        """
+        array = self.series(name, total)
+        cumulative = np.cumsum(array, axis=-1)
+        shifted = np.zeros_like(cumulative)
+        shifted[..., window:] = cumulative[..., :-window]
+        return self.visible((cumulative - shifted) / window)
+
+    def year_over_year(self, name='net', total=False):
+        """
+        Change from the same bucket a year before, NaN if there is none.
+        """
+        array = self.series(name, total)
+        before = np.where(
+            self._year_before >= 0, array[..., self._year_before], np.nan
+        )
+        return self.visible(array - before)
+
+    def to_dict(self, window=3):
+        """
+        Returns the report as plain lists, e.g. for JSON.
+        """
+        def lists(array):
+            array = np.round(array, 2)
+            return np.where(np.isnan(array), None, array).tolist()
+
+        return {
+            'period': self.period,
+            'group_by': self.group_by,
+            'buckets': [bucket.isoformat() for bucket in self.buckets],
+            'groups': [
+                {
+                    'id': pk,
+                    'name': name,
+                    'income': lists(self.income[index]),
+                    'expense': lists(self.expense[index]),
+                    'net': lists(self.net[index]),
+                }
+                for index, (pk, name) in enumerate(self.groups)
+            ],
+            'total': {
+                'income': lists(self.income.sum(axis=0)),
+                'expense': lists(self.expense.sum(axis=0)),
+                'net': lists(self.net.sum(axis=0)),
+                'running_total': lists(self.running_total(total=True)),
+                'moving_average': lists(
+                    self.moving_average(window, total=True)
+                ),
+                'year_over_year': lists(self.year_over_year(total=True)),
+            },
+        }
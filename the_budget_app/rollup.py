@@ -0,0 +1,228 @@
+"""
+Maintains the `MonthlyCategoryTotal` rollup.
+
+Every path that adds or deletes records calls `add_records` or
+`remove_records` inside its transaction, so the totals always match the
+ledger. `rebuild` and `verify` recompute them from the ledger.
+"""
+import math
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BooleanField, Case, Count, F, FloatField, IntegerField, Sum, Value, When,
+)
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Ledger, MonthlyCategoryTotal
+
+
+TOTAL_FIELDS = ('income_total', 'income_count', 'expense_total', 'expense_count')
+# Totals changed per UPDATE, within the SQL variables SQLite allows.
+BATCH_SIZE = 1000
+
+
+def record_deltas(records, sign=1):
+    """
+    Returns the changes to the totals made by adding (`sign=1`) or
+    removing (`sign=-1`) the `records`, keyed by (category id, year,
+    month). Transfers have no income or expense and are skipped.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0))
+    for record in records:
+        category_type = record.category.category_type
+        if category_type not in ('income', 'expense'):
+            continue
+        delta = deltas[
+            (record.category_id, record.posted_on.year, record.posted_on.month)
+        ]
+        delta[f'{category_type}_total'] += sign * record.amount
+        delta[f'{category_type}_count'] += sign
+    return deltas
+
+
+def update(deltas):
+    """
+    Add the `deltas` to the totals that exist with one UPDATE. Returns
+    the number of totals updated.
+    """
+    def matches(key):
+        category_id, year, month = key
+        return {'category_id': category_id, 'year': year, 'month': month}
+
+    changes = {}
+    for field in TOTAL_FIELDS:
+        whens = [
+            When(**matches(key), then=Value(delta[field]))
+            for key, delta in deltas.items() if delta[field]
+        ]
+        if whens:
+            output_field = (
+                FloatField() if field.endswith('_total') else IntegerField()
+            )
+            changes[field] = F(field) + Case(
+                *whens, default=Value(0), output_field=output_field
+            )
+    # A CASE rather than ORs of the keys, which SQLite would nest as
+    # deep as there are keys.
+    matched = Case(
+        *[When(**matches(key), then=Value(True)) for key in deltas],
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+    return MonthlyCategoryTotal.objects.filter(
+        category_id__in={category_id for category_id, _, _ in deltas}
+    ).alias(matched=matched).filter(matched=True).update(
+        **changes or {'income_count': F('income_count')}
+    )
+
+
+@transaction.atomic
+def apply(deltas):
+    """
+    Add the `deltas` to the totals, creating the rows of the months that
+    don't have one yet. The queries don't grow with the number of
+    totals changed, up to `BATCH_SIZE`.
+    """
+    keys = list(deltas)
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = {key: deltas[key] for key in keys[start:start + BATCH_SIZE]}
+        updated = update(batch)
+        if updated < len(batch):
+            create(batch, updated)
+
+
+def create(deltas, updated):
+    """
+    Create the totals of the `deltas` that `update` found no row for, it
+    `updated` the others. The UPDATE took the write lock of SQLite, so no
+    other request can create them in between.
+    """
+    existing = set()
+    if updated:
+        existing = set(MonthlyCategoryTotal.objects.filter(
+            category_id__in={category_id for category_id, _, _ in deltas},
+            year__in={year for _, year, _ in deltas},
+        ).values_list('category_id', 'year', 'month'))
+    missing = {
+        key: delta for key, delta in deltas.items() if key not in existing
+    }
+    try:
+        with transaction.atomic():
+            MonthlyCategoryTotal.objects.bulk_create([
+                MonthlyCategoryTotal(
+                    category_id=category_id, year=year, month=month, **delta
+                )
+                for (category_id, year, month), delta in missing.items()
+            ])
+    except IntegrityError:
+        # Another request created some of them first, on a database
+        # whose UPDATE doesn't lock the table.
+        for key, delta in missing.items():
+            if not update({key: delta}):
+                category_id, year, month = key
+                MonthlyCategoryTotal.objects.create(
+                    category_id=category_id, year=year, month=month, **delta
+                )
+
+
+def add_records(records):
+    apply(record_deltas(records))
+
+
+def remove_records(records):
+    apply(record_deltas(records, sign=-1))
+
+
+def remove_account(account):
+    """
+    Remove the records of `account` from the totals, before they are
+    deleted along with the account.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0))
+    for group in compute(Ledger.objects.filter(account=account)):
+        category_type = group['category__category_type']
+        delta = deltas[(group['category'], group['year'], group['month'])]
+        delta[f'{category_type}_total'] -= group['total']
+        delta[f'{category_type}_count'] -= group['count']
+    apply(deltas)
+
+
+def compute(records=None):
+    """
+    Returns the totals of `records` (the whole ledger by default) grouped
+    by category, category type, year and month.
+    """
+    if records is None:
+        records = Ledger.objects.all()
+    return records.filter(
+        category__category_type__in=['income', 'expense'],
+    ).values(
+        'category',
+        'category__category_type',
+        year=ExtractYear('posted_on'),
+        month=ExtractMonth('posted_on'),
+    ).annotate(
+        total=Sum('amount'),
+        count=Count('id'),
+    ).order_by()
+
+
+def expected_totals():
+    """
+    Returns the totals computed from the ledger, keyed like
+    `record_deltas`.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0))
+    for group in compute().iterator():
+        category_type = group['category__category_type']
+        total = totals[(group['category'], group['year'], group['month'])]
+        total[f'{category_type}_total'] = group['total']
+        total[f'{category_type}_count'] = group['count']
+    return totals
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Replace every total with the one computed from the ledger. Returns
+    the number of totals saved.
+    """
+    MonthlyCategoryTotal.objects.all().delete()
+    totals = [
+        MonthlyCategoryTotal(
+            category_id=category_id, year=year, month=month, **total
+        )
+        for (category_id, year, month), total in expected_totals().items()
+    ]
+    MonthlyCategoryTotal.objects.bulk_create(totals, batch_size=1000)
+    return len(totals)
+
+
+def verify():
+    """
+    Compare the saved totals with the ledger. Returns a list of
+    (key, saved, expected) for every total that doesn't match.
+    """
+    expected = expected_totals()
+    empty = dict.fromkeys(TOTAL_FIELDS, 0)
+    saved = {
+        (total['category'], total['year'], total['month']): total
+        for total in MonthlyCategoryTotal.objects.values(
+            'category', 'year', 'month', *TOTAL_FIELDS
+        )
+    }
+    mismatches = []
+    for key in saved.keys() | expected.keys():
+        saved_total = {
+            field: saved.get(key, empty)[field] for field in TOTAL_FIELDS
+        }
+        expected_total = expected.get(key, empty)
+        if not all(
+            math.isclose(
+                saved_total[field], expected_total[field], abs_tol=0.005
+            )
+            for field in TOTAL_FIELDS
+        ):
+            mismatches.append((key, saved_total, dict(expected_total)))
+    return sorted(mismatches)
@@ -0,0 +1,125 @@
+"""
+Full-text search of the records, by their note and the names of their
+category and accounts.
+
+The `ledger_search` FTS5 table holds these texts, one row per record
+with the record id as its rowid. SQLite triggers (see the migration
+`0014_ledger_search`) keep it in sync on every insert, update and
+delete of a record, and on every rename of an account or a category, so
+bulk posting and the records deleted with an account are covered too.
+`rebuild` fills it again from the ledger.
+
+A search looks the words up in the index, it never scans the ledger.
+Ranking every match of a common word with BM25 would cost as much as
+there are matches, so only the `MAX_CANDIDATES` latest matches, which
+the index reads in rowid order, are ranked.
+"""
+import re
+from collections import namedtuple
+
+from django.db import NotSupportedError, connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Ledger
+from .pagination import PAGE_SIZE
+
+
+TABLE = 'ledger_search'
+# BM25 weights of the columns: the note first, then the category and
+# the account names.
+WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+MAX_WORDS = 10
+MAX_CANDIDATES = 1000
+
+Results = namedtuple('Results', ['rows', 'has_next'])
+
+
+def check_support():
+    if connection.vendor != 'sqlite':
+        raise NotSupportedError('Searching the records needs SQLite FTS5.')
+
+
+def match_expression(query, column=None):
+    """
+    Returns the FTS5 query matching the records with every word of
+    `query`, the last one as a prefix so results show up while typing,
+    in `column` only if given. The words are quoted, so the FTS5
+    operators typed by the user are searched as text.
+    """
+    words = re.findall(r'\w+', query)[:MAX_WORDS]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    if column is not None:
+        return f'{column} : ({" ".join(terms)})'
+    return ' '.join(terms)
+
+
+def matching(records, query, column=None):
+    """
+    Filter the `records` queryset to those matching `query` (see
+    `match_expression`), looked up in the index. Unlike `search`, every
+    match is kept and the order of `records` is.
+    """
+    check_support()
+    match = match_expression(query, column)
+    if not match:
+        return records
+    return records.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match]
+    ))
+
+
+def search(query, size=PAGE_SIZE, offset=0):
+    """
+    Returns the `size` records (as `Ledger.rows`) best matching `query`
+    after the first `offset`, and whether there are more. Records that
+    match as well are newest first. Only the `MAX_CANDIDATES` latest
+    matching records are returned.
+    """
+    check_support()
+    match = match_expression(query)
+    if not match:
+        return Results([], False)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM ('
+            f'  SELECT rowid, bm25({TABLE}, {", ".join(map(str, WEIGHTS))})'
+            f'  AS score FROM {TABLE} WHERE {TABLE} MATCH %s'
+            f'  ORDER BY rowid DESC LIMIT %s'
+            f') ORDER BY score, rowid DESC LIMIT %s OFFSET %s',
+            [match, MAX_CANDIDATES, size + 1, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    has_next = len(ids) > size
+    ids = ids[:size]
+    rows = {row.id: row for row in Ledger.rows().filter(pk__in=ids)}
+    return Results([rows[pk] for pk in ids if pk in rows], has_next)
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Replace the whole index with the records of the ledger. Returns the
+    number of records indexed.
+    """
+    check_support()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f"""
+            INSERT INTO {TABLE} (
+                rowid, note, category_name, account_name, to_account_name
+            )
+            SELECT ledger.id, ledger.note, category.category_name,
+                   account.account_name, to_account.account_name
+            FROM ledger
+            INNER JOIN category ON category.id = ledger.category_id
+            INNER JOIN account ON account.id = ledger.account_id
+            LEFT OUTER JOIN account AS to_account
+                ON to_account.id = ledger.to_account_id
+        """)
+        count = cursor.rowcount
+        # Merge the segments of the index into one for faster lookups.
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return count
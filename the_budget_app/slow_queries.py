@@ -0,0 +1,183 @@
+"""
+Log of the slow SQL queries, with the view and the app code that ran
+them.
+
+`middleware.slow_query_middleware` installs `slow_query_wrapper` on the
+connections when `SLOW_QUERY_MS` is set. A query taking longer is
+written as a JSON line to the `the_budget_app.slow_queries` logger,
+which `settings.LOGGING` sends to a rotating file. `summarize` groups the
+logged queries by their shape, the SQL with its values taken out, for
+the `slow_query_report` command.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+
+logger = logging.getLogger('the_budget_app.slow_queries')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames of these files are skipped when looking for the app code that
+# ran a query.
+SKIPPED_FILES = {
+    os.path.join(APP_DIR, name)
+    for name in ('slow_queries.py', 'instrumentation.py', 'middleware.py')
+}
+MAX_STACK = 5
+# Parameter sets logged for an executemany.
+MAX_PARAMS = 10
+
+current_request = ContextVar('the_budget_app_request', default=None)
+threshold = None
+
+
+def configure(milliseconds):
+    """
+    Set the duration from which queries are logged, in milliseconds, or
+    stop logging them with None.
+    """
+    global threshold
+    threshold = None if milliseconds is None else milliseconds / 1000
+
+
+def app_stack():
+    """
+    Returns the frames of the app code on the current stack, innermost
+    first, as "path:line in function" with the path relative to the app.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < MAX_STACK:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename not in SKIPPED_FILES:
+            frames.append('{}:{} in {}'.format(
+                os.path.relpath(filename, APP_DIR),
+                frame.f_lineno,
+                frame.f_code.co_name,
+            ))
+        frame = frame.f_back
+    return frames
+
+
+def view_of(request):
+    if request is None:
+        return None
+    match = request.resolver_match
+    if match is None:
+        return request.path
+    return f'{match.func.__module__}.{match.func.__qualname__}'
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper logging the queries slower than the
+    `threshold`.
+    """
+    if many:
+        # The parameter sets of an executemany may be an iterator, which
+        # the query consumes: keep them to log them.
+        params = list(params)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if threshold is not None and duration >= threshold:
+            log(sql, params, many, duration)
+
+
+def log(sql, params, many, duration):
+    if many:
+        params = {'count': len(params), 'first': params[:MAX_PARAMS]}
+    stack = app_stack()
+    logger.warning(json.dumps({
+        'time': time.time(),
+        'duration_ms': round(duration * 1000, 1),
+        'sql': sql,
+        'params': params,
+        'view': view_of(current_request.get()),
+        'frame': stack[0] if stack else None,
+        'stack': stack,
+    }, default=str))
+
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE = r'\s*(?:%s|\?|NULL)\s*'
+VALUE_LIST = re.compile(rf'\((?:{VALUE},)+{VALUE}\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """
+    Returns the shape of `sql`: its literals and placeholders replaced
+    with `?`, the lists of them with `(...)`, so that the same query run
+    with other values has the same shape.
+    """
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = VALUE_LIST.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def log_files(path):
+    """
+    Returns the log file at `path` and its rotated backups, oldest
+    first.
+    """
+    path = Path(path)
+    backups = [
+        backup for backup in path.parent.glob(f'{path.name}.*')
+        if backup.suffix[1:].isdigit()
+    ]
+    # The higher the number, the older the backup.
+    backups.sort(key=lambda backup: int(backup.suffix[1:]), reverse=True)
+    return [*backups, path] if path.exists() else backups
+
+
+def read(path):
+    """
+    Yields the entries of the log at `path`, rotated backups included.
+    Lines that aren't JSON, e.g. cut by a crash, are skipped.
+    """
+    for log_file in log_files(path):
+        with open(log_file, encoding='utf-8') as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries):
+    """
+    Groups the `entries` by query shape. Returns, for each shape, the
+    `count`, `total_ms` and `max_ms` of its queries, and the views and
+    app frames that ran it most, most costly first.
+    """
+    shapes = {}
+    for entry in entries:
+        shape = normalize(entry['sql'])
+        summary = shapes.setdefault(shape, {
+            'shape': shape,
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': Counter(),
+            'frames': Counter(),
+        })
+        summary['count'] += 1
+        summary['total_ms'] += entry['duration_ms']
+        summary['max_ms'] = max(summary['max_ms'], entry['duration_ms'])
+        summary['views'][entry.get('view')] += 1
+        summary['frames'][entry.get('frame')] += 1
+    return sorted(
+        shapes.values(), key=lambda summary: summary['total_ms'], reverse=True
+    )
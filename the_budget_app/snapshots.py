@@ -0,0 +1,220 @@
+"""
+Account balances at any date, from `AccountBalanceSnapshot` checkpoints.
+
+`take` saves the ledger total of every account at each month end. The
+balance at a date is then the latest snapshot before it plus the records
+posted since, so a query reads at most about a month of records per
+account instead of the whole history.
+
+Every path that adds or deletes records calls `add_records` or
+`remove_records` inside its transaction, so a back-dated record moves the
+snapshots taken after it. That includes the records deleted along with an
+account or a category (see `posting.keep_transfers` and
+`posting.keep_category`).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Case, DateField, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value,
+    When,
+)
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from . import balances
+from .models import Account, AccountBalanceSnapshot, Ledger
+
+
+def record_deltas(records, sign=1):
+    """
+    Returns the changes to the ledger totals made by adding (`sign=1`) or
+    removing (`sign=-1`) the `records`, keyed by (account id, posted on).
+    """
+    deltas = defaultdict(float)
+    for record in records:
+        category_type = record.category.category_type
+        amount = sign * record.amount
+        if category_type == 'income':
+            deltas[(record.account_id, record.posted_on)] += amount
+        else:
+            deltas[(record.account_id, record.posted_on)] -= amount
+        if category_type == 'transfer':
+            deltas[(record.to_account_id, record.posted_on)] += amount
+    return deltas
+
+
+def apply(deltas):
+    """
+    Add the `deltas` to the snapshots taken on or after their dates, with
+    one UPDATE.
+    """
+    per_account = defaultdict(list)
+    for (account_id, posted_on), delta in deltas.items():
+        if delta:
+            per_account[account_id].append((posted_on, delta))
+    if not per_account:
+        return
+    # A snapshot gets the deltas of every date up to its own: the first
+    # matching WHEN, latest date first, holds that running sum.
+    whens = []
+    for account_id, changes in per_account.items():
+        changes.sort()
+        running = 0
+        cumulative = []
+        for posted_on, delta in changes:
+            running += delta
+            cumulative.append((posted_on, running))
+        for posted_on, total in reversed(cumulative):
+            whens.append(When(
+                account_id=account_id, as_of__gte=posted_on, then=Value(total)
+            ))
+    query = Q()
+    for account_id, changes in per_account.items():
+        query |= Q(account_id=account_id, as_of__gte=changes[0][0])
+    AccountBalanceSnapshot.objects.filter(query).update(
+        ledger_total=F('ledger_total') + Case(
+            *whens, default=Value(0.0), output_field=FloatField()
+        )
+    )
+
+
+def add_records(records):
+    apply(record_deltas(records))
+
+
+def remove_records(records):
+    apply(record_deltas(records, sign=-1))
+
+
+def with_balance_as_of(day, accounts=None):
+    """
+    Annotate `accounts` (all by default) with their `balance` at the end
+    of `day`, in one query. Only the records posted after the latest
+    snapshot on or before `day` are read.
+    """
+    if accounts is None:
+        accounts = Account.objects.all()
+    snapshots = AccountBalanceSnapshot.objects.filter(
+        account=OuterRef('pk'), as_of__lte=day
+    ).order_by('-as_of')
+    accounts = accounts.annotate(
+        snapshot_as_of=Coalesce(
+            Subquery(snapshots.values('as_of')[:1]),
+            Value(date.min),
+            output_field=DateField(),
+        ),
+        snapshot_total=Coalesce(
+            Subquery(snapshots.values('ledger_total')[:1]),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+    records = Ledger.objects.filter(
+        posted_on__gt=OuterRef('snapshot_as_of'), posted_on__lte=day
+    )
+    return accounts.annotate(
+        balance=F('opening_amount')
+        + F('snapshot_total')
+        + balances.ledger_sum(records, 'account', balances.signed_amount())
+        + balances.ledger_sum(records, 'to_account', F('amount'))
+    )
+
+
+def balances_as_of(day):
+    """
+    Returns the balance of every account at the end of `day`, keyed by
+    account id.
+    """
+    return dict(with_balance_as_of(day).values_list('pk', 'balance'))
+
+
+def month_end(day):
+    next_month = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return next_month - timedelta(days=1)
+
+
+def month_ends(start, end):
+    """
+    Returns the month ends from the month of `start` to `end`.
+    """
+    ends = []
+    day = month_end(start)
+    while day <= end:
+        ends.append(day)
+        day = month_end(day + timedelta(days=1))
+    return ends
+
+
+@transaction.atomic
+def take(until=None):
+    """
+    Take the snapshots of every month end after the latest snapshot, up
+    to `until` (the end of last month by default). Returns the number of
+    snapshots saved.
+    """
+    if until is None:
+        until = timezone.localdate().replace(day=1) - timedelta(days=1)
+    latest = AccountBalanceSnapshot.objects.aggregate(
+        latest=Max('as_of')
+    )['latest']
+    if latest is None:
+        first = Ledger.objects.order_by('posted_on').values_list(
+            'posted_on', flat=True
+        ).first()
+        if first is None:
+            return 0
+        ends = month_ends(first, until)
+        totals = dict.fromkeys(
+            Account.objects.values_list('pk', flat=True), 0
+        )
+        records = Ledger.objects.filter(posted_on__lte=until)
+    else:
+        ends = month_ends(latest + timedelta(days=1), until)
+        totals = dict(with_balance_as_of(latest).values_list(
+            'pk', F('balance') - F('opening_amount')
+        ))
+        records = Ledger.objects.filter(
+            posted_on__gt=latest, posted_on__lte=until
+        )
+    if not ends:
+        return 0
+
+    changes = defaultdict(float)
+    for field, amount in (
+        ('account', balances.signed_amount()),
+        ('to_account', F('amount')),
+    ):
+        groups = records.filter(**{f'{field}__isnull': False}).values(
+            field,
+            year=ExtractYear('posted_on'),
+            month=ExtractMonth('posted_on'),
+        ).annotate(total=Sum(amount)).order_by()
+        for group in groups:
+            changes[(group[field], group['year'], group['month'])] += (
+                group['total']
+            )
+
+    snapshots = []
+    for as_of in ends:
+        for account_id in totals:
+            totals[account_id] += changes.get(
+                (account_id, as_of.year, as_of.month), 0
+            )
+            snapshots.append(AccountBalanceSnapshot(
+                account_id=account_id,
+                as_of=as_of,
+                ledger_total=totals[account_id],
+            ))
+    AccountBalanceSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
+
+
+@transaction.atomic
+def rebuild(until=None):
+    """
+    Replace every snapshot with ones computed from the ledger.
+    """
+    AccountBalanceSnapshot.objects.all().delete()
+    return take(until)
@@ -1,24 +1,79 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import logging
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (
+    AsyncClient, TestCase, TransactionTestCase, override_settings,
+    )
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import resolve, reverse
 from django.core.exceptions import ValidationError
-from datetime import datetime
+from django.db.models import Sum
+from datetime import date, datetime, timedelta
 from django.utils import timezone
 
-from .models import Account, Category, Ledger
+from .models import (
+    Account, AccountBalanceSnapshot, Budget, Category, Ledger, LedgerImport,
+    MonthlyCategoryTotal,
+    )
+from .middleware import ASGI_URLCONF
+from .pagination import encode_cursor, keyset_filter
+from .views import async_view
+from .benchmarks import data as benchmark_data, runner as benchmark_runner
+from . import (
+    balances, choices, facets, importers, instrumentation, posting,
+    registry, reporting, rollup, search, slow_queries, snapshots,
+    )
 from .forms import (
     IncomeForm, ExpenseForm, TransferForm, BudgetForm, CategoryForm
     )
 
 
+# Timings measured by the tests, silent unless their logging is set up.
+logger = logging.getLogger(__name__)
+
 # Accounts
 PATH_ACCOUNTS = '/accounts'
 PATH_ACCOUNT_CREATE = PATH_ACCOUNTS + '/create'
 
 # Records
 PATH_RECORD = '/records'
+PATH_RECORD_PAGE = PATH_RECORD + '/page'
 PATH_INCOME = '/new-record/income'
 PATH_EXPENSE = '/new-record/expense'
 PATH_TRANSFER = '/new-record/transfer'
 PATH_DELETE_RECORD = '/record/delete'
+PATH_IMPORT = PATH_RECORD + '/import'
+PATH_EXPORT = PATH_RECORD + '/export'
+PATH_SEARCH = PATH_RECORD + '/search'
+
+# Categories
+PATH_CATEGORIES = '/categories'
+
+# Budget
+PATH_BUDGET = '/budget'
+
+# Reports
+PATH_REPORTS = '/reports'
+
+# API
+PATH_API = '/api'
 
 
 def create_account(name, splitting_percent, initial_amount):
@@ -37,6 +92,16 @@ def create_category(category_type: str, name: str, editable: bool):
     )
 
 
+def create_ledger(account, category, amount, date_created, note=''):
+    return Ledger.objects.create(
+        account=account,
+        category=category,
+        amount=amount,
+        note=note,
+        date_created=date_created,
+    )
+
+
 # Create your tests here.
 class AccountTests(TestCase):
     """
@@ -220,6 +285,7 @@ class RecordTest(TestCase):
         self.assertRedirects(response, PATH_RECORD, 302, 200)
         self.assertEqual(account.amount, 10.99)
         self.assertEqual(ledger.amount, 10.99)
+        self.assertEqual(ledger.posted_on, date(2023, 5, 15))
 
         # Invalid data.
         response = self.client.post(
@@ -437,6 +503,2047 @@ class RecordTest(TestCase):
         self.assertEqual(account[2].amount, 100)
 
 
+class RecordPaginationTest(TestCase):
+    """
+    Test the keyset pagination of the records page.
+    """
+    def setUp(self):
+        account = create_account('Needs', 0, 0)
+        category = create_category('expense', 'Food', True)
+        start = timezone.make_aware(datetime(2023, 5, 1, 8, 0))
+        # 3 records per day, the last two records share the same time
+        # to check that `id` breaks the tie.
+        for i in range(119):
+            create_ledger(
+                account, category, i, start + timedelta(hours=8 * i)
+            )
+        create_ledger(account, category, 119, start + timedelta(hours=8 * 118))
+
+    def get_pks(self, response):
+        return [
+            record.id
+            for group in response.context['day_groups']
+            for record in group['records']
+        ]
+
+    def test_pages_cover_every_record_once(self):
+        """
+        Following the cursors returns all the records newest first with
+        no duplicates.
+        """
+        response = self.client.get(PATH_RECORD)
+        self.assertTemplateUsed(response, 'the_budget_app/records/records.html')
+        pks = self.get_pks(response)
+        self.assertEqual(len(pks), 50)
+
+        cursor = response.context['next_cursor']
+        while cursor:
+            response = self.client.get(PATH_RECORD_PAGE, {'cursor': cursor})
+            self.assertTemplateUsed(
+                response, 'the_budget_app/records/day_groups.html'
+            )
+            self.assertTemplateNotUsed(
+                response, 'the_budget_app/base.html'
+            )
+            pks += self.get_pks(response)
+            cursor = response.context['next_cursor']
+
+        expected = list(
+            Ledger.objects.order_by('-date_created', '-id')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(pks, expected)
+
+    def test_page_continues_day_group(self):
+        """
+        A day split between two pages only shows its header once.
+        """
+        response = self.client.get(PATH_RECORD)
+        last_day = response.context['day_groups'][-1]['day']
+        header = f'<th colspan="2">{last_day:%B} {last_day.day}</th>'
+        self.assertContains(response, header)
+        response = self.client.get(
+            PATH_RECORD_PAGE, {'cursor': response.context['next_cursor']}
+        )
+        first_group = response.context['day_groups'][0]
+        self.assertEqual(first_group['day'], last_day)
+        self.assertTrue(first_group['continued'])
+        self.assertNotContains(response, header)
+
+    def test_invalid_cursor(self):
+        # Cursors are made of aware datetimes, a naive one is forged.
+        naive = encode_cursor([datetime(2023, 5, 1, 12), 1])
+        for cursor in ('abc', naive):
+            response = self.client.get(PATH_RECORD_PAGE, {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_page_query_count(self):
+        """
+        A page of records is fetched with its account and category
+        names in a single query, whatever the number of records. The
+        facets of the whole ledger are cached.
+        """
+        # Fill the cached accounts, categories and facets.
+        self.client.get(PATH_RECORD)
+        with self.assertNumQueries(1):
+            response = self.client.get(PATH_RECORD)
+        self.assertContains(response, 'Needs')
+        self.assertContains(response, 'Food')
+
+        Ledger.objects.filter(pk__gt=5).delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(PATH_RECORD)
+        self.assertEqual(len(self.get_pks(response)), 5)
+
+
+class RecordDayCacheTest(TestCase):
+    """
+    Test that the day groups of the records page are cached until a
+    record of their day is added or deleted.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.food = create_category('expense', 'Food', True)
+        self.apples = self.post(1, 'Apples')
+        self.post(2, 'Bread')
+
+    def post(self, day, note):
+        return posting.post_record(
+            self.needs, self.food, 10, note,
+            timezone.make_aware(datetime(2023, 5, day, 12)),
+        )
+
+    def test_only_the_changed_day_is_rendered(self):
+        self.client.get(PATH_RECORD)
+        # Not through `posting`, so the cached days aren't told.
+        Ledger.objects.update(note='Changed')
+        response = self.client.get(PATH_RECORD)
+        self.assertContains(response, 'Apples')
+        self.assertContains(response, 'Bread')
+
+        self.post(2, 'Cheese')
+        response = self.client.get(PATH_RECORD)
+        self.assertContains(response, 'Apples')
+        self.assertNotContains(response, 'Bread')
+        self.assertContains(response, 'Cheese')
+
+        self.client.post(f'{PATH_DELETE_RECORD}/{self.apples.pk}')
+        response = self.client.get(PATH_RECORD)
+        self.assertNotContains(response, 'Apples')
+        self.assertNotContains(response, 'May 1<')
+
+    def test_rename_changes_every_day(self):
+        self.client.get(PATH_RECORD)
+        self.food.category_name = 'Groceries'
+        self.food.save()
+        response = self.client.get(PATH_RECORD)
+        self.assertNotContains(response, 'Food')
+        # Two records, the category filter and the category facet.
+        self.assertContains(response, 'Groceries', count=6)
+
+    def test_delete_form_is_not_cached(self):
+        response = self.client.get(PATH_RECORD)
+        self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+        self.assertContains(response, 'form="delete-record"', count=2)
+
+
+class RecordFilterTest(TestCase):
+    """
+    Test the filters of the records page and the facets of the filtered
+    records.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.wants = create_account('Wants', 50, 100)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        transfer = create_category('transfer', 'Transfer', True)
+        day = timezone.make_aware(datetime(2023, 5, 1, 12))
+        posting.post([
+            Ledger(account=self.needs, category=self.sale, amount=100,
+                   note='Garage sale', date_created=day),
+            Ledger(account=self.needs, category=self.food, amount=30,
+                   note='Apples', date_created=day + timedelta(days=1)),
+            Ledger(account=self.wants, category=self.food, amount=12,
+                   note='Bread', date_created=day + timedelta(days=2)),
+            Ledger(account=self.needs, to_account=self.wants,
+                   category=transfer, amount=20, note='Savings',
+                   date_created=day + timedelta(days=3)),
+        ])
+
+    def get_notes(self, **filters):
+        response = self.client.get(PATH_RECORD, filters)
+        self.assertEqual(response.status_code, 200)
+        return {
+            record.note
+            for group in response.context['day_groups']
+            for record in group['records']
+        }
+
+    def test_filters(self):
+        self.assertEqual(
+            self.get_notes(start='2023-05-02', end='2023-05-03'),
+            {'Apples', 'Bread'},
+        )
+        # Both sides of a transfer.
+        self.assertEqual(
+            self.get_notes(account=self.wants.pk), {'Bread', 'Savings'}
+        )
+        self.assertEqual(
+            self.get_notes(category=self.food.pk), {'Apples', 'Bread'}
+        )
+        self.assertEqual(self.get_notes(category_type='income'),
+                         {'Garage sale'})
+        self.assertEqual(
+            self.get_notes(min_amount=15, max_amount=50), {'Apples', 'Savings'}
+        )
+        self.assertEqual(self.get_notes(note='gara'), {'Garage sale'})
+        self.assertEqual(
+            self.get_notes(category_type='expense', account=self.needs.pk),
+            {'Apples'},
+        )
+
+        response = self.client.get(PATH_RECORD, {
+            'min_amount': 50, 'max_amount': 10,
+        })
+        self.assertFalse(response.context['filter_form'].is_valid())
+        response = self.client.get(PATH_RECORD_PAGE, {'account': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_facets(self):
+        # The names come from the cached accounts and categories.
+        registry.load()
+        choices.accounts()
+        records = Ledger.objects.filter(posted_on__gte=date(2023, 5, 2))
+        with self.assertNumQueries(1):
+            counts = facets.facet_counts(records)
+        self.assertEqual(counts['count'], 3)
+        self.assertNotIn('total', counts)
+        self.assertEqual(
+            [(item['name'], item['count'], item['total'])
+             for item in counts['types']],
+            [('Expense', 2, 42), ('Transfer', 1, 20)],
+        )
+        self.assertEqual(
+            [(item['name'], item['count'], item['total'])
+             for item in counts['accounts']],
+            [('Needs', 2, -50), ('Wants', 2, 8)],
+        )
+        self.assertEqual(
+            [(item['name'], item['count']) for item in counts['categories']],
+            [('Food', 2), ('Transfer', 1)],
+        )
+
+        response = self.client.get(PATH_RECORD, {'category_type': 'expense'})
+        page_facets = response.context['facets']
+        self.assertEqual(page_facets['count'], 2)
+        food = page_facets['categories'][0]
+        self.assertIn(f'category={self.food.pk}', food['query'])
+        self.assertIn('category_type=expense', food['query'])
+
+    def test_cached_facets(self):
+        """
+        Only the facets of the filters narrowing the ledger down run the
+        GROUP BY, those of the whole ledger or of a range of days are
+        cached until a record is added or deleted.
+        """
+        def get_facets(**filters):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(PATH_RECORD, filters)
+            grouped = any('GROUP BY' in query['sql'] for query in queries)
+            return response.context['facets']['count'], grouped
+
+        self.assertEqual(get_facets(), (4, True))
+        self.assertEqual(get_facets(), (4, False))
+        self.assertEqual(get_facets(start='2023-05-02'), (3, True))
+        self.assertEqual(get_facets(start='2023-05-02'), (3, False))
+        self.assertEqual(get_facets(note='apples'), (1, True))
+        self.assertEqual(get_facets(note='apples'), (1, True))
+
+        posting.post_record(
+            self.needs, self.food, 5, 'Pears',
+            timezone.make_aware(datetime(2023, 5, 9, 12)),
+        )
+        self.assertEqual(get_facets(), (5, True))
+        self.assertEqual(get_facets(start='2023-05-02'), (4, True))
+
+    def test_filtered_pages(self):
+        for day in range(5, 30):
+            posting.post_record(
+                self.needs, self.food, 1, 'Plums',
+                timezone.make_aware(datetime(2023, 5, day, 12)),
+            )
+        self.client.get(PATH_RECORD)
+        # The cached day groups of the unfiltered page aren't reused.
+        self.assertEqual(self.get_notes(note='apples'), {'Apples'})
+
+        response = self.client.get(PATH_RECORD, {'note': 'plums'})
+        self.assertIn('note=plums', response.context['next_query'])
+        response = self.client.get(
+            f'{PATH_RECORD_PAGE}?{response.context["next_query"]}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Apples')
+        self.assertContains(response, 'Plums')
+
+
+class LedgerIndexTest(TestCase):
+    """
+    Check with `EXPLAIN QUERY PLAN` that the hot queries on `Ledger` are
+    served by an index instead of a full table scan.
+    """
+    # `SCAN ledger` without `USING INDEX` reads every row of the table.
+    FULL_SCAN = re.compile(r'SCAN ledger(?! USING (COVERING )?INDEX)')
+
+    def setUp(self):
+        self.account = create_account('Needs', 0, 0)
+        self.category = create_category('expense', 'Food', True)
+        self.end = timezone.make_aware(datetime(2023, 6, 1))
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIsNone(self.FULL_SCAN.search(plan), plan)
+        self.assertIn(index, plan)
+
+    def test_records_page(self):
+        records = Ledger.rows().order_by('-date_created', '-id')
+        self.assertUsesIndex(records[:51], 'ledger_date_idx')
+
+        after = keyset_filter(('date_created', 'id'), (self.end, 10))
+        self.assertUsesIndex(
+            records.filter(after)[:51], 'ledger_date_idx'
+        )
+
+    def test_spent_per_category_in_month(self):
+        spent = Ledger.in_month(2023, 5).filter(
+            category__in=[self.category],
+        ).values('category').annotate(total=Sum('amount'))
+        self.assertUsesIndex(spent, 'ledger_category_posted_idx')
+
+    def test_records_in_month(self):
+        self.assertUsesIndex(
+            Ledger.in_month(2023, 12), 'ledger_posted_on'
+        )
+
+    def test_account_history(self):
+        history = Ledger.objects.filter(
+            account=self.account
+        ).order_by('-date_created')
+        self.assertUsesIndex(history[:50], 'ledger_account_date_idx')
+
+
+class BudgetTest(TestCase):
+    """
+    Test the budget page.
+    """
+    def test_spent_only_counts_this_month(self):
+        """
+        Expenses of the same month in another year are not counted.
+        """
+        account = create_account('Needs', 0, 0)
+        food = create_category('expense', 'Food', True)
+        tax = create_category('expense', 'Tax', True)
+        today = timezone.localtime()
+        Budget.objects.create(
+            category=food, budget_limit=100,
+            month=today.month, year=today.year,
+        )
+        rollup.add_records([
+            create_ledger(account, food, 30, today),
+            create_ledger(
+                account, food, 50, today.replace(year=today.year - 1, day=1)
+            ),
+        ])
+
+        response = self.client.get(PATH_BUDGET)
+        budget_info, = response.context['budget_info_list']
+        self.assertEqual(budget_info['spent'], 30)
+        self.assertEqual(budget_info['remaining'], 70)
+        self.assertEqual(list(response.context['categories']), [tax])
+
+    def test_past_month(self):
+        """
+        The budget of any month can be reviewed, with a fixed number of
+        queries whatever the number of budgets.
+        """
+        account = create_account('Needs', 0, 0)
+        records = []
+        for name in ('Food', 'Bills', 'Car'):
+            category = create_category('expense', name, True)
+            Budget.objects.create(
+                category=category, budget_limit=200, month=5, year=2023,
+            )
+            records.append(create_ledger(
+                account, category, 50,
+                timezone.make_aware(datetime(2023, 5, 20)),
+            ))
+        create_category('expense', 'Tax', True)
+        rollup.add_records(records)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(PATH_BUDGET + '/2023/5')
+        self.assertEqual(
+            [
+                (info['category_name'], info['spent'], info['progress'])
+                for info in response.context['budget_info_list']
+            ],
+            [('Food', 50, 25), ('Bills', 50, 25), ('Car', 50, 25)],
+        )
+        self.assertEqual(response.context['previous_month'], (2023, 4))
+        self.assertEqual(response.context['next_month'], (2023, 6))
+        # Budgets are only set for the current month.
+        self.assertNotIn('categories', response.context)
+
+        response = self.client.get(PATH_BUDGET + '/2023/13')
+        self.assertEqual(response.status_code, 404)
+
+    def test_month_range(self):
+        """
+        Only the months of years 1 to 9999 have a page, and the first and
+        the last don't link past the range.
+        """
+        for path in ('/0/5', '/10000/5'):
+            response = self.client.get(PATH_BUDGET + path)
+            self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(PATH_BUDGET + '/1/1')
+        self.assertIsNone(response.context['previous_month'])
+        self.assertEqual(response.context['next_month'], (1, 2))
+        self.assertNotContains(response, 'Previous month')
+
+        response = self.client.get(PATH_BUDGET + '/9999/12')
+        self.assertEqual(response.context['previous_month'], (9999, 11))
+        self.assertIsNone(response.context['next_month'])
+        self.assertNotContains(response, 'Next month')
+
+
+class MonthlyCategoryTotalTest(TestCase):
+    """
+    Test that the monthly totals follow the records added and deleted.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 0)
+        self.wants = create_account('Wants', 50, 100)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        create_category('transfer', 'Transfer', True)
+
+    def post(self, path, account, amount, **data):
+        response = self.client.post(path, {
+            'account': account.pk,
+            'amount': amount,
+            'note': '',
+            'date': '2023-5-15',
+            'time': '15:15:00',
+            **data,
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def get_total(self, category):
+        return MonthlyCategoryTotal.objects.get(
+            category=category, year=2023, month=5
+        )
+
+    def test_totals_follow_records(self):
+        self.post(PATH_INCOME, self.needs, 100, category=self.sale.pk)
+        self.post(PATH_INCOME, self.needs, 20, category=self.sale.pk)
+        self.post(PATH_EXPENSE, self.wants, 30, category=self.food.pk)
+        self.post(PATH_TRANSFER, self.wants, 10, to_account=self.needs.pk)
+
+        sale = self.get_total(self.sale)
+        self.assertEqual((sale.income_total, sale.income_count), (120, 2))
+        food = self.get_total(self.food)
+        self.assertEqual((food.expense_total, food.expense_count), (30, 1))
+        self.assertEqual(MonthlyCategoryTotal.objects.count(), 2)
+
+        expense = Ledger.objects.get(category=self.food)
+        self.client.post(f'{PATH_DELETE_RECORD}/{expense.pk}')
+        food = self.get_total(self.food)
+        self.assertEqual((food.expense_total, food.expense_count), (0, 0))
+        self.assertEqual(rollup.verify(), [])
+
+    def test_delete_account(self):
+        self.post(PATH_INCOME, self.needs, 100, category=self.sale.pk)
+        self.post(PATH_INCOME, self.wants, 20, category=self.sale.pk)
+        self.client.post(f'{PATH_ACCOUNTS}/delete/{self.needs.pk}')
+
+        sale = self.get_total(self.sale)
+        self.assertEqual((sale.income_total, sale.income_count), (20, 1))
+        self.assertEqual(rollup.verify(), [])
+
+    def test_change_category_type(self):
+        """
+        The type of a category can only change while it has no records,
+        the totals of its records stay on their side.
+        """
+        self.post(PATH_INCOME, self.needs, 50, category=self.sale.pk)
+        path = f'{PATH_CATEGORIES}/edit/{self.sale.pk}'
+        response = self.client.post(path, {
+            'category_type': 'expense', 'category_name': 'Sale',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'category with records')
+        self.assertEqual(
+            Category.objects.get(pk=self.sale.pk).category_type, 'income'
+        )
+        self.assertEqual(rollup.verify(), [])
+
+        response = self.client.post(path, {
+            'category_type': 'income', 'category_name': 'Sales',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.client.post(f'{PATH_CATEGORIES}/edit/{self.food.pk}', {
+            'category_type': 'income', 'category_name': 'Food',
+        })
+        self.assertEqual(
+            Category.objects.get(pk=self.food.pk).category_type, 'income'
+        )
+
+    def test_delete_category_needs_post(self):
+        path = f'{PATH_CATEGORIES}/delete/{self.food.pk}'
+        self.assertEqual(self.client.get(path).status_code, 405)
+        self.assertTrue(Category.objects.filter(pk=self.food.pk).exists())
+        self.assertRedirects(self.client.post(path), PATH_CATEGORIES)
+        self.assertFalse(Category.objects.filter(pk=self.food.pk).exists())
+
+    def test_rebuild_command(self):
+        self.post(PATH_EXPENSE, self.wants, 30, category=self.food.pk)
+        MonthlyCategoryTotal.objects.update(expense_total=1)
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_monthly_totals', verify_only=True, stderr=StringIO()
+            )
+
+        call_command('rebuild_monthly_totals', stdout=StringIO())
+        self.assertEqual(self.get_total(self.food).expense_total, 30)
+
+
+class ReportTest(TestCase):
+    """
+    Test the totals over time and the series derived from them.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 0)
+        self.wants = create_account('Wants', 50, 0)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        transfer = create_category('transfer', 'Transfer', True)
+        tz = timezone.get_current_timezone()
+        records = []
+        for year, month, income, expense in (
+            (2022, 2, 50, 10),
+            (2023, 1, 100, 30),
+            (2023, 2, 200, 50),
+            (2023, 3, 120, 90),
+        ):
+            day = datetime(year, month, 10, 12, tzinfo=tz)
+            records += [
+                Ledger(account=self.needs, category=self.sale,
+                       amount=income, date_created=day),
+                Ledger(account=self.wants, category=self.food,
+                       amount=expense, date_created=day),
+                # Transfers aren't earned or spent.
+                Ledger(account=self.needs, to_account=self.wants,
+                       category=transfer, amount=5, date_created=day),
+            ]
+        posting.post(records)
+
+    def test_totals_by_month(self):
+        registry.load()
+        # The monthly totals by category are read from the rollup.
+        with self.assertNumQueries(1):
+            report = reporting.Report(date(2023, 1, 15), date(2023, 3, 1))
+        # Widened to whole months.
+        self.assertEqual(report.start, date(2023, 1, 1))
+        self.assertEqual(report.end, date(2023, 3, 31))
+        self.assertEqual(report.buckets, [
+            date(2023, 1, 1), date(2023, 2, 1), date(2023, 3, 1),
+        ])
+        self.assertEqual(
+            report.groups, [(self.sale.pk, 'Sale'), (self.food.pk, 'Food')]
+        )
+        self.assertEqual(report.income.tolist(), [[100, 200, 120], [0, 0, 0]])
+        self.assertEqual(report.expense.tolist(), [[0, 0, 0], [30, 50, 90]])
+        self.assertEqual(
+            report.running_total(total=True).tolist(), [70, 220, 250]
+        )
+        self.assertEqual(
+            report.moving_average(2, total=True).tolist(), [35, 110, 90]
+        )
+        # Months of the year before without records count as zero.
+        self.assertEqual(
+            report.year_over_year(total=True).tolist(), [70, 110, 30]
+        )
+
+        # The same totals by day, read from the ledger.
+        by_day = reporting.Report(
+            date(2023, 1, 1), date(2023, 3, 31), period='day'
+        )
+        self.assertEqual(
+            by_day.net.sum(axis=1).tolist(), report.net.sum(axis=1).tolist()
+        )
+
+    def test_totals_by_account_and_year(self):
+        report = reporting.Report(
+            date(2023, 1, 1), date(2023, 12, 31), period='year',
+            group_by='account',
+        )
+        self.assertEqual(report.buckets, [date(2023, 1, 1)])
+        self.assertEqual(
+            report.groups,
+            [(self.needs.pk, 'Needs'), (self.wants.pk, 'Wants')],
+        )
+        self.assertEqual(report.net.tolist(), [[420], [-170]])
+        self.assertEqual(
+            report.year_over_year(total=True).tolist(), [250 - 40]
+        )
+
+    def test_reports_page(self):
+        response = self.client.get(PATH_REPORTS, {
+            'start': '2023-01-01', 'end': '2023-03-31', 'window': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2023-02-01')
+        self.assertContains(response, 'Food')
+
+        response = self.client.get(f'{PATH_API}/report', {
+            'start': '2023-01-01', 'end': '2023-03-31', 'group_by': 'account',
+        })
+        data = response.json()
+        self.assertEqual(data['total']['net'], [70, 150, 30])
+        self.assertEqual([group['name'] for group in data['groups']],
+                         ['Needs', 'Wants'])
+
+        response = self.client.get(f'{PATH_API}/report', {
+            'start': '2023-03-31', 'end': '2023-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_report_range(self):
+        """
+        The dates and the number of buckets of a report are bounded, out
+        of bounds is a form error rather than a server error.
+        """
+        for start, end, period in (
+            ('0001-01-01', '0001-12-31', 'month'),
+            ('9999-01-01', '9999-12-31', 'month'),
+            ('1900-01-01', '2023-12-31', 'day'),
+        ):
+            response = self.client.get(f'{PATH_API}/report', {
+                'start': start, 'end': end, 'period': period,
+            })
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(PATH_REPORTS, {
+            'start': '1900-01-01', 'end': '2999-12-31', 'period': 'year',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            reporting.bucket_count(date(2023, 1, 15), date(2023, 3, 1),
+                                   'month'),
+            3,
+        )
+
+
+class SnapshotTest(TestCase):
+    """
+    Test the balances as of a date and the snapshots they start from.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 0)
+        self.wants = create_account('Wants', 50, 0)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        create_category('transfer', 'Transfer', True)
+        for month in range(1, 4):
+            self.post(PATH_INCOME, self.needs, 100, f'2023-{month}-10',
+                      category=self.sale.pk)
+            self.post(PATH_EXPENSE, self.needs, 30, f'2023-{month}-20',
+                      category=self.food.pk)
+            self.post(PATH_TRANSFER, self.needs, 10, f'2023-{month}-25',
+                      to_account=self.wants.pk)
+
+    def post(self, path, account, amount, day, **data):
+        response = self.client.post(path, {
+            'account': account.pk,
+            'amount': amount,
+            'note': '',
+            'date': day,
+            'time': '12:00:00',
+            **data,
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def assertBalancesMatchLedger(self, *days):
+        for day in days:
+            records = Ledger.objects.filter(posted_on__lte=day)
+            expected = dict(balances.with_true_balance(
+                records=records
+            ).values_list('pk', 'true_balance'))
+            self.assertEqual(snapshots.balances_as_of(day), expected)
+
+    def test_take(self):
+        self.assertEqual(snapshots.take(date(2023, 2, 28)), 4)
+        self.assertEqual(
+            list(AccountBalanceSnapshot.objects.filter(
+                account=self.needs
+            ).values_list('as_of', 'ledger_total')),
+            [(date(2023, 1, 31), 60), (date(2023, 2, 28), 120)],
+        )
+        # Taking again only adds the months since.
+        self.assertEqual(snapshots.take(date(2023, 3, 31)), 2)
+        self.assertEqual(snapshots.take(date(2023, 3, 31)), 0)
+        self.assertEqual(
+            snapshots.balances_as_of(date(2023, 3, 15)),
+            {self.needs.pk: 220, self.wants.pk: 20},
+        )
+        self.assertBalancesMatchLedger(
+            date(2022, 12, 31), date(2023, 1, 31), date(2023, 2, 10),
+            date(2023, 3, 31), date(2023, 4, 1),
+        )
+        with self.assertNumQueries(1):
+            snapshots.balances_as_of(date(2023, 3, 31))
+
+    def test_back_dated_records(self):
+        """
+        Records added or deleted before a snapshot move it.
+        """
+        call_command(
+            'take_balance_snapshots', '--until=2023-03-31', stdout=StringIO()
+        )
+        self.post(PATH_EXPENSE, self.wants, 5, '2023-1-31',
+                  category=self.food.pk)
+        self.post(PATH_TRANSFER, self.wants, 1, '2023-2-1',
+                  to_account=self.needs.pk)
+        income = Ledger.objects.filter(category=self.sale).earliest('pk')
+        self.client.post(f'{PATH_DELETE_RECORD}/{income.pk}')
+
+        self.assertEqual(
+            list(AccountBalanceSnapshot.objects.filter(
+                account=self.wants
+            ).values_list('ledger_total', flat=True)),
+            [5, 14, 24],
+        )
+        self.assertBalancesMatchLedger(
+            date(2023, 1, 31), date(2023, 2, 1), date(2023, 3, 31)
+        )
+        ledger_totals = list(
+            AccountBalanceSnapshot.objects.values_list('ledger_total')
+        )
+        call_command(
+            'take_balance_snapshots', '--until=2023-03-31', '--rebuild',
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            list(AccountBalanceSnapshot.objects.values_list('ledger_total')),
+            ledger_totals,
+        )
+
+    def test_delete_category(self):
+        """
+        The records of a deleted category leave the snapshots, the
+        accounts keep their balance.
+        """
+        snapshots.take(date(2023, 3, 31))
+        self.client.post(f'{PATH_CATEGORIES}/delete/{self.food.pk}')
+
+        self.assertFalse(Ledger.objects.filter(category=self.food).exists())
+        needs = Account.objects.get(pk=self.needs.pk)
+        self.assertEqual(needs.amount, 3 * (100 - 30 - 10))
+        self.assertEqual(balances.find_drift(), [])
+        self.assertEqual(
+            snapshots.balances_as_of(timezone.localdate())[needs.pk],
+            needs.amount,
+        )
+        self.assertBalancesMatchLedger(
+            date(2023, 1, 31), date(2023, 2, 15), date(2023, 3, 31)
+        )
+
+    def test_accounts_page(self):
+        snapshots.take(date(2023, 3, 31))
+        response = self.client.get(PATH_ACCOUNTS, {'as_of': '2023-02-15'})
+        self.assertContains(response, '160.00')
+        self.assertNotContains(response, '220.00')
+        response = self.client.get(PATH_ACCOUNTS, {'as_of': '2023-02-30'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ChoiceCacheTest(TestCase):
+    """
+    Test that the record forms read the accounts and categories from the
+    cache until they change.
+    """
+    REFERENCE_QUERY = re.compile(r'FROM "(account|category)"')
+
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.food = create_category('expense', 'Food', True)
+
+    def count_reference_queries(self, method, *args):
+        with CaptureQueriesContext(connection) as queries:
+            response = method(*args)
+        return response, len([
+            query for query in queries
+            if self.REFERENCE_QUERY.search(query['sql'])
+        ])
+
+    def test_cached_until_changed(self):
+        self.client.get(PATH_EXPENSE)
+        response, count = self.count_reference_queries(
+            self.client.get, PATH_EXPENSE
+        )
+        self.assertEqual(count, 0)
+        self.assertContains(response, 'Needs (100.00)')
+
+        response, count = self.count_reference_queries(
+            self.client.post, PATH_EXPENSE, {
+                'account': self.needs.pk,
+                'category': self.food.pk,
+                'amount': 30,
+                'note': '',
+                'date': '2023-5-15',
+                'time': '15:15:00',
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(count, 0)
+
+        # The balance and a new category show up in the next form.
+        create_category('expense', 'Rent', True)
+        response = self.client.get(PATH_EXPENSE)
+        self.assertContains(response, 'Needs (70.00)')
+        self.assertContains(response, 'Rent')
+
+    def test_invalid_choice(self):
+        form = ExpenseForm({
+            'account': self.needs.pk + 1,
+            'category': self.food.pk,
+            'amount': 30,
+            'date': '2023-5-15',
+            'time': '15:15:00',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('account', form.errors)
+
+
+class RegistryTest(TestCase):
+    """
+    Test the in-process registry of the categories.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.wants = create_account('Wants', 50, 0)
+        self.transfer = create_category('transfer', 'Transfer', True)
+        self.sale = create_category('income', 'Sale', True)
+
+    def test_transfer_without_category_query(self):
+        registry.load()
+        with CaptureQueriesContext(connection) as queries:
+            posting.post_transfer(
+                self.needs, self.wants, 10, '', timezone.now()
+            )
+        self.assertFalse(any(
+            'FROM "category"' in query['sql'] for query in queries
+        ))
+        self.assertEqual(Ledger.objects.get().category, self.transfer)
+
+    def test_refresh_on_change(self):
+        self.assertEqual(registry.incomes(), [self.sale])
+        salary = create_category('income', 'Salary', True)
+        self.assertEqual(registry.incomes(), [self.sale, salary])
+        self.sale.delete()
+        self.assertEqual(registry.incomes(), [salary])
+        self.assertEqual(registry.get(salary.pk), salary)
+        with self.assertRaises(Category.DoesNotExist):
+            registry.get(self.sale.pk)
+
+    def test_reload_missing(self):
+        registry.load()
+        # Created without the signal, e.g. by a bulk insert: the version
+        # isn't bumped, the lookup reads the categories again.
+        Category.objects.bulk_create(
+            [Category(category_type='expense', category_name='Rent')]
+        )
+        rent = Category.objects.get(category_name='Rent')
+        self.assertEqual(registry.get(rent.pk), rent)
+        self.assertEqual(registry.expenses(), [rent])
+
+    def test_threads_share_one_load(self):
+        create_category('expense', 'Food', True)
+        categories = registry.load()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            loaded = set(executor.map(
+                lambda _: id(registry.load()), range(32)
+            ))
+        self.assertEqual(loaded, {id(categories)})
+
+
+class AutoSplitTest(TestCase):
+    """
+    Test the auto split of an income to the accounts.
+    """
+    def setUp(self):
+        self.sale = create_category('income', 'Sale', True)
+
+    def test_split_amount(self):
+        """
+        The shares are exact to the cent and add up to the amount.
+        """
+        self.assertEqual(
+            posting.split_amount(100.01, [50, 30, 20]), [50.01, 30, 20]
+        )
+        self.assertEqual(
+            posting.split_amount(0.02, [34, 33, 33]), [0.01, 0.01, 0]
+        )
+        shares = posting.split_amount(1000, [1] * 3)
+        self.assertEqual(shares, [333.34, 333.33, 333.33])
+
+    def test_view(self):
+        needs = create_account('Needs', 50, 0)
+        wants = create_account('Wants', 30, 100)
+        savings = create_account('Savings', 20, 0)
+        create_account('Wallet', 0, 0)
+
+        response = self.client.post(PATH_INCOME, {
+            'account': needs.pk,
+            'category': self.sale.pk,
+            'auto_split': 'on',
+            'amount': '100.01',
+            'note': '',
+            'date': '2023-5-15',
+            'time': '15:15:00',
+        })
+        self.assertRedirects(response, PATH_RECORD, 302, 200)
+        self.assertEqual(
+            list(Ledger.objects.order_by('pk').values_list(
+                'account__account_name', 'amount'
+            )),
+            [('Needs', 50.01), ('Wants', 30), ('Savings', 20)],
+        )
+        self.assertEqual(
+            list(Account.objects.order_by('pk').values_list(
+                'amount', flat=True
+            )),
+            [50.01, 130, 20, 0],
+        )
+        total = MonthlyCategoryTotal.objects.get()
+        self.assertEqual(total.income_count, 3)
+
+    def test_query_count(self):
+        """
+        The number of queries doesn't grow with the number of accounts.
+        """
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                posting.post_split_income(
+                    self.sale, 1000, '', timezone.now()
+                )
+            return len(queries)
+
+        for i in range(3):
+            create_account(f'Account {i}', 10, 0)
+        # The first income of the month also creates its monthly total.
+        count_queries()
+        few_accounts = count_queries()
+        for i in range(3, 10):
+            create_account(f'Account {i}', 10, 0)
+        self.assertEqual(count_queries(), few_accounts)
+        self.assertEqual(Ledger.objects.count(), 16)
+
+
+class ImportTest(TestCase):
+    """
+    Test the import of bank files.
+    """
+    CSV = (
+        'date,amount,note,account,category\n'
+        '2023-05-01 09:00,1500.00,May salary,Bank,Salary\n'
+        '2023-05-02,-12.50,Lunch,Bank,Food\n'
+        '2023-05-03,-40,,Wallet,\n'
+    )
+    OFX = (
+        'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>\n'
+        '<BANKTRANLIST>\n'
+        '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20230504120000.000[-5:EST]\n'
+        '<TRNAMT>-25.10<NAME>HARDWARE STORE<MEMO>Nails\n</STMTTRN>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20230505\n<TRNAMT>100\n'
+        '<NAME>Refund\n</STMTTRN>\n'
+        '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+    )
+    QIF = (
+        '!Type:Bank\n'
+        "D5/6'23\nT-1,234.56\nPLandlord\nLRent:May\n^\n"
+        'D05/07/2023\nT20.00\nMGift\n^\n'
+    )
+
+    def setUp(self):
+        # The categories created by a test that was rolled back can still
+        # be in the registry.
+        registry.load(refresh=True)
+
+    def test_parsers(self):
+        rows = list(importers.parse_csv(self.CSV.splitlines(True)))
+        self.assertEqual(rows[0], importers.ImportRow(
+            datetime(2023, 5, 1, 9), 1500, 'May salary', 'Bank', 'Salary'
+        ))
+        self.assertEqual(rows[2].category, None)
+
+        rows = list(importers.parse_ofx(self.OFX.splitlines(True)))
+        self.assertEqual(rows, [
+            importers.ImportRow(
+                datetime(2023, 5, 4, 12), -25.10, 'HARDWARE STORE Nails',
+                None, None,
+            ),
+            importers.ImportRow(
+                datetime(2023, 5, 5), 100, 'Refund', None, None
+            ),
+        ])
+
+        rows = list(importers.parse_qif(self.QIF.splitlines(True)))
+        self.assertEqual(rows, [
+            importers.ImportRow(
+                datetime(2023, 5, 6), -1234.56, 'Landlord', None, 'Rent'
+            ),
+            importers.ImportRow(
+                datetime(2023, 5, 7), 20, 'Gift', None, None
+            ),
+        ])
+
+        with self.assertRaises(importers.ImportFileError):
+            list(importers.parse_csv(['date,amount\n', 'May 5,10\n']))
+
+    def test_command(self):
+        bank = create_account('Bank', 0, 100)
+        stdout = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'bank.csv'
+            path.write_text(self.CSV, encoding='utf-8-sig')
+            call_command('import_ledger', path, batch_size=2, stdout=stdout)
+            call_command('import_ledger', path, stdout=stdout)
+        self.assertIn('Imported 3 rows', stdout.getvalue())
+        self.assertIn('Imported 0 rows', stdout.getvalue())
+        self.assertIn('3 imported before', stdout.getvalue())
+
+        bank.refresh_from_db()
+        self.assertEqual(bank.amount, 100 + 1500 - 12.5)
+        wallet = Account.objects.get(account_name='Wallet')
+        self.assertEqual(wallet.amount, -40)
+        self.assertEqual(
+            Ledger.objects.get(account=wallet).category.category_name,
+            'Uncategorized',
+        )
+        self.assertEqual(rollup.verify(), [])
+
+    def import_lines(self, lines, resume=None, **options):
+        ledger_import = importers.start_import(
+            importers.file_digest(line.encode() for line in lines),
+            'bank.csv', resume,
+        )
+        return importers.import_file(lines, 'csv', ledger_import, **options)
+
+    def test_resume(self):
+        """
+        The batches are committed one by one, an import stopped by a bad
+        line is resumed after the rows it imported, and importing the
+        same file again adds nothing.
+        """
+        bank = create_account('Bank', 0, 100)
+        lines = self.CSV.splitlines(True) + ['2023-05-04,abc,Bad,Bank,\n']
+        for _ in range(2):
+            with self.assertRaisesRegex(
+                importers.ImportFileError,
+                r'Invalid amount.* 3 rows before it are imported.*resume '
+                r'import \d+',
+            ):
+                self.import_lines(lines, batch_size=1)
+            self.assertEqual(Ledger.objects.count(), 3)
+        bank.refresh_from_db()
+        self.assertEqual(bank.amount, 100 + 1500 - 12.5)
+
+        ledger_import = LedgerImport.objects.get()
+        self.assertEqual((ledger_import.rows, ledger_import.finished),
+                         (3, False))
+        lines[-1] = '2023-05-04,-7,Fixed,Bank,\n'
+        result = self.import_lines(lines, resume=ledger_import.pk)
+        self.assertEqual((result.rows, result.skipped), (1, 3))
+        # The fixed file is known as imported.
+        result = self.import_lines(lines)
+        self.assertEqual((result.rows, result.skipped), (0, 4))
+        self.assertEqual(Ledger.objects.count(), 4)
+        bank.refresh_from_db()
+        self.assertEqual(bank.amount, 100 + 1500 - 12.5 - 7)
+        self.assertEqual(rollup.verify(), [])
+
+        with self.assertRaisesRegex(importers.ImportFileError, 'no import'):
+            self.import_lines(lines, resume=ledger_import.pk + 1)
+
+        # The count moved by another run of the same import.
+        ledger_import = importers.start_import('other', 'other.csv')
+        LedgerImport.objects.filter(pk=ledger_import.pk).update(rows=1)
+        with self.assertRaisesRegex(importers.ImportFileError, 'running'):
+            importers.import_file(self.CSV.splitlines(True), 'csv',
+                                  ledger_import)
+        self.assertEqual(Ledger.objects.count(), 4)
+
+        # A field over the size limit of the csv module.
+        too_long = '2023-05-04,' + '1' * (csv.field_size_limit() + 1)
+        with self.assertRaisesRegex(importers.ImportFileError, 'after line 1'):
+            list(importers.parse_csv(['date,amount\n', too_long]))
+
+    def test_upload_view(self):
+        bank = create_account('Bank', 0, 0)
+        response = self.client.post(PATH_IMPORT, {
+            'file': SimpleUploadedFile('bank.ofx', self.OFX.encode()),
+            'file_format': 'ofx',
+            'account': bank.pk,
+        })
+        self.assertRedirects(response, PATH_RECORD, 302, 200)
+        bank.refresh_from_db()
+        self.assertAlmostEqual(bank.amount, 100 - 25.10)
+        self.assertEqual(Ledger.objects.count(), 2)
+
+        response = self.client.post(PATH_IMPORT, {
+            'file': SimpleUploadedFile('bank.qif', b'D13/45/2023\nT1\n^\n'),
+            'file_format': 'qif',
+            'account': bank.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Invalid date', response.context['error'])
+
+        response = self.client.post(PATH_IMPORT, {
+            'file': SimpleUploadedFile(
+                'bank.csv', b'date,amount\n2023-05-04,' + b'1' * 200000
+            ),
+            'file_format': 'csv',
+            'account': bank.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Invalid CSV', response.context['error'])
+
+        # Saved by a spreadsheet, with a byte order mark.
+        response = self.client.post(PATH_IMPORT, {
+            'file': SimpleUploadedFile(
+                'bank.csv', '\ufeffdate,amount\n2023-05-04,-3\n'.encode()
+            ),
+            'file_format': 'csv',
+            'account': bank.pk,
+        })
+        self.assertRedirects(response, PATH_RECORD, 302, 200)
+        self.assertTrue(Ledger.objects.filter(amount=3).exists())
+
+
+class ExportTest(TestCase):
+    """
+    Test the export of the ledger.
+    """
+    def setUp(self):
+        self.bank = create_account('Bank', 0, 0)
+        self.wallet = create_account('Wallet', 0, 0)
+        self.food = create_category('expense', 'Food', True)
+        self.transfer = create_category('transfer', 'Transfer', True)
+        for day in range(1, 11):
+            create_ledger(
+                self.bank, self.food, day,
+                timezone.make_aware(datetime(2023, 5, day, 12)),
+                note=f'Lunch, day {day}',
+            )
+        Ledger.objects.create(
+            account=self.bank, to_account=self.wallet, category=self.transfer,
+            amount=50, date_created=timezone.make_aware(datetime(2023, 6, 1)),
+        )
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.client.get(PATH_EXPORT)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(self.read(response).decode().splitlines()))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0]['note'], 'Lunch, day 1')
+        self.assertEqual(rows[0]['category_name'], 'Food')
+        self.assertEqual(rows[-1]['to_account_name'], 'Wallet')
+
+    def test_filters_jsonl_gzip(self):
+        response = self.client.get(PATH_EXPORT, {
+            'format': 'jsonl',
+            'gzip': 'on',
+            'start': '2023-05-03',
+            'end': '2023-06-30',
+            'account': self.wallet.pk,
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('ledger.jsonl.gz', response['Content-Disposition'])
+        lines = gzip.decompress(self.read(response)).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['amount'], 50)
+
+        response = self.client.get(PATH_EXPORT, {
+            'category': self.food.pk, 'start': '2023-05-03',
+        })
+        self.assertEqual(len(self.read(response).splitlines()), 1 + 8)
+
+        response = self.client.get(PATH_EXPORT, {'start': 'May'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'ledger.csv.gz'
+            call_command(
+                'export_ledger', output=path, gzip=True,
+                account=self.bank.pk,
+            )
+            lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 11)
+
+
+class SearchTest(TestCase):
+    """
+    Test the full-text search of the records and the index it reads.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 0)
+        self.wants = create_account('Wants', 50, 0)
+        self.food = create_category('expense', 'Food', True)
+        self.tools = create_category('expense', 'Tools', True)
+        start = timezone.make_aware(datetime(2023, 5, 1, 12))
+        self.hammer = create_ledger(
+            self.needs, self.tools, 20, start,
+            note='Hammer at the hardware store',
+        )
+        self.nails = create_ledger(
+            self.needs, self.tools, 5, start + timedelta(days=1),
+            note='Nails, hardware',
+        )
+        self.bread = create_ledger(
+            self.wants, self.food, 3, start, note='Bread at the bakery'
+        )
+
+    def ids(self, query, **kwargs):
+        return [row.id for row in search.search(query, **kwargs).rows]
+
+    def test_search(self):
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.ids('hardware store')
+        self.assertEqual(ids, [self.hammer.pk])
+        self.assertFalse(
+            any('LIKE' in query['sql'] for query in queries.captured_queries)
+        )
+        # The last word is a prefix, the names are searched too.
+        self.assertEqual(
+            set(self.ids('hard')), {self.hammer.pk, self.nails.pk}
+        )
+        self.assertEqual(self.ids('wants'), [self.bread.pk])
+        # Operators are searched as text.
+        self.assertEqual(self.ids('bread OR "nails'), [])
+        self.assertEqual(self.ids('  '), [])
+
+        results = search.search('tools', size=1)
+        self.assertTrue(results.has_next)
+        self.assertEqual(len(results.rows), 1)
+        self.assertFalse(search.search('tools', size=1, offset=1).has_next)
+
+    def test_index_follows_changes(self):
+        self.wants.account_name = 'Pantry'
+        self.wants.save()
+        self.assertEqual(self.ids('pantry'), [self.bread.pk])
+        self.assertEqual(self.ids('wants'), [])
+
+        self.client.post(f'{PATH_DELETE_RECORD}/{self.nails.pk}')
+        self.assertEqual(self.ids('nails'), [])
+        # The records deleted with their account leave the index too.
+        self.client.post(f'{PATH_ACCOUNTS}/delete/{self.needs.pk}')
+        self.assertEqual(self.ids('hammer'), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM ledger_search')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.ids('bakery'), [self.bread.pk])
+
+    def test_search_views(self):
+        response = self.client.get(PATH_SEARCH, {'q': 'bakery'})
+        self.assertContains(response, 'Bread at the bakery')
+        self.assertNotContains(response, 'Hammer')
+
+        response = self.client.get(f'{PATH_API}/search', {'q': 'hardware'})
+        data = response.json()
+        self.assertEqual(
+            [row['note'] for row in data['results']],
+            # The shorter note matches better.
+            ['Nails, hardware', 'Hammer at the hardware store'],
+        )
+        self.assertIsNone(data['next_offset'])
+        response = self.client.get(
+            f'{PATH_API}/search', {'q': 'hardware', 'size': 0}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ReconcileTest(TestCase):
+    """
+    Test the reconciliation of the balances with the ledger.
+    """
+    def setUp(self):
+        for name, amount in (('Needs', 100), ('Wants', 50)):
+            self.client.post(PATH_ACCOUNT_CREATE, {
+                'account_name': name,
+                'splitting_percent': 0,
+                'initial_amount': amount,
+            })
+        self.needs, self.wants = Account.objects.order_by('pk')
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        create_category('transfer', 'Transfer', True)
+        now = timezone.now()
+        posting.post_record(self.needs, self.sale, 30, '', now)
+        posting.post_record(self.wants, self.food, 20, '', now)
+        posting.post_transfer(self.needs, self.wants, 10, '', now)
+
+    def test_balances_match(self):
+        self.assertEqual(balances.find_drift(), [])
+        wants = balances.with_true_balance().get(pk=self.wants.pk)
+        self.assertEqual(wants.true_balance, 50 - 20 + 10)
+
+    def test_edit_and_delete_account(self):
+        """
+        Setting an amount by hand or moving the balance of a deleted
+        account doesn't count as drift.
+        """
+        self.client.post(f'{PATH_ACCOUNTS}/edit/{self.needs.pk}', {
+            'account_name': 'Needs',
+            'splitting_percent': 0,
+            'initial_amount': 500,
+        })
+        self.assertEqual(Account.objects.get(pk=self.needs.pk).amount, 500)
+        self.assertEqual(balances.find_drift(), [])
+
+        self.client.post(
+            f'{PATH_ACCOUNTS}/delete/{self.wants.pk}',
+            {'transfer': 'on', 'transfer_to_account': self.needs.pk},
+        )
+        self.assertEqual(Account.objects.get().amount, 500 + 40)
+        self.assertEqual(balances.find_drift(), [])
+
+    def test_command_and_admin_action(self):
+        Account.objects.filter(pk=self.needs.pk).update(amount=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_balances', stdout=StringIO())
+
+        stdout = StringIO()
+        call_command('reconcile_balances', repair=True, stdout=stdout)
+        self.assertIn('Repaired 1 balances', stdout.getvalue())
+        self.assertEqual(Account.objects.get(pk=self.needs.pk).amount, 120)
+
+        Account.objects.filter(pk=self.wants.pk).update(amount=0)
+        self.client.force_login(
+            User.objects.create_superuser('admin', password='admin')
+        )
+        self.client.post('/admin/the_budget_app/account/', {
+            'action': 'repair_balances',
+            '_selected_action': [self.needs.pk, self.wants.pk],
+        })
+        self.assertEqual(Account.objects.get(pk=self.wants.pk).amount, 40)
+
+    def test_opening_amount_backfill(self):
+        """
+        The migration adding the opening amounts takes the balance left
+        without records as the opening amount, and logs it to be checked.
+        """
+        migration = import_module(
+            'the_budget_app.migrations.0012_account_opening_amount'
+        )
+        Account.objects.update(opening_amount=0)
+        Account.objects.filter(pk=self.wants.pk).update(amount=45)
+        with self.assertLogs('the_budget_app.migrations') as logs:
+            migration.set_opening_amount(django_apps, None)
+        self.assertEqual(
+            list(Account.objects.order_by('pk').values_list(
+                'opening_amount', flat=True
+            )),
+            [100, 45 + 20 - 10],
+        )
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn(
+            f'Account {self.wants.pk} (Wants): 55.00 of its balance of '
+            '45.00 has no record',
+            logs.output[1],
+        )
+
+
+class ApiTest(TestCase):
+    """
+    Test the JSON API.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 0)
+        self.wants = create_account('Wants', 50, 0)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        Budget.objects.create(
+            category=self.food, budget_limit=100, month=5, year=2023
+        )
+        start = timezone.make_aware(datetime(2023, 5, 1, 12))
+        self.records = [
+            create_ledger(
+                self.needs if i % 2 else self.wants,
+                self.sale,
+                i,
+                start + timedelta(days=i // 2),
+            )
+            for i in range(1, 8)
+        ]
+
+    def get(self, resource, **params):
+        response = self.client.get(f'{PATH_API}/{resource}', params)
+        return response.status_code, response.json()
+
+    def test_ledger_pages(self):
+        ids = []
+        cursor = None
+        while True:
+            params = {'size': 3, 'fields': 'id,amount,account_name'}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(1):
+                status, body = self.get('ledger', **params)
+            self.assertEqual(status, 200)
+            ids += [row['id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                self.assertIsNone(body['next'])
+                break
+            self.assertIn(f'cursor={cursor}', body['next'])
+        self.assertEqual(
+            ids, [record.pk for record in reversed(self.records)]
+        )
+        self.assertEqual(
+            body['results'][-1],
+            {'id': self.records[0].pk, 'amount': 1, 'account_name': 'Needs'},
+        )
+
+    def test_ledger_filters(self):
+        status, body = self.get(
+            'ledger', account=self.needs.pk, start='2023-05-02',
+            fields='amount',
+        )
+        self.assertEqual(
+            [row['amount'] for row in body['results']], [7, 5, 3]
+        )
+        status, body = self.get('ledger', category=self.food.pk)
+        self.assertEqual(body['results'], [])
+
+    def test_other_resources(self):
+        status, body = self.get('accounts', fields='account_name')
+        self.assertEqual(
+            body['results'],
+            [{'account_name': 'Needs'}, {'account_name': 'Wants'}],
+        )
+        status, body = self.get('categories', type='expense')
+        self.assertEqual(
+            [row['category_name'] for row in body['results']], ['Food']
+        )
+        status, body = self.get('budgets', year=2023, month=5)
+        self.assertEqual(
+            body['results'][0]['category_name'], 'Food'
+        )
+        self.assertEqual(body['results'][0]['budget_limit'], 100)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'fields': 'id,password'},
+            {'size': 0},
+            {'size': 'ten'},
+            {'cursor': 'abc'},
+            {'cursor': encode_cursor([datetime(2023, 5, 1, 12), 1])},
+            {'start': 'yesterday'},
+        ):
+            status, body = self.get('ledger', **params)
+            self.assertEqual(status, 400)
+            self.assertIn('error', body)
+        response = self.client.post(f'{PATH_API}/ledger')
+        self.assertEqual(response.status_code, 405)
+
+
+class BatchPostingTest(TestCase):
+    """
+    Test posting a batch of records through the API.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.wants = create_account('Wants', 50, 0)
+        self.sale = create_category('income', 'Sale', True)
+        self.food = create_category('expense', 'Food', True)
+        create_category('transfer', 'Transfer', True)
+
+    def post(self, postings, content_type='application/json'):
+        response = self.client.post(
+            f'{PATH_API}/postings',
+            json.dumps({'postings': postings}),
+            content_type=content_type,
+        )
+        return response.status_code, response.json()
+
+    def postings(self, count):
+        kinds = [
+            {'type': 'income', 'account': self.wants.pk,
+             'category': self.sale.pk, 'amount': '10.50'},
+            {'type': 'expense', 'account': self.needs.pk,
+             'category': self.food.pk, 'amount': 2},
+            {'type': 'transfer', 'account': self.needs.pk,
+             'to_account': self.wants.pk, 'amount': '1'},
+        ]
+        return [
+            {**kinds[i % 3], 'date_created': f'2023-05-{i % 28 + 1:02}T12:00'}
+            for i in range(count)
+        ]
+
+    def test_post_batch(self):
+        status, body = self.post(self.postings(30))
+        self.assertEqual(status, 201)
+        self.assertEqual(len(body['ids']), 30)
+        self.assertEqual(Ledger.objects.count(), 30)
+        self.assertEqual(
+            list(Account.objects.order_by('pk').values_list(
+                'amount', flat=True
+            )),
+            [100 - 10 * 3, 10 * (10.5 + 1)],
+        )
+        self.assertEqual(rollup.verify(), [])
+
+    def test_query_count(self):
+        """
+        The number of queries doesn't grow with the size of the batch,
+        up to the rows SQLite takes in one INSERT.
+        """
+        self.post(self.postings(3))
+
+        def count_queries(count):
+            with CaptureQueriesContext(connection) as queries:
+                self.post(self.postings(count))
+            return len(queries)
+
+        self.assertEqual(count_queries(3), count_queries(100))
+
+    def test_invalid_batch(self):
+        postings = self.postings(3)
+        postings[1]['category'] = self.sale.pk
+        postings[2]['to_account'] = self.needs.pk
+        status, body = self.post(postings)
+        self.assertEqual(status, 400)
+        self.assertEqual(
+            [
+                (error['index'], list(error['errors']))
+                for error in body['errors']
+            ],
+            [(1, ['category']), (2, ['to_account'])],
+        )
+        self.assertFalse(Ledger.objects.exists())
+
+        # Wants has no balance, which the expense and transfer forms
+        # don't offer either.
+        postings = self.postings(3)
+        postings[1]['account'] = self.wants.pk
+        postings[2].update(account=self.wants.pk, to_account=self.needs.pk)
+        status, body = self.post(postings)
+        self.assertEqual(
+            [
+                (error['index'], error['errors']['account'][0]['message'])
+                for error in body['errors']
+            ],
+            [
+                (1, 'The account has no balance.'),
+                (2, 'The account has no balance.'),
+            ],
+        )
+        self.assertFalse(Ledger.objects.exists())
+
+        status, body = self.post(postings, content_type='text/plain')
+        self.assertEqual(status, 415)
+        status, body = self.post([])
+        self.assertEqual(status, 400)
+
+
+class AsyncViewTest(TestCase):
+    """
+    Test the async read views served under ASGI.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.food = create_category('expense', 'Food', True)
+        today = timezone.localdate()
+        Budget.objects.create(
+            category=self.food, budget_limit=40,
+            month=today.month, year=today.year,
+        )
+        for i in range(60):
+            posting.post_record(
+                self.needs, self.food, 1, f'Lunch {i}', timezone.now()
+            )
+
+    def test_routes(self):
+        for path, view in (
+            (PATH_RECORD, async_view.records),
+            (PATH_ACCOUNTS, async_view.accounts),
+            (PATH_BUDGET, async_view.budget),
+            ('/budget/2023/5', async_view.budget),
+        ):
+            self.assertIs(resolve(path, ASGI_URLCONF).func, view)
+
+    async def test_same_pages(self):
+        client = AsyncClient()
+        for path in ('/', PATH_ACCOUNTS, PATH_BUDGET):
+            response = await client.get(path)
+            self.assertEqual(
+                response.content, (await self.sync_get(path)).content
+            )
+
+        response = await client.get(PATH_RECORD)
+        self.assertContains(response, 'Lunch 59')
+        self.assertNotContains(response, 'Lunch 9<')
+        next_page = re.search(r'cursor=([^"]+)', response.content.decode())
+        response = await client.get(
+            PATH_RECORD_PAGE, {'cursor': next_page.group(1)}
+        )
+        self.assertContains(response, 'Lunch 9<')
+
+    def sync_get(self, path):
+        return sync_to_async(self.client.get)(path)
+
+
+class ServerTimingTest(TestCase):
+    """
+    Test the Server-Timing header and log of the requests.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.food = create_category('expense', 'Food', True)
+        for i in range(3):
+            posting.post_record(
+                self.needs, self.food, 1, f'Lunch {i}', timezone.now()
+            )
+
+    def get_timings(self, response):
+        return dict(
+            re.match(r' ?(\w+);(?:desc="(\d+) queries";)?dur=([\d.]+)', part)
+            .group(1, 3)
+            for part in response['Server-Timing'].split(',')
+        )
+
+    def test_disabled(self):
+        response = self.client.get(PATH_RECORD)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_timings(self):
+        with self.assertLogs('the_budget_app.timing') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(PATH_RECORD)
+        self.assertIn(
+            f'sql;desc="{len(queries)} queries"', response['Server-Timing']
+        )
+        timings = self.get_timings(response)
+        self.assertGreater(float(timings['template']), 0)
+        self.assertGreaterEqual(
+            float(timings['total']),
+            float(timings['sql']) + float(timings['template']),
+        )
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            (line['method'], line['path'], line['status'], line['queries']),
+            ('GET', PATH_RECORD, 200, len(queries)),
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    async def test_async_timings(self):
+        # The async views query from another thread, here the test's
+        # own, whose connection was opened before the middleware was
+        # loaded. A server's connections are opened by its requests.
+        await sync_to_async(instrumentation.install_sql_wrapper)()
+        with self.assertLogs('the_budget_app.timing') as logs:
+            response = await AsyncClient().get(PATH_ACCOUNTS)
+        self.assertIn('Server-Timing', response)
+        self.assertGreater(
+            json.loads(logs.records[0].getMessage())['queries'], 0
+        )
+
+
+class SlowQueryTest(TestCase):
+    """
+    Test the log of the slow queries and its report.
+    """
+    def setUp(self):
+        self.needs = create_account('Needs', 50, 100)
+        self.food = create_category('expense', 'Food', True)
+        # The wrapper stays on the connections, stop it logging.
+        self.addCleanup(slow_queries.configure, None)
+
+    def get_entries(self, path):
+        with self.assertLogs('the_budget_app.slow_queries') as logs:
+            self.client.get(path)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_log(self):
+        entries = self.get_entries(PATH_BUDGET)
+        entry = next(
+            entry for entry in entries if 'FROM "budget"' in entry['sql']
+        )
+        self.assertEqual(
+            entry['view'], 'the_budget_app.views.budget_view.index'
+        )
+        # The app code that ran the query, not Django's: the queryset
+        # is read while the view renders.
+        self.assertRegex(
+            entry['frame'], r'^views/budget_view\.py:\d+ in index$'
+        )
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+
+        slow_queries.configure(60 * 1000)
+        with self.assertNoLogs('the_budget_app.slow_queries'):
+            self.client.get(PATH_BUDGET)
+
+    def test_executemany_params(self):
+        """
+        The parameter sets of an executemany given as an iterator are
+        both run and logged.
+        """
+        slow_queries.configure(0)
+        rows = ((name, 0, 0, 0) for name in ('Wants', 'Savings'))
+        with self.assertLogs('the_budget_app.slow_queries') as logs, \
+                connection.execute_wrapper(slow_queries.slow_query_wrapper), \
+                connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO account (account_name, splitting_percent, '
+                'amount, opening_amount) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+        self.assertEqual(Account.objects.count(), 3)
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['params']['count'], 2)
+        self.assertEqual(entry['params']['first'][1], ['Savings', 0, 0, 0])
+
+    def test_normalize(self):
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT *  FROM ledger WHERE id IN (1, 2, 3)\n"
+                "AND note = 'it''s' AND amount > %s"
+            ),
+            'SELECT * FROM ledger WHERE id IN (...) AND note = ? '
+            'AND amount > ?',
+        )
+
+    def test_report(self):
+        entries = [
+            {'sql': f'SELECT * FROM ledger WHERE id = {pk}',
+             'duration_ms': 100 * pk, 'view': 'records_view.index',
+             'frame': 'views/records_view.py:10 in index'}
+            for pk in range(1, 4)
+        ] + [
+            {'sql': 'SELECT * FROM account', 'duration_ms': 50,
+             'view': 'accounts_view.index', 'frame': None},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'slow.jsonl'
+            # A rotated backup and a line cut by a crash.
+            Path(f'{path}.1').write_text(json.dumps(entries[0]) + '\n{"sq')
+            path.write_text(
+                ''.join(json.dumps(entry) + '\n' for entry in entries[1:])
+            )
+            summaries = slow_queries.summarize(slow_queries.read(path))
+            stdout = StringIO()
+            call_command(
+                'slow_query_report', f'--file={path}', '--limit=1',
+                stdout=stdout,
+            )
+        self.assertEqual(
+            [(summary['shape'], summary['count'], summary['total_ms'])
+             for summary in summaries],
+            [('SELECT * FROM ledger WHERE id = ?', 3, 600),
+             ('SELECT * FROM account', 1, 50)],
+        )
+        self.assertIn('600ms in 3 queries, up to 300ms', stdout.getvalue())
+        self.assertIn('views/records_view.py:10 in index', stdout.getvalue())
+        self.assertNotIn('FROM account', stdout.getvalue())
+
+
+class BenchmarkTest(TestCase):
+    """
+    Test the synthetic data and the timing of every URL on it.
+    """
+    def setUp(self):
+        benchmark_data.seed(records=500, accounts=3, incomes=2, expenses=4)
+
+    def test_seed(self):
+        self.assertEqual(Ledger.objects.count(), 500)
+        self.assertEqual(Account.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 8)
+        self.assertEqual(Budget.objects.count(), 4 * 12)
+        self.assertEqual(
+            Account.objects.aggregate(Sum('splitting_percent'))[
+                'splitting_percent__sum'
+            ],
+            100,
+        )
+        self.assertEqual(balances.reconcile(), [])
+        self.assertEqual(rollup.verify(), [])
+        self.assertEqual(search.rebuild(), 500)
+        # The same seed makes the same records. The cache, shared with
+        # the other processes, isn't cleared, the versions move on.
+        amounts = list(Ledger.objects.values_list('amount', flat=True))
+        cache.set('the_budget_app:other', 1)
+        version = choices.version(registry.VERSION_KEY)
+        benchmark_data.seed(records=500, accounts=3, incomes=2, expenses=4)
+        self.assertEqual(cache.get('the_budget_app:other'), 1)
+        self.assertNotEqual(choices.version(registry.VERSION_KEY), version)
+        self.assertEqual(
+            list(Ledger.objects.values_list('amount', flat=True)), amounts
+        )
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_run(self):
+        results = benchmark_runner.run(repeat=1)
+        self.assertEqual(
+            {name for name in results if name.startswith('GET ')},
+            {f'GET {name}' for name in benchmark_runner.url_names()},
+        )
+        for name in ('POST new_income', 'POST new_transfer',
+                     'POST api_postings', 'POST delete_record'):
+            self.assertIn(results[name]['status'], (201, 302))
+            self.assertGreater(results[name]['queries'], 0)
+
+        baseline = {'scales': {'500': {'cases': {
+            'GET record': {**results['GET record'], 'median_ms': 0.01},
+        }}}}
+        lines = benchmark_runner.compare(
+            baseline, {'scales': {'500': {'cases': results}}}
+        )
+        self.assertEqual(len(lines), 1)
+        self.assertIn('slower', lines[0])
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Pin the number of queries of every view, GET and POST, at two data
+    sizes, so that a view whose queries grow with the accounts, the
+    categories or the records fails. Every request starts with an empty
+    cache: the cached choices and record days are read in the count.
+    """
+    SIZES = (
+        {'records': 30, 'accounts': 2, 'incomes': 2, 'expenses': 3},
+        {'records': 300, 'accounts': 5, 'incomes': 6, 'expenses': 12},
+    )
+    GET = {
+        'index': 0,
+        'account': 1,
+        'add_account': 2,
+        'update_account': 3,
+        'delete_account': 2,
+        'new_income': 2,
+        'new_expense': 2,
+        'new_transfer': 1,
+        'record': 4,
+        'record_page': 3,
+        'import_records': 1,
+        'export_records': 0,
+        'search_records': 2,
+        'detail_record': 1,
+        'delete_record': 0,
+        'budget': 2,
+        'budget_month': 2,
+        'create_budget': 3,
+        'edit_budget': 4,
+        'category': 1,
+        'add_category': 0,
+        'edit_category': 1,
+        'delete_category': 0,
+        'reports': 2,
+        'api_ledger': 1,
+        'api_accounts': 1,
+        'api_categories': 1,
+        'api_budgets': 1,
+        'api_search': 2,
+        'api_postings': 0,
+        'api_report': 2,
+    }
+    POST = {
+        'add_account': 2,
+        'update_account': 3,
+        'delete_account': 16,
+        'new_income': 13,
+        'new_income auto_split': 14,
+        'new_expense': 13,
+        'new_transfer': 9,
+        'import_records': 22,
+        'delete_record': 9,
+        'create_budget': 4,
+        'edit_budget': 5,
+        'add_category': 1,
+        'edit_category': 4,
+        'delete_category': 10,
+        'api_postings': 13,
+    }
+
+    def post_data(self, samples):
+        """
+        Returns the body of each POST case, by case name.
+        """
+        needs, wants = samples.accounts
+        csv_file = (
+            'date,amount,note,category\n'
+            f'{samples.today},1500.00,Salary,{samples.income.category_name}\n'
+            f'{samples.today},-12.50,Lunch,{samples.expense.category_name}\n'
+            f'{samples.today},-40,Fuel,\n'
+        )
+        return {
+            'add_account': {'account_name': 'Cash', 'initial_amount': 10},
+            'update_account': {
+                'account_name': 'Renamed',
+                'splitting_percent': needs.splitting_percent,
+                'initial_amount': 500,
+            },
+            'delete_account': {
+                'transfer': 'on', 'transfer_to_account': wants.pk,
+            },
+            'new_income': samples.record_form(category=samples.income.pk),
+            'new_income auto_split': samples.record_form(
+                category=samples.income.pk, auto_split='on'
+            ),
+            'new_expense': samples.record_form(category=samples.expense.pk),
+            'new_transfer': samples.record_form(to_account=wants.pk),
+            'import_records': {
+                'file': SimpleUploadedFile('bank.csv', csv_file.encode()),
+                'file_format': 'csv',
+                'account': needs.pk,
+            },
+            'delete_record': {},
+            'create_budget': {'budget_limit': 100},
+            'edit_budget': {'budget_limit': 123},
+            'add_category': {
+                'category_type': 'expense', 'category_name': 'Garden',
+            },
+            'edit_category': {
+                'category_type': 'expense', 'category_name': 'Renamed',
+            },
+            'delete_category': {},
+            'api_postings': samples.batch(),
+        }
+
+    def request(self, method, samples, name, data=None):
+        url_name = name.split()[0]
+        path = reverse(
+            f'the_budget:{url_name}', kwargs=samples.url_kwargs(url_name)
+        )
+        if url_name in benchmark_runner.QUERIES:
+            path += '?' + benchmark_runner.QUERIES[url_name]
+        if method == 'get':
+            return self.client.get(path)
+        if url_name.startswith('api_'):
+            return self.client.post(
+                path, json.dumps(data), content_type='application/json'
+            )
+        return self.client.post(path, data)
+
+    def check_budgets(self, size):
+        # A new URL needs its budget.
+        self.assertEqual(set(self.GET), set(benchmark_runner.url_names()))
+        benchmark_data.seed(**size)
+        samples = benchmark_runner.Samples()
+        cases = [
+            ('get', name, count, None) for name, count in self.GET.items()
+        ]
+        data = self.post_data(samples)
+        cases += [
+            ('post', name, count, data[name])
+            for name, count in self.POST.items()
+        ]
+        for method, name, count, body in cases:
+            with self.subTest(method=method, name=name, **size):
+                cache.clear()
+                # Each case starts from the seeded data.
+                with transaction.atomic():
+                    with self.assertNumQueries(count):
+                        response = self.request(method, samples, name, body)
+                    transaction.set_rollback(True)
+                if method == 'post':
+                    # A rejected form would pin the count of the error.
+                    self.assertIn(response.status_code, (201, 302))
+                else:
+                    self.assertLess(response.status_code, 500)
+
+    def test_small(self):
+        self.check_budgets(self.SIZES[0])
+
+    def test_large(self):
+        self.check_budgets(self.SIZES[1])
+
+
+class ConcurrentPostingTest(TransactionTestCase):
+    """
+    Post records from many threads at the same time and check that no
+    balance update is lost.
+    """
+    THREADS = 8
+    POSTINGS_PER_THREAD = 250
+    # Well below the rate of a development machine, about 100 postings/s,
+    # so that only a lock held too long or a retry loop fails the test.
+    MIN_POSTINGS_PER_SECOND = 20
+
+    def post_records(self, seed):
+        rng = random.Random(seed)
+        accounts = list(Account.objects.all())
+        try:
+            for _ in range(self.POSTINGS_PER_THREAD):
+                account, to_account = rng.sample(accounts, 2)
+                amount = rng.randint(1, 10000) / 100
+                kind = rng.choice(('income', 'expense', 'transfer'))
+                if kind == 'transfer':
+                    posting.post_transfer(
+                        account, to_account, amount, '', timezone.now()
+                    )
+                else:
+                    posting.post_record(
+                        account, self.categories[kind], amount, '',
+                        timezone.now(),
+                    )
+        finally:
+            connection.close()
+
+    def test_balances_match_ledger(self):
+        for name in ('Needs', 'Wants', 'Savings', 'Emergency'):
+            create_account(name, 0, 1000)
+        self.categories = {
+            'income': create_category('income', 'Salary', True),
+            'expense': create_category('expense', 'Food', True),
+        }
+        create_category('transfer', 'Transfer', True)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            list(executor.map(self.post_records, range(self.THREADS)))
+        elapsed = time.perf_counter() - start
+
+        postings = self.THREADS * self.POSTINGS_PER_THREAD
+        self.assertEqual(Ledger.objects.count(), postings)
+        expected = {account.pk: 1000 for account in Account.objects.all()}
+        for record in Ledger.objects.select_related('category'):
+            category_type = record.category.category_type
+            if category_type == 'income':
+                expected[record.account_id] += record.amount
+            else:
+                expected[record.account_id] -= record.amount
+            if category_type == 'transfer':
+                expected[record.to_account_id] += record.amount
+        for account in Account.objects.all():
+            self.assertAlmostEqual(account.amount, expected[account.pk])
+        self.assertEqual(rollup.verify(), [])
+        logger.info(
+            '%d postings from %d threads in %.2fs (%.0f postings/s)',
+            postings, self.THREADS, elapsed, postings / elapsed,
+        )
+        self.assertGreater(postings / elapsed, self.MIN_POSTINGS_PER_SECOND)
+
+
 class FormTest(TestCase):
     """
     Test the forms.
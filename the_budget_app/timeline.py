@@ -0,0 +1,58 @@
+"""
+Versions of the days of the records timeline.
+
+The records page caches the rendering of every day group under the
+version of its day (see `records/day_groups.html`). Adding or deleting a
+record bumps the version of its day only, so the next page rebuilds
+that day and serves the others from the cache. Renaming or deleting an
+account or a category changes every day and bumps the versions of the
+names instead. The versions and the fragments are in the shared cache,
+so a day changed through one worker process is rebuilt by all.
+
+Any day changing also bumps `LEDGER_VERSION_KEY`, the version of the
+whole ledger, for what is cached over many days (see `facets`).
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import choices, registry
+from .models import Ledger
+
+
+LEDGER_VERSION_KEY = 'the_budget_app:ledger:version'
+
+def day_key(day):
+    return f'the_budget_app:timeline:{day.isoformat()}:version'
+
+
+def changed(days):
+    days = set(days)
+    for day in days:
+        choices.changed(day_key(day))
+    if days:
+        choices.changed(LEDGER_VERSION_KEY)
+
+
+@receiver(post_save, sender=Ledger)
+def record_saved(sender, instance, **kwargs):
+    # `posting` bumps the days itself, this is for the records saved one
+    # by one elsewhere.
+    changed([instance.posted_on])
+
+
+def day_versions(days):
+    """
+    Returns the version of every day in `days`, with one read of the
+    cache for all of them.
+    """
+    keys = {day: day_key(day) for day in days}
+    versions = cache.get_many(keys.values())
+    names = '{}.{}'.format(
+        choices.version(choices.ACCOUNTS_VERSION_KEY),
+        choices.version(registry.VERSION_KEY),
+    )
+    return {
+        day: f'{versions.get(key) or choices.version(key)}.{names}'
+        for day, key in keys.items()
+    }
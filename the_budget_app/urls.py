@@ -7,6 +7,9 @@ from .views import (
     records_view as record,
     budget_view as budget,
     category_view as category,
+    import_view as import_records,
+    api_view as api,
+    reports_view as reports,
 )
 
 app_name="the_budget"
@@ -20,14 +23,27 @@ urlpatterns = [
     path('new-record/expense', new_record.expense, name='new_expense'),
     path('new-record/transfer', new_record.transfer, name='new_transfer'),
     path('records', record.index, name='record'),
+    path('records/page', record.page, name='record_page'),
+    path('records/import', import_records.index, name='import_records'),
+    path('records/export', record.export, name='export_records'),
+    path('records/search', record.search, name='search_records'),
     path('record/detail/<int:pk>', record.detail, name='detail_record'),
     path('record/delete/<int:pk>', record.delete, name='delete_record'),
     path('budget', budget.index, name='budget'),
+    path('budget/<int:year>/<int:month>', budget.index, name='budget_month'),
     path('budget/set/<int:pk>', budget.create, name='create_budget'),
     path('budget/edit/<int:pk>', budget.edit, name='edit_budget'),
     path('categories', category.index, name='category'),
     path('categories/create', category.create, name='add_category'),
     path('categories/edit/<int:pk>', category.edit, name='edit_category'),
     path('categories/delete/<int:pk>', category.delete, name='delete_category'),
+    path('reports', reports.index, name='reports'),
+    path('api/ledger', api.ledger, name='api_ledger'),
+    path('api/accounts', api.accounts, name='api_accounts'),
+    path('api/categories', api.categories, name='api_categories'),
+    path('api/budgets', api.budgets, name='api_budgets'),
+    path('api/search', api.search, name='api_search'),
+    path('api/postings', api.postings, name='api_postings'),
+    path('api/report', reports.report, name='api_report'),
 
 ]
\ No newline at end of file
@@ -1,8 +1,13 @@
+from datetime import date
+
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import F
 
+from .. import choices, posting, rollup, snapshots
 from ..forms import AccountForm
 from ..models import Account
 
@@ -14,14 +19,32 @@ ACCOUNT_CREATE  = TEMPLATE_ACCOUNT + 'create.html'
 ACCOUNT_EDIT  = TEMPLATE_ACCOUNT + 'edit.html'
 
 
-def index(response):
+def get_accounts(request):
     """
-    Displays list of Accounts of the user.
+    Returns the accounts and the `as_of` date of the query string. With
+    `?as_of=YYYY-MM-DD` the accounts have the `balance` of that day.
     """
     accounts = Account.objects.all()
+    as_of = request.GET.get('as_of')
+    if as_of:
+        try:
+            as_of = date.fromisoformat(as_of)
+        except ValueError:
+            raise Http404('Invalid date.')
+        accounts = snapshots.with_balance_as_of(as_of, accounts)
+    return accounts, as_of
+
+
+def index(response):
+    """
+    Displays list of Accounts of the user. With `?as_of=YYYY-MM-DD` the
+    amounts are the balances at the end of that day.
+    """
+    accounts, as_of = get_accounts(response)
     context = {
         'hello': 'The Budget App',
         'accounts': accounts,
+        'as_of': as_of,
     }
     
     return render(response, ACCOUNT_INDEX, context)
@@ -62,6 +85,7 @@ def create(request):
                 account_name=account_name,
                 splitting_percent=splitting_percent,
                 amount=initial_amount,
+                opening_amount=initial_amount,
             )
             messages.success(request, 'Account Added Successfully!')
             return redirect(reverse('the_budget:account'))
@@ -128,11 +152,16 @@ def edit(request, pk):
                     }
                     return render(request, ACCOUNT_EDIT, context)
                 else:
-                    account = Account.objects.get(pk=pk)
-                    account.account_name = account_name
-                    account.splitting_percent = splitting_percent
-                    account.amount = initial_amount
-                    account.save()
+                    # Setting the amount by hand moves the opening amount
+                    # by as much, so it keeps matching the ledger.
+                    Account.objects.filter(pk=pk).update(
+                        account_name=account_name,
+                        splitting_percent=splitting_percent,
+                        amount=initial_amount,
+                        opening_amount=F('opening_amount')
+                                       + initial_amount - F('amount'),
+                    )
+                    choices.accounts_changed()
             else:
                 # If nothing changed in the form data, it will just send
                 # a success message and redirects to `/accounts`.
@@ -161,6 +190,9 @@ def delete(request, pk):
     if request.method == 'POST':
         account = get_object_or_404(Account,pk=pk)
         accounts_count = Account.objects.count()
+        # The records of the account are deleted with it.
+        rollup.remove_account(account)
+        posting.keep_transfers(account)
 
         if accounts_count == 1 or account.amount == 0:
             account.delete()
@@ -172,8 +204,7 @@ def delete(request, pk):
                     Account,
                     pk=request.POST['transfer_to_account']
                 )
-                transfer_to_account.amount += account.amount
-                transfer_to_account.save()
+                posting.move_balance(account, transfer_to_account)
                 account.delete()
             else:
                 # Else delete the account completely.
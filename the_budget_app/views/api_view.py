@@ -0,0 +1,301 @@
+"""
+JSON API over the ledger, the accounts, the categories and the budgets.
+
+Every list is cursor paginated (see `pagination`), so the cost of a page
+doesn't depend on how deep it is. The rows are read with `.values()` and
+written out as they are, without building model instances. Query
+parameters:
+
+- `fields`: comma separated fields to return, all by default.
+- `size`: number of rows per page, up to `MAX_PAGE_SIZE`.
+- `cursor`: the `next_cursor` of the previous page.
+- the filters of the resource, e.g. `start`, `end`, `account` and
+  `category` for the ledger.
+
+`search` returns the records matching a full-text search, best first.
+`postings` posts a batch of records at once.
+"""
+import json
+
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .. import choices, posting, registry, search as record_search
+from ..forms import (
+    BudgetFilterForm, CategoryFilterForm, LedgerFilterForm, PostingForm,
+    SearchForm,
+)
+from ..models import Account, Budget, Category, Ledger
+from ..pagination import (
+    PAGE_SIZE, InvalidCursor, aware_datetime, paginate,
+)
+
+
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 1000
+
+
+class ApiError(ValueError):
+    """
+    Raised on invalid query parameters, returned as a 400 response.
+    """
+
+
+class Resource:
+    """
+    A model served by the API. `fields` maps the names of the fields a
+    client can select to the lookups they are read from. The pages are
+    ordered by the `key` fields, read back from a cursor by `parsers`.
+    """
+    def __init__(self, model, fields, filter_form=None, key=('id',),
+                 parsers=(int,), descending=False):
+        self.model = model
+        self.fields = fields
+        self.filter_form = filter_form
+        self.key = key
+        self.parsers = parsers
+        self.descending = descending
+
+    def get_fields(self, request):
+        fields = request.GET.get('fields')
+        if not fields:
+            return list(self.fields)
+        fields = [field.strip() for field in fields.split(',')]
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown:
+            raise ApiError(
+                f'Unknown fields: {", ".join(unknown)}. '
+                f'Valid fields: {", ".join(self.fields)}.'
+            )
+        return fields
+
+    def values(self, queryset, fields):
+        """
+        Select the `fields` and the key from `queryset` as dicts. Fields
+        read from another model are joined under their API name.
+        """
+        fields = list(dict.fromkeys([*fields, *self.key]))
+        return queryset.values(
+            *[field for field in fields if self.fields[field] == field],
+            **{
+                field: F(self.fields[field])
+                for field in fields if self.fields[field] != field
+            },
+        )
+
+    def get_page(self, request):
+        fields = self.get_fields(request)
+        try:
+            size = int(request.GET.get('size', PAGE_SIZE))
+        except ValueError:
+            size = 0
+        if not 1 <= size <= MAX_PAGE_SIZE:
+            raise ApiError(f'size must be from 1 to {MAX_PAGE_SIZE}.')
+
+        queryset = self.model.objects.all()
+        if self.filter_form is not None:
+            form = self.filter_form(request.GET)
+            if not form.is_valid():
+                raise ApiError(form.errors.as_text())
+            queryset = form.filter(queryset)
+
+        try:
+            page = paginate(
+                self.values(queryset, fields),
+                self.key,
+                self.parsers,
+                request.GET.get('cursor'),
+                size=size,
+                descending=self.descending,
+                key=lambda row: tuple(row[field] for field in self.key),
+            )
+        except InvalidCursor:
+            raise ApiError('Invalid cursor.')
+        return fields, page
+
+
+LEDGER = Resource(
+    Ledger,
+    {
+        'id': 'id',
+        'date_created': 'date_created',
+        'posted_on': 'posted_on',
+        'amount': 'amount',
+        'note': 'note',
+        'account_id': 'account_id',
+        'account_name': 'account__account_name',
+        'category_id': 'category_id',
+        'category_name': 'category__category_name',
+        'category_type': 'category__category_type',
+        'to_account_id': 'to_account_id',
+        'to_account_name': 'to_account__account_name',
+    },
+    filter_form=LedgerFilterForm,
+    # Newest first, like the records page.
+    key=('date_created', 'id'),
+    parsers=(aware_datetime, int),
+    descending=True,
+)
+
+ACCOUNTS = Resource(
+    Account,
+    {
+        'id': 'id',
+        'account_name': 'account_name',
+        'splitting_percent': 'splitting_percent',
+        'amount': 'amount',
+    },
+)
+
+CATEGORIES = Resource(
+    Category,
+    {
+        'id': 'id',
+        'category_type': 'category_type',
+        'category_name': 'category_name',
+        'editable': 'editable',
+    },
+    filter_form=CategoryFilterForm,
+)
+
+BUDGETS = Resource(
+    Budget,
+    {
+        'id': 'id',
+        'category_id': 'category_id',
+        'category_name': 'category__category_name',
+        'budget_limit': 'budget_limit',
+        'month': 'month',
+        'year': 'year',
+    },
+    filter_form=BudgetFilterForm,
+)
+
+
+def list_response(request, resource):
+    """
+    Returns a page of `resource` as JSON: its `results`, the
+    `next_cursor` and the `next` url, both null on the last page.
+    """
+    try:
+        fields, page = resource.get_page(request)
+    except ApiError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    next_url = None
+    if page.has_next:
+        query = request.GET.copy()
+        query['cursor'] = page.next_cursor
+        next_url = request.build_absolute_uri(f'?{query.urlencode()}')
+    return JsonResponse({
+        'results': [
+            {field: row[field] for field in fields} for row in page.rows
+        ],
+        'next_cursor': page.next_cursor,
+        'next': next_url,
+    })
+
+
+@require_GET
+def ledger(request):
+    return list_response(request, LEDGER)
+
+
+@require_GET
+def accounts(request):
+    return list_response(request, ACCOUNTS)
+
+
+@require_GET
+def categories(request):
+    return list_response(request, CATEGORIES)
+
+
+@require_GET
+def budgets(request):
+    return list_response(request, BUDGETS)
+
+
+@require_GET
+def search(request):
+    """
+    Returns the records matching the words of `q`, best first, `size`
+    at a time from `offset`. `next_offset` is null on the last page.
+    """
+    form = SearchForm(request.GET)
+    try:
+        size = int(request.GET.get('size', PAGE_SIZE))
+    except ValueError:
+        size = 0
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors.as_text()}, status=400)
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        return JsonResponse(
+            {'error': f'size must be from 1 to {MAX_PAGE_SIZE}.'}, status=400
+        )
+    offset = form.cleaned_data['offset'] or 0
+    results = record_search.search(
+        form.cleaned_data['q'], size=size, offset=offset
+    )
+    return JsonResponse({
+        'results': [row._asdict() for row in results.rows],
+        'next_offset': offset + size if results.has_next else None,
+    })
+
+
+# Only JSON is accepted, which a cross-site form can't send without the
+# browser asking first, so the CSRF token isn't needed.
+@csrf_exempt
+@require_POST
+def postings(request):
+    """
+    Post a batch of incomes, expenses and transfers:
+
+        {"postings": [{"type": "expense", "account": 1, "category": 5,
+                       "amount": "12.50", "note": "",
+                       "date_created": "2023-05-01T12:00:00"}, ...]}
+
+    A transfer has a `to_account` instead of a `category`. The postings
+    are all validated first against the cached accounts and categories.
+    If any is invalid nothing is posted and the errors are returned by
+    index. Otherwise they are saved in one transaction with one INSERT
+    and one UPDATE of the balances, and their ids are returned.
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse(
+            {'error': 'Send the postings as application/json.'}, status=415
+        )
+    try:
+        items = json.loads(request.body)['postings']
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse(
+            {'error': 'Expected {"postings": [...]}.'}, status=400
+        )
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_BATCH_SIZE:
+        return JsonResponse(
+            {'error': f'Send from 1 to {MAX_BATCH_SIZE} postings.'},
+            status=400,
+        )
+
+    accounts = {account.pk: account for account in choices.accounts()}
+    categories = registry.load().by_pk
+    forms = [
+        PostingForm(
+            item if isinstance(item, dict) else {}, accounts, categories
+        )
+        for item in items
+    ]
+    errors = [
+        {'index': index, 'errors': form.errors.get_json_data()}
+        for index, form in enumerate(forms)
+        if not form.is_valid()
+    ]
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    records = posting.post([form.to_record() for form in forms])
+    return JsonResponse(
+        {'ids': [record.pk for record in records]}, status=201
+    )
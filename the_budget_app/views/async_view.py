@@ -0,0 +1,57 @@
+"""
+Async versions of the read-heavy views, served under ASGI (see
+`middleware.async_urlconf_middleware`).
+
+They read the database with the async ORM and only render once every
+row is fetched, as templates can't query the database from an event
+loop. The reads that go through the caches of `choices` and `registry`
+run in a thread.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBadRequest
+from django.shortcuts import render
+
+from . import accounts_view, budget_view, index_view, records_view
+from ..forms import RecordFilterForm
+from ..pagination import InvalidCursor
+
+
+async def index(request):
+    context = {'hello': 'The Budget App'}
+    return render(request, index_view.TEMPLATE + '/index.html', context)
+
+
+async def accounts(request):
+    accounts, as_of = accounts_view.get_accounts(request)
+    context = {
+        'hello': 'The Budget App',
+        'accounts': [account async for account in accounts.aiterator()],
+        'as_of': as_of,
+    }
+    return render(request, accounts_view.ACCOUNT_INDEX, context)
+
+
+async def records(request):
+    # The filter form reads the cached accounts and the category
+    # registry, which may query the database.
+    form = await sync_to_async(RecordFilterForm)(request.GET)
+    if not form.is_valid():
+        return render(
+            request, records_view.INDEX_RECORD, {'filter_form': form}
+        )
+    try:
+        context = await records_view.aget_record_page(request, form)
+    except InvalidCursor:
+        return HttpResponseBadRequest('<h1>Invalid Cursor!<h1>')
+    context['facets'] = await sync_to_async(records_view.get_facets)(
+        request, form
+    )
+    return render(request, records_view.INDEX_RECORD, context)
+
+
+async def budget(request, year=None, month=None):
+    context = budget_view.get_budget_context(year, month)
+    for name in ('budget_info_list', 'categories'):
+        if name in context:
+            context[name] = [row async for row in context[name].aiterator()]
+    return render(request, budget_view.BUDGET_INDEX, context)
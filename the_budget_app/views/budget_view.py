@@ -1,15 +1,15 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Sum
 from django.http import Http404
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 
-from ..models import Budget, Category, Ledger
+from ..budgeting import budget_vs_actual, categories_without_budget
+from ..models import Budget, Category
 from ..forms import BudgetForm
 
 
@@ -21,71 +21,49 @@ BUDGET_CREATE = TEMPLATE_BUDGET + 'create.html'
 BUDGET_EDIT = TEMPLATE_BUDGET + 'edit.html'
 
 THIS_MONTH = datetime.today().strftime("%B %Y")
+# The months a date can be made of, the first and the last.
+FIRST_MONTH = (1, 1)
+LAST_MONTH = (9999, 12)
 
 
-def index(request):
+def get_budget_context(year=None, month=None):
+    """
+    Returns the context of the budget page of a month, the current month
+    by default. The budgets and categories are querysets. There is no
+    previous month before January of year 1 nor next month after
+    December 9999.
+    """
     today = datetime.today()
-    # The `budget` variable will strore all category with budget for the
-    # month of today.month(). Has the budget_limit.
-    budgets = Budget.objects.select_related('category').filter(
-        month=today.month, year=today.year
-    )
-    # Get all the expenses for this month.
-    expenses = Ledger.objects.values('category').annotate(
-        total_expense=Sum('amount')
-    ).filter(date_created__month=today.month)
-    # Only get the expense whose category has budget set.
-    with_budget_set = expenses.filter(category__budget__in=budgets)
-    # Loop through the budgets.
-    budget_info_list = []
-    for budget in budgets:
-        for with_budget in with_budget_set:
-            if with_budget.get("category") == budget.category.pk:
-                budget_info_list.append(
-                    {
-                        'budget_id': budget.pk,
-                        'category_id': budget.category.pk,
-                        'category_name': budget.category.category_name,
-                        'budget_limit': budget.budget_limit,
-                        'spent': with_budget.get("total_expense"),
-                        'remaining': budget.budget_limit
-                                    - with_budget.get("total_expense"),
-                        'pb_width': (with_budget.get("total_expense")
-                                    / budget.budget_limit) * 100,
-                    }
-                )
-                break
-        else:
-            budget_info_list.append(
-                {
-                    'budget_id': budget.pk,
-                    'category_id': budget.category.pk,
-                    'category_name': budget.category.category_name,
-                    'budget_limit': budget.budget_limit,
-                    'spent': 0,
-                    'remaining': budget.budget_limit,
-                    'pb_width': 0
-                }
-            )
+    if year is None:
+        year, month = today.year, today.month
+    elif not (1 <= year <= LAST_MONTH[0] and 1 <= month <= 12):
+        raise Http404("Month does not exist")
+    previous_month = next_month = None
+    if (year, month) != FIRST_MONTH:
+        previous_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    if (year, month) != LAST_MONTH:
+        next_month = (year + 1, 1) if month == 12 else (year, month + 1)
 
     context = {
-        'budget_info_list': budget_info_list,
-        'this_month': THIS_MONTH,
+        'budget_info_list': budget_vs_actual(year, month),
+        'this_month': date(year, month, 1).strftime("%B %Y"),
+        'previous_month': previous_month,
+        'next_month': next_month,
     }
-    if budgets:
-        categories = Category.objects.filter(
-            category_type='expense'
-        )
-        categories = categories.exclude(budget__in=budgets)
-        context.update({
-            'categories': categories,
-        })
-    else:
-        categories = Category.expenses()
+    # Budgets can only be set for the current month.
+    if (year, month) == (today.year, today.month):
         context.update({
-            'categories': categories,
+            'categories': categories_without_budget(year, month),
         })
-    return render(request, BUDGET_INDEX, context)
+    return context
+
+
+def index(request, year=None, month=None):
+    """
+    Displays the budgets of a month, the current month by default, with
+    how much was spent on each of them.
+    """
+    return render(request, BUDGET_INDEX, get_budget_context(year, month))
 
 
 @transaction.atomic
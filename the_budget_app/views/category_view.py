@@ -3,8 +3,10 @@ from django.urls import reverse
 from django.contrib import messages
 from django.db import transaction
 from django.http import Http404
+from django.views.decorators.http import require_POST
 
-from ..models import Category
+from .. import posting, registry
+from ..models import Category, Ledger
 from ..forms import CategoryForm
 
 
@@ -17,8 +19,8 @@ CATEGORY_EDIT = TEMPLATE_CATEGORY + 'edit.html'
 
 
 def index(request):
-    expenses = Category.expenses()
-    incomes = Category.incomes()
+    expenses = registry.expenses()
+    incomes = registry.incomes()
     context = {
         'expenses': expenses,
         'incomes': incomes,
@@ -77,17 +79,27 @@ def edit(request, pk):
             'form': form,
             'category_id': category.pk,
         }
-        if form.is_valid():
-            if form.has_changed():
-                category_type = form.cleaned_data['category_type']
-                category_name = form.cleaned_data['category_name']
-
-                category.category_type=category_type
-                category.category_name=category_name
+        # The records of a category were applied to the balances, the
+        # monthly totals and the snapshots as its type, which can't
+        # change under them. No record can be added between the check
+        # and the save.
+        with transaction.atomic():
+            if (
+                form.is_valid()
+                and form.cleaned_data['category_type']
+                != category.category_type
+                and Ledger.objects.filter(category=category).exists()
+            ):
+                form.add_error(
+                    'category_type',
+                    'The type of a category with records can\'t be changed.',
+                )
+            if form.is_valid() and form.has_changed():
+                category.category_type = form.cleaned_data['category_type']
+                category.category_name = form.cleaned_data['category_name']
                 category.save()
-            else:
-                pass
 
+        if form.is_valid():
             messages.success(request, 'Category Saved Successfully!')
             return redirect(reverse('the_budget:category'))
         else:
@@ -95,11 +107,13 @@ def edit(request, pk):
             return render(request, CATEGORY_EDIT, context)
 
 
+@require_POST
 @transaction.atomic
 def delete(request, pk):
-    if request.method == 'POST':
-        category = get_object_or_404(Category, pk=pk)
-        category.delete()
+    category = get_object_or_404(Category, pk=pk)
+    # The records of the category are deleted with it.
+    posting.keep_category(category)
+    category.delete()
 
-        messages.success(request, 'Deleted Successfully!')
-        return redirect(reverse('the_budget:category'))
\ No newline at end of file
+    messages.success(request, 'Deleted Successfully!')
+    return redirect(reverse('the_budget:category'))
\ No newline at end of file
@@ -0,0 +1,59 @@
+import codecs
+
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.contrib import messages
+
+from ..forms import ImportForm
+from ..importers import (
+    ImportFileError, file_digest, import_file, start_import,
+)
+from ..models import Account
+
+
+TEMPLATE_IMPORT = 'the_budget_app/import/'
+
+IMPORT_INDEX = TEMPLATE_IMPORT + 'index.html'
+
+
+def index(request):
+    """
+    Import records from an uploaded CSV, OFX or QIF file.
+    """
+    if request.method == 'GET':
+        form = ImportForm()
+        context = {
+            'form': form,
+        }
+        return render(request, IMPORT_INDEX, context)
+
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        context = {
+            'form': form,
+        }
+        if form.is_valid():
+            account = Account.objects.get(pk=form.cleaned_data['account'])
+            upload = form.cleaned_data['file']
+            digest = file_digest(upload.chunks())
+            upload.seek(0)
+            # Iterating the upload yields its lines without reading the
+            # whole file in memory. `utf-8-sig` drops the byte order mark
+            # some spreadsheets start their CSV files with.
+            lines = codecs.iterdecode(upload, 'utf-8-sig')
+            try:
+                ledger_import = start_import(
+                    digest, upload.name, form.cleaned_data['resume']
+                )
+                result = import_file(
+                    lines, form.cleaned_data['file_format'], ledger_import,
+                    account=account,
+                )
+            except (ImportFileError, UnicodeDecodeError) as error:
+                context.update({'error': str(error)})
+                return render(request, IMPORT_INDEX, context)
+            messages.success(request, f'Imported {result}.')
+            return redirect(reverse('the_budget:record'))
+        else:
+            context.update({'error': 'ValidationError'})
+            return render(request, IMPORT_INDEX, context)
@@ -7,8 +7,8 @@ from django.contrib import messages
 from django.db.models import Sum
 from django.utils import timezone
 
+from .. import choices, posting
 from ..forms import ExpenseForm, IncomeForm, TransferForm
-from ..models import Account, Category, Ledger
 
 
 TEMPLATE_RECORD = 'the_budget_app/new_record/'
@@ -22,8 +22,10 @@ def income(request):
     """
     Returns a form for new income record.
     """
+    split_sum = sum(
+        account.splitting_percent for account in choices.accounts()
+    )
     if request.method == 'GET':
-        split_sum = Account.get_sum_of_splitting_percent()
         form = IncomeForm()
         context = {
             'income_form': form,
@@ -33,7 +35,6 @@ def income(request):
         return render(request, RECORD_INDEX, context)
 
     if request.method == 'POST':
-        split_sum = Account.get_sum_of_splitting_percent()
         form = IncomeForm(request.POST)
         context = {
             'income_form': form,
@@ -49,56 +50,17 @@ def income(request):
             account = form.cleaned_data['account']
             category = form.cleaned_data['category']
 
-            account = Account.objects.get(pk=account)
-            category = Category.objects.get(pk=category)
-
             if form['auto_split'].value() == True:
                 # If `auto_split` is enabled, the income fund will
                 # be distributed based on the splitting_percent of
                 # the accounts.
-                accounts = Account.objects.exclude(
-                    splitting_percent=0
+                posting.post_split_income(
+                    category, amount, note, date_modified
                 )
-                remaining_amount = amount
-                for account in accounts:
-                    if account == accounts.last():
-                        # The remaining amount will be added on the
-                        # last account.
-                        remaining_amount = round(remaining_amount,2)
-                        account.amount += remaining_amount
-                        account.save()
-                        Ledger.objects.create(
-                            account=account,
-                            category=category,
-                            amount=remaining_amount,
-                            note=note,
-                            date_created=date_modified
-                        )
-                    else:
-                        split_percent = account.splitting_percent * 0.01
-                        percent_amount = amount * split_percent
-                        percent_amount = round(percent_amount, 2)
-                        account.amount += percent_amount
-                        remaining_amount -= percent_amount
-                        account.save()
-                        Ledger.objects.create(
-                            account=account,
-                            category=category,
-                            amount=percent_amount,
-                            note=note,
-                            date_created=date_modified
-                        )
             else:
-                new_record = Ledger(
-                    account=account,
-                    category=category,
-                    amount=amount,
-                    note=note,
-                    date_created=date_modified
+                posting.post_record(
+                    account, category, amount, note, date_modified
                 )
-                account.amount += amount
-                account.save()
-                new_record.save()
             context.update({'success': "Income Added Successfully!"})
             messages.success(request, context['success'])
         else:
@@ -135,19 +97,9 @@ def expense(request):
             date_modified = timezone.make_aware(date_modified)
             account = form.cleaned_data['account']
             category = form.cleaned_data['category']
-
-            account = Account.objects.get(pk=account)
-            category = Category.objects.get(pk=category)
-            new_record = Ledger(
-                account=account,
-                category=category,
-                amount=amount,
-                note=note,
-                date_created=date_modified
+            posting.post_record(
+                account, category, amount, note, date_modified
             )
-            account.amount -= amount
-            account.save()
-            new_record.save()
             context.update({'success': "Expense Added Successfully!"})
             messages.success(request, context['success'])
         else:
@@ -184,23 +136,9 @@ def transfer(request):
             from_account = form.cleaned_data['account']
             to_account = form.cleaned_data['to_account']
 
-            from_account = Account.objects.get(pk=from_account)
-            to_account = Account.objects.get(pk=to_account)
-
-            new_record = Ledger(
-                    account=from_account,
-                    category=Category.get_transfer(),
-                    to_account=to_account,
-                    amount=amount,
-                    note=note,
-                    date_created=date_modified
-                )
-            from_account.amount -= amount
-            to_account.amount += amount
-
-            from_account.save()
-            to_account.save()
-            new_record.save()
+            posting.post_transfer(
+                from_account, to_account, amount, note, date_modified
+            )
             context.update({'success': "Fund Transferred Successfully!"})
             messages.success(request, context['success'])
         else:
@@ -1,34 +1,249 @@
-from datetime import datetime
+import hashlib
+from itertools import groupby
 
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+
+from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.db.models import Sum
 from django.utils import timezone
-from django.db import transaction
 
+from .. import exporters, posting, search as record_search, timeline
+from ..facets import cached_group_totals, facet_counts
 from ..models import Ledger, Account, Category
-from ..forms import IncomeForm, ExpenseForm, TransferForm
+from ..forms import (
+    ExportForm, IncomeForm, ExpenseForm, RecordFilterForm, SearchForm,
+    TransferForm,
+)
+from ..pagination import (
+    PAGE_SIZE, InvalidCursor, apaginate, aware_datetime, decode_cursor,
+    paginate,
+)
 
 
 TEMPLATE_RECORD = 'the_budget_app/records/'
 
 INDEX_RECORD = TEMPLATE_RECORD + 'records.html'
 DETAIL_RECORD = TEMPLATE_RECORD + 'detail.html'
+SEARCH_RECORD = TEMPLATE_RECORD + 'search.html'
+PAGE_RECORD = TEMPLATE_RECORD + 'day_groups.html'
+
+# Records are ordered newest first by this key. `id` breaks the ties of
+# records posted at the same time.
+RECORD_KEY = ('date_created', 'id')
+RECORD_KEY_PARSERS = (aware_datetime, int)
+
+
+def group_by_day(records, continued_day=None):
+    """
+    Group the records of a page by their local date. The first group is
+    flagged as `continued` if the previous page ended on the same day so
+    the template doesn't repeat the day header.
+    """
+    day_groups = []
+    for day, rows in groupby(
+        records, key=lambda record: timezone.localdate(record.date_created)
+    ):
+        day_groups.append({
+            'day': day,
+            'records': list(rows),
+            'continued': not day_groups and day == continued_day,
+        })
+    return day_groups
+
+
+def get_cursor(request):
+    """
+    Returns the `cursor` query parameter and the day the page before it
+    ended on.
+    """
+    cursor = request.GET.get('cursor')
+    continued_day = None
+    if cursor:
+        date_created, _ = decode_cursor(cursor, RECORD_KEY_PARSERS)
+        continued_day = timezone.localdate(date_created)
+    return cursor, continued_day
+
+
+def filter_key(form):
+    """
+    Returns a short key of the filters set in `form`, empty if there is
+    none.
+    """
+    filters = sorted(
+        (name, str(value)) for name, value in form.cleaned_data.items()
+        if value not in (None, '')
+    )
+    if not filters:
+        return ''
+    return hashlib.md5(repr(filters).encode()).hexdigest()[:12]
+
+
+def page_context(request, form, page, continued_day):
+    day_groups = group_by_day(page.rows, continued_day)
+    # The rendering of a group is cached until its day changes. A day
+    # may be split between pages, and filtered, so its records and the
+    # filters are part of the key.
+    versions = timeline.day_versions(group['day'] for group in day_groups)
+    key = filter_key(form)
+    for group in day_groups:
+        group['cache_version'] = '{}.{}.{}.{}'.format(
+            versions[group['day']],
+            group['records'][0].id,
+            group['records'][-1].id,
+            key,
+        )
+    next_query = request.GET.copy()
+    next_query['cursor'] = page.next_cursor or ''
+    return {
+        'filter_form': form,
+        'day_groups': day_groups,
+        'next_cursor': page.next_cursor,
+        'next_query': next_query.urlencode(),
+    }
+
+
+def get_record_page(request, form):
+    """
+    Returns the page of records after the `cursor` query parameter and
+    its records grouped by day, filtered by the valid `form`.
+    """
+    cursor, continued_day = get_cursor(request)
+    page = paginate(
+        form.filter(Ledger.rows()), RECORD_KEY, RECORD_KEY_PARSERS, cursor
+    )
+    return page_context(request, form, page, continued_day)
+
+
+async def aget_record_page(request, form):
+    """
+    Async version of `get_record_page`.
+    """
+    cursor, continued_day = get_cursor(request)
+    # Filtering may read the category registry.
+    records = await sync_to_async(form.filter)(Ledger.rows())
+    page = await apaginate(records, RECORD_KEY, RECORD_KEY_PARSERS, cursor)
+    return page_context(request, form, page, continued_day)
+
+
+def get_facets(request, form):
+    """
+    Returns the facets of the records selected by `form` (see
+    `facets.facet_counts`), listed in `groups`. Each value has the
+    `query` string selecting it on top of the current filters.
+
+    Without a filter narrowing the records down, the facets are those of
+    the whole ledger or of a range of days, whose groups are cached.
+    """
+    if form.narrows():
+        facets = facet_counts(form.filter(Ledger.objects.all()))
+    else:
+        facets = facet_counts(groups=cached_group_totals(
+            form.cleaned_data.get('start'), form.cleaned_data.get('end')
+        ))
+    facets['groups'] = []
+    for title, name, field in (
+        ('Types', 'types', 'category_type'),
+        ('Accounts', 'accounts', 'account'),
+        ('Categories', 'categories', 'category'),
+    ):
+        facets['groups'].append((title, facets[name]))
+        for item in facets[name]:
+            query = request.GET.copy()
+            query.pop('cursor', None)
+            query[field] = item['value']
+            item['query'] = query.urlencode()
+            item['selected'] = form.cleaned_data.get(field) == item['value']
+    return facets
 
 
 def index(request):
-    all_record = Ledger.objects.all().order_by('-date_created')
+    """
+    Displays the first page of records, filtered by the query string,
+    with the facets of the filtered records. The next pages are loaded
+    by the template from `page` while the user scrolls.
+    """
+    form = RecordFilterForm(request.GET)
+    if not form.is_valid():
+        return render(request, INDEX_RECORD, {'filter_form': form})
+    try:
+        context = get_record_page(request, form)
+    except InvalidCursor:
+        return HttpResponseBadRequest('<h1>Invalid Cursor!<h1>')
+    context['facets'] = get_facets(request, form)
+
+    return render(request, INDEX_RECORD, context)
+
+
+def page(request):
+    """
+    Returns the day groups of the next page of records as an HTML
+    fragment to be appended on the records page.
+    """
+    form = RecordFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('<h1>Invalid Filters!<h1>')
+    try:
+        context = get_record_page(request, form)
+    except InvalidCursor:
+        return HttpResponseBadRequest('<h1>Invalid Cursor!<h1>')
+
+    return render(request, PAGE_RECORD, context)
+
+
+def search(request):
+    """
+    Displays the records best matching the words searched, a page at a
+    time.
+    """
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('<h1>Invalid Search!<h1>')
+    query = form.cleaned_data['q']
+    offset = form.cleaned_data['offset'] or 0
+    results = record_search.search(query, offset=offset)
     context = {
-        'records': all_record
+        'form': form,
+        'query': query,
+        'records': results.rows,
+        'previous_offset': max(offset - PAGE_SIZE, 0) if offset else None,
+        'next_offset': offset + PAGE_SIZE if results.has_next else None,
     }
+    return render(request, SEARCH_RECORD, context)
 
-    return render(request, INDEX_RECORD, context)
+
+def export(request):
+    """
+    Download the records as CSV or JSON Lines, optionally gzipped and
+    filtered by date, account or category. The file is streamed while
+    the records are read.
+    """
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest('<h1>Invalid Export Filters!<h1>')
+    file_format = form.cleaned_data['format'] or 'csv'
+    gzip = form.cleaned_data['gzip']
+    rows = form.filter(Ledger.rows())
+
+    filename = f'ledger.{file_format}'
+    content_type = exporters.CONTENT_TYPES[file_format]
+    if gzip:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(
+        exporters.export(file_format, rows, gzip),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 def detail(request, pk):
-    record = Ledger.objects.get(pk=pk)
+    record = Ledger.objects.select_related(
+        'account', 'category'
+    ).get(pk=pk)
     context = {
         'record': record,
     }
@@ -36,27 +251,16 @@ def detail(request, pk):
     return render(request, DETAIL_RECORD, context)
 
 
-@transaction.atomic
 def delete(request, pk):
     """
     Delete the selected budget record.
     """
     if request.method == 'POST':
-        record = Ledger.objects.get(pk=pk)
-        category_type = record.category.category_type
-        account = Account.objects.get(pk=record.account.id)
-        if category_type == 'income':
-            account.amount -= record.amount
-        elif category_type == 'expense':
-            account.amount += record.amount
-        elif category_type == 'transfer':
-            to_account = Account.objects.get(pk=record.to_account.id)
-            to_account.amount -= record.amount
-            account.amount += record.amount
-            to_account.save()
-        account.save()
-        record.delete()
+        record = get_object_or_404(
+            Ledger.objects.select_related('category'), pk=pk
+        )
+        posting.unpost(record)
 
         messages.success(request, 'Deleted successfully!')
         return redirect(reverse('the_budget:record'))
-    return HttpResponseBadRequest('<h1>Request Not Allowed!<h1>')
\ No newline at end of file
+    return HttpResponseBadRequest('<h1>Request Not Allowed!<h1>')
@@ -0,0 +1,89 @@
+from datetime import date
+
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from ..forms import ReportForm
+from ..reporting import Report
+
+
+# Constant configurations for view.
+TEMPLATE_REPORTS = 'the_budget_app/reports/'
+# Template Reports
+REPORTS_INDEX = TEMPLATE_REPORTS + 'index.html'
+
+
+def get_report_form(request):
+    """
+    Returns the report form of the query string, the last twelve months
+    by category by default.
+    """
+    today = date.today()
+    data = request.GET.copy()
+    data.setdefault('start', date(today.year - 1, today.month, 1).isoformat())
+    data.setdefault('end', today.isoformat())
+    data.setdefault('period', 'month')
+    data.setdefault('group_by', 'category')
+    return ReportForm(data)
+
+
+def get_report(form):
+    return Report(
+        form.cleaned_data['start'],
+        form.cleaned_data['end'],
+        period=form.cleaned_data['period'],
+        group_by=form.cleaned_data['group_by'],
+    )
+
+
+def index(request):
+    """
+    Displays the income, expense and net totals over time, with their
+    running total, moving average and change from the year before.
+    """
+    form = get_report_form(request)
+    context = {'form': form}
+    if form.is_valid():
+        report = get_report(form)
+        data = report.to_dict(window=form.cleaned_data['window'])
+        total = data['total']
+        context.update({
+            'report': report,
+            'window': form.cleaned_data['window'],
+            'rows': zip(
+                report.buckets,
+                total['income'],
+                total['expense'],
+                total['net'],
+                total['running_total'],
+                total['moving_average'],
+                total['year_over_year'],
+            ),
+            'groups': [
+                {
+                    'name': name,
+                    'income': report.income[index].sum(),
+                    'expense': report.expense[index].sum(),
+                    'net': report.net[index].sum(),
+                }
+                for index, (pk, name) in enumerate(report.groups)
+            ],
+        })
+    return render(request, REPORTS_INDEX, context)
+
+
+@require_GET
+def report(request):
+    """
+    Returns the report of the query string as JSON (see
+    `Report.to_dict`), or its errors with a 400.
+    """
+    form = get_report_form(request)
+    if not form.is_valid():
+        return JsonResponse(
+            {'errors': form.errors.get_json_data()}, status=400
+        )
+    return JsonResponse(
+        get_report(form).to_dict(window=form.cleaned_data['window'])
+    )